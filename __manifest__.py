@@ -8,11 +8,20 @@
     'category': 'Accounting/Payment Providers',
     'sequence': 351,
     'summary': "Payment provider by Maldives Islamic Bank",
-    'depends': ['payment'],
+    'depends': ['account_payment'],
     'data': [
+        'security/ir.model.access.csv',
         'views/payment_provider_views.xml',
+        'views/payment_faisapay_journal_views.xml',
+        'views/payment_faisapay_notification_views.xml',
+        'views/payment_faisapay_refund_views.xml',
+        'views/payment_faisapay_reversal_views.xml',
+        'views/payment_transaction_views.xml',
         'views/payment_faisapay_templates.xml',
+        'wizards/payment_faisapay_payment_link_views.xml',
+        'wizards/payment_faisapay_settlement_import_views.xml',
         'data/payment_provider_data.xml',
+        'data/ir_cron_data.xml',
     ],
     'application': False,
     'post_init_hook': 'post_init_hook',
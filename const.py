@@ -13,9 +13,120 @@ SUPPORTED_CURRENCIES = [
 
 # Mapping of transaction states to Faisapay's payment statuses.
 PAYMENT_STATUS_MAPPING = {
-    'done': ('1'),
+    'done': ('1',),
     'reversed': ('108','124'),  # refunded is included
-    'cancelled': ('36'),
-    'invalid_merchant' : ('10')
+    'cancelled': ('36',),
+    'invalid_merchant' : ('10',)
 }
 
+# Defaults of the pooled HTTP sessions used to reach the Faisapay API.
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_CONNECT_TIMEOUT = 5  # In seconds.
+DEFAULT_READ_TIMEOUT = 10  # In seconds.
+RETRY_BACKOFF_FACTOR = 0.5  # The retries are delayed by 0.5s, 1s, 2s, ...
+RETRY_STATUS_FORCELIST = (502, 503, 504)
+
+# Defaults of the throttling of the requests sent to the Faisapay API.
+DEFAULT_MAX_CONCURRENCY = 4  # The maximum number of requests in flight per worker.
+DEFAULT_RATE_LIMIT = 10  # The maximum number of requests per second per worker.
+
+# The request types of the Faisapay API requests.
+API_REQUEST_TYPES = {
+    'status': 1,
+    'reversal': 2,
+}
+
+# The sweep of the transactions left pending by customers who didn't return from the checkout.
+STATUS_SWEEP_BATCH_SIZE = 100  # The number of transactions checked and committed at once.
+STATUS_SWEEP_STALE_DELAY = 30  # In minutes, the age after which a pending transaction is checked.
+STATUS_SWEEP_MAX_AGE = 7  # In days, the age after which a pending transaction is no longer checked.
+STATUS_SWEEP_TIME_LIMIT = 240  # In seconds, after which the sweep is rescheduled.
+STATUS_SWEEP_RESUME_DELAY = 60  # In seconds, the pause before a rescheduled sweep resumes.
+# The `ir.config_parameter` holding the id of the last transaction checked by the status sweep.
+STATUS_SWEEP_CURSOR_PARAM = 'payment_faisapay.status_sweep_cursor'
+
+# The queue of the notifications processed in the background.
+NOTIFICATION_QUEUE_BATCH_SIZE = 200  # The number of notifications processed and committed at once.
+NOTIFICATION_QUEUE_TIME_LIMIT = 240  # In seconds, after which the processing is rescheduled.
+NOTIFICATION_QUEUE_RETENTION = 7  # In days, the age after which processed notifications are deleted.
+NOTIFICATION_QUEUE_METRICS_WINDOW = 60  # In minutes, the window of the latency metrics.
+NOTIFICATION_QUEUE_RETRY_DELAY = 5  # In seconds, the delay before retrying a locked transaction.
+NOTIFICATION_QUEUE_MAX_RETRY_DELAY = 300  # In seconds; the retry delay doubles up to this value.
+
+# Only one occurrence out of this number of the frequent checks is logged.
+LOG_SAMPLING_RATE = 100
+
+# The number of recently resolved transaction references kept in memory per worker.
+TX_REFERENCE_CACHE_SIZE = 4096
+
+# The number of signed redirect forms kept in memory per worker.
+RENDERING_VALUES_CACHE_SIZE = 4096
+
+# The fields of the transactions that the redirect forms are signed from.
+RENDERING_SIGNED_FIELDS = (
+    'amount', 'currency_id', 'reference', 'provider_id', 'faisapay_merchant_account_id'
+)
+
+# The de-duplication of the notifications handled by a worker.
+NOTIFICATION_DEDUPLICATION_CAPACITY = 10000  # The maximum number of remembered notifications.
+NOTIFICATION_DEDUPLICATION_RETENTION = 3600  # In seconds, the time a notification is remembered.
+
+# The number of recent durations kept per timed span, endpoint and outcome to compute percentiles.
+METRICS_SAMPLE_SIZE = 1024
+
+# The number of transactions reversed and committed at once by a mass reversal.
+REVERSAL_BATCH_SIZE = 100
+REVERSAL_TIME_LIMIT = 240  # In seconds, after which the mass reversal is rescheduled.
+
+# The circuit breaker guarding the Faisapay API in each worker.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # The number of consecutive failures opening the circuit.
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30  # In seconds, the time after which an open circuit is probed.
+
+# The read timeouts adapted to the latency of the Faisapay API.
+ADAPTIVE_TIMEOUT_SAMPLE_SIZE = 200  # The number of recent latencies the timeout is based on.
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20  # The number of latencies needed before adapting the timeout.
+ADAPTIVE_TIMEOUT_FACTOR = 3  # The timeout is this multiple of the 99th percentile latency.
+ADAPTIVE_TIMEOUT_MINIMUM = 2  # In seconds.
+
+# The import of the settlement files exported by MIB.
+SETTLEMENT_IMPORT_BATCH_SIZE = 5000  # The number of rows matched and fixed at once.
+SETTLEMENT_FILE_COLUMNS = ('orderID', 'referenceNo', 'reasonCode')  # Required; purchaseAmt is not.
+
+# The validation of the customers returning from the checkout, before any database access.
+RETURN_RATE_LIMIT = 2  # The number of returns per second allowed per client IP, in each worker.
+RETURN_RATE_BURST = 20  # The number of returns a client IP can make at once.
+RETURN_THROTTLED_CLIENTS = 10000  # The number of client IPs tracked per worker.
+RETURN_MAX_FIELD_COUNT = 32
+RETURN_MAX_FIELD_LENGTH = 256
+
+# The server-to-server notifications.
+WEBHOOK_MAX_NOTIFICATIONS = 500  # The maximum number of notifications per request.
+WEBHOOK_REQUIRED_KEYS = ('orderID', 'responseCode', 'reasonCode', 'salt', 'signature')
+# The notifications come from the few IPs of the gateway, which must not be throttled under load.
+WEBHOOK_RATE_LIMIT = 200  # The number of requests per second allowed per client IP, in each worker.
+WEBHOOK_RATE_BURST = 2000  # The number of requests a client IP can make at once.
+WEBHOOK_THROTTLED_CLIENTS = 1000  # The number of client IPs tracked per worker.
+
+# The journal of the exchanges with the gateway, written in the background by each worker.
+JOURNAL_BATCH_SIZE = 500  # The maximum number of entries inserted at once.
+JOURNAL_FLUSH_INTERVAL = 2  # In seconds, the maximum time an entry waits before being written.
+JOURNAL_CAPACITY = 50000  # The number of entries waiting to be written after which the oldest drop.
+JOURNAL_RETENTION = 30  # In days.
+JOURNAL_REDACTED_KEYS = ('signature',)  # The keys whose values are derived from the credentials.
+JOURNAL_SUMMARY_KEYS = ('requestType', 'purchaseAmt', 'responseCode', 'reasonCode', 'referenceNo')
+
+# The number of invoices whose payment links are created and signed at once.
+PAYMENT_LINK_BATCH_SIZE = 500
+
+# The assignment of the transactions to the merchant accounts of a provider.
+MERCHANT_LOAD_WINDOW = 60  # In minutes, the period over which the load of an account is counted.
+
+# The outbox of the refunds delivered to Faisapay in the background.
+REFUND_OUTBOX_BATCH_SIZE = 50  # The number of refunds delivered and committed at once.
+REFUND_OUTBOX_TIME_LIMIT = 240  # In seconds, after which the delivery is rescheduled.
+REFUND_OUTBOX_LEASE = 300  # In seconds, the time a refund being delivered is left to its worker.
+REFUND_OUTBOX_RETRY_DELAY = 60  # In seconds, the delay before the first retry, doubled each time.
+REFUND_OUTBOX_MAX_RETRY_DELAY = 3600  # In seconds.
+REFUND_OUTBOX_MAX_ATTEMPTS = 10  # The number of attempts after which the refund fails.
+REFUND_OUTBOX_RETENTION = 30  # In days, the age after which delivered refunds are deleted.
@@ -1,22 +1,40 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
 import hmac
+import itertools
+import json
 import logging
-import pprint
 
-from werkzeug.exceptions import Forbidden
+from werkzeug.exceptions import BadRequest, Forbidden, NotFound, TooManyRequests
 
 from odoo import http
 from odoo.exceptions import ValidationError
 from odoo.http import request
+from odoo.addons.payment import utils as payment_utils
+from odoo.addons.payment.controllers.post_processing import PaymentPostProcessing
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
 
 
 
 _logger = logging.getLogger(__name__)
 
+# The rate of returns of each client IP, checked before any database access.
+_return_throttle = faisapay_utils.ClientThrottle(
+    const.RETURN_RATE_LIMIT, const.RETURN_RATE_BURST, const.RETURN_THROTTLED_CLIENTS
+)
+
+# The rate of notifications of each client IP, sized for the gateway rather than for browsers.
+_webhook_throttle = faisapay_utils.ClientThrottle(
+    const.WEBHOOK_RATE_LIMIT, const.WEBHOOK_RATE_BURST, const.WEBHOOK_THROTTLED_CLIENTS
+)
+
 
 class FaisapayController(http.Controller):
     _return_url = '/payment/faisapay/return'
+    _webhook_url = '/payment/faisapay/webhook'
+    _pay_url = '/payment/faisapay/pay'
+    _metrics_url = '/payment/faisapay/metrics'
     _version = 3
 
     @http.route(
@@ -29,34 +47,266 @@ class FaisapayController(http.Controller):
         :param str reference: The transaction reference embedded in the return URL.
         :param dict data: The notification data.
         """
-        
-        _logger.info("Handling redirection from Faisapay with data:\n%s", pprint.pformat(data))
-        if all(f'{key}' in data for key in ('orderID', 'authCode', 'signature')):
-            # Check the integrity of the notification.
-            tx_sudo = request.env['payment.transaction'].sudo()._get_tx_from_notification_data(
-                'faisapay', {'orderID': reference}
-            )              
-            self._verify_notification_signature(data, data.get('signature'), tx_sudo)
-
-            # Handle the notification data.
-            tx_sudo._handle_notification_data('faisapay', data)
-
-        elif all(f'{key}' in data for key in ('orderID', 'reasonCode', 'responseCode')):
-            # Check the integrity of the notification.
-            tx_sudo = request.env['payment.transaction'].sudo()._get_tx_from_notification_data(
-                'faisapay', {'orderID': reference}
-            )
-            data.update({'merchantCheck': True})
+        with faisapay_utils.timed('total', 'return'):
+            signer = self._check_return_data(reference, data)
+
+            if signer:  # Only the verified data are journaled, the others are only counted.
+                request.env['payment.faisapay.journal'].sudo()._record(
+                    request.env['payment.provider'].sudo().browse(signer[0]),
+                    'return',
+                    data,
+                    reference=reference,
+                )
+            if signer and signer[1]:
+                # The integrity of the notification is checked, queue it for background processing.
+                request.env['payment.faisapay.notification'].sudo()._enqueue(reference, data)
 
-            # Handle the notification data.
-            tx_sudo._handle_notification_data('faisapay', data)
+            elif signer:
+                # Check the integrity of the notification.
+                tx_sudo = request.env['payment.transaction'].sudo()._get_tx_from_notification_data(
+                    'faisapay', {'orderID': reference}
+                )
+                self._verify_notification_signature(data, data.get('signature'), tx_sudo)
 
-        else:  # The customer cancelled the payment or the payment failed.
-            pass  # Don't try to process this case because the payment id was not provided.
+                # Handle the notification data.
+                tx_sudo._handle_notification_data('faisapay', data)
+
+            else:  # The customer cancelled the payment or the payment failed.
+                # Unsigned data can't be trusted: the transaction is left to the status sweep.
+                pass
 
         # Redirect the user to the status page.
         return request.redirect('/payment/status')
 
+    @http.route(_webhook_url, type='http', auth='public', methods=['POST'], csrf=False,
+                save_session=False)
+    def faisapay_webhook(self):
+        """ Process the notifications sent by Faisapay server-to-server.
+
+        The body is a JSON notification or a JSON list of notifications. Each notification is
+        checked before any database access, and the valid ones are queued at once for processing
+        in the background so that the acknowledgement doesn't wait for their processing.
+
+        :return: The number of accepted notifications and the references of the rejected ones, as
+                 a JSON response.
+        :raise :class:`werkzeug.exceptions.TooManyRequests`: If the client exceeds its rate.
+        :raise :class:`werkzeug.exceptions.BadRequest`: If the body is malformed.
+        :raise :class:`werkzeug.exceptions.Forbidden`: If no notification has a valid signature.
+        """
+        with faisapay_utils.timed('total', 'webhook'):
+            if not _webhook_throttle.allow(request.httprequest.remote_addr):
+                self._reject('rate_limited', TooManyRequests)
+            try:
+                notifications = json.loads(request.httprequest.get_data())
+            except ValueError:
+                self._reject('malformed', BadRequest)
+            if isinstance(notifications, dict):
+                notifications = [notifications]
+            if not isinstance(notifications, list) \
+                    or not 0 < len(notifications) <= const.WEBHOOK_MAX_NOTIFICATIONS:
+                self._reject('malformed', BadRequest)
+
+            accepted_notifications, rejected_references = [], []
+            for notification_data in notifications:
+                if not self._is_well_formed(notification_data) or not all(
+                    notification_data.get(key) for key in const.WEBHOOK_REQUIRED_KEYS
+                ):
+                    faisapay_utils.rejection_counter.add('malformed')
+                else:
+                    signer = self._get_signer(notification_data, is_redirect=False)
+                    if signer:
+                        accepted_notifications.append((notification_data, signer[0]))
+                        continue
+                    faisapay_utils.rejection_counter.add('invalid_signature')
+                rejected_references.append(
+                    notification_data.get('orderID') if isinstance(notification_data, dict)
+                    else None
+                )
+            if not accepted_notifications:
+                _logger.warning(
+                    "Rejected all the %d notifications from Faisapay.", len(notifications)
+                )
+                raise Forbidden()
+
+            Provider = request.env['payment.provider'].sudo()
+            for notification_data, provider_id in accepted_notifications:
+                request.env['payment.faisapay.journal'].sudo()._record(
+                    Provider.browse(provider_id), 'webhook', notification_data
+                )
+            request.env['payment.faisapay.notification'].sudo()._enqueue_batch([
+                (notification_data['orderID'], notification_data)
+                for notification_data, _provider_id in accepted_notifications
+            ])
+            _logger.info(
+                "Queued %d notifications from Faisapay, rejected %d.",
+                len(accepted_notifications), len(rejected_references),
+            )
+        return request.make_json_response({
+            'accepted': len(accepted_notifications), 'rejected': rejected_references
+        })
+
+    @http.route(f'{_pay_url}/<int:tx_id>', type='http', auth='public', methods=['GET'])
+    def faisapay_pay(self, tx_id, access_token=None):
+        """ Redirect the customer to Faisapay with the pre-signed payment request of a transaction.
+
+        The amount of the transaction follows the amount left to pay on its invoices, and the
+        request is only signed again if it changed. The customers of an already processed
+        transaction or of paid invoices are redirected to the invoice instead.
+
+        :param int tx_id: The transaction to pay, as a `payment.transaction` id.
+        :param str access_token: The access token of the payment link.
+        :return: The page submitting the redirect form.
+        :raise :class:`werkzeug.exceptions.NotFound`: If the access token is invalid.
+        """
+        tx_sudo = request.env['payment.transaction'].sudo().browse(tx_id).exists()
+        if not tx_sudo or not payment_utils.check_access_token(
+            access_token, tx_sudo.id, tx_sudo.reference
+        ):
+            raise NotFound()
+
+        invoices_sudo = tx_sudo.invoice_ids
+        amount_residual = sum(invoices_sudo.mapped('amount_residual'))
+        if tx_sudo.state != 'draft' or (
+            invoices_sudo and tx_sudo.currency_id.compare_amounts(amount_residual, 0) <= 0
+        ):
+            return request.redirect(
+                invoices_sudo[:1].get_portal_url() if invoices_sudo else '/payment/status'
+            )
+        if invoices_sudo and tx_sudo.currency_id.compare_amounts(amount_residual, tx_sudo.amount):
+            tx_sudo.amount = amount_residual  # Partially paid since the link was created.
+
+        PaymentPostProcessing.monitor_transactions(tx_sudo)
+        return request.render(
+            'payment_faisapay.payment_link_redirect',
+            tx_sudo._get_specific_rendering_values(None),
+        )
+
+    @http.route(_metrics_url, type='http', auth='user', methods=['GET'])
+    def faisapay_metrics(self, provider_id=None):
+        """ Return the performance metrics collected by the worker that handles the request.
+
+        The metrics are only readable by the administrators.
+
+        :param str provider_id: The provider whose connection metrics to return, as a
+                                `payment.provider` id. Defaults to the first Faisapay provider.
+        :return: The metrics, as a JSON response.
+        :raise :class:`werkzeug.exceptions.Forbidden`: If the user is not an administrator.
+        :raise :class:`werkzeug.exceptions.BadRequest`: If the provider id is not a number.
+        """
+        if not request.env.user.has_group('base.group_system'):
+            raise Forbidden()
+
+        domain = [('code', '=', 'faisapay')]
+        if provider_id:
+            if not provider_id.isdigit():
+                raise BadRequest()
+            domain.append(('id', '=', int(provider_id)))
+        provider = request.env['payment.provider'].search(domain, limit=1)
+        if not provider:
+            raise NotFound()
+        return request.make_json_response(provider._faisapay_get_metrics())
+
+    @staticmethod
+    def _check_return_data(reference, data):
+        """ Check the returning customer's request before any database access.
+
+        The clients exceeding their rate of returns, the malformed data and the data signed by no
+        provider are rejected and counted. The unsigned data, e.g., of a failed payment, are only
+        counted: they are never applied to a transaction, whose status is requested by the sweep.
+
+        :param str reference: The transaction reference embedded in the return URL.
+        :param dict data: The notification data.
+        :return: The `(provider_id, deferred_processing)` pair of the provider that signed the data,
+                 or None if the data are not signed.
+        :rtype: tuple|None
+        :raise :class:`werkzeug.exceptions.TooManyRequests`: If the client exceeds its rate.
+        :raise :class:`werkzeug.exceptions.BadRequest`: If the data are malformed.
+        :raise :class:`werkzeug.exceptions.Forbidden`: If the signature is invalid.
+        """
+        if not _return_throttle.allow(request.httprequest.remote_addr):
+            FaisapayController._reject('rate_limited', TooManyRequests)
+
+        if not FaisapayController._is_well_formed(dict(data, reference=reference)) \
+                or ('orderID' in data and data['orderID'] != reference):
+            FaisapayController._reject('malformed', BadRequest)
+
+        if not all(f'{key}' in data for key in ('orderID', 'authCode', 'signature')):
+            if data:
+                faisapay_utils.rejection_counter.add('unsigned')
+            return None
+
+        if not data.get('salt'):
+            FaisapayController._reject('malformed', BadRequest)
+        signer = FaisapayController._get_signer(data)
+        if not signer:
+            FaisapayController._reject('invalid_signature', Forbidden)
+        return signer
+
+    @staticmethod
+    def _is_well_formed(notification_data):
+        """ Return whether the notification data have the shape of Faisapay data.
+
+        :param dict notification_data: The notification data.
+        :return: Whether the data are a dict of a bounded number of bounded strings.
+        :rtype: bool
+        """
+        return isinstance(notification_data, dict) \
+            and len(notification_data) <= const.RETURN_MAX_FIELD_COUNT \
+            and all(
+                isinstance(value, str) and len(value) <= const.RETURN_MAX_FIELD_LENGTH
+                for value in notification_data.values()
+            )
+
+    @staticmethod
+    def _get_signer(notification_data, is_redirect=True):
+        """ Return the provider that signed the notification data, without database access.
+
+        The signature is checked against the credential index of the providers: only the providers
+        and merchant accounts with the credentials of the data are tried, or all of them if the
+        data carry none.
+
+        :param dict notification_data: The notification data, with their signature.
+        :param bool is_redirect: Whether the notification data should be treated as redirect data
+                                 or as coming from a webhook notification.
+        :return: The `(provider_id, deferred_processing)` pair of the signing provider, if any.
+        :rtype: tuple|None
+        """
+        if not notification_data['signature'].isascii():
+            return None
+
+        credential_index = request.env['payment.provider'].sudo()._faisapay_get_credential_index()
+        credentials = (notification_data.get('merID'), notification_data.get('acqID'))
+        candidates = credential_index[credentials] if credentials in credential_index \
+            else itertools.chain.from_iterable(credential_index.values())
+        for provider_id, deferred_processing, merchant_account_id in candidates:
+            # The signature engines of the providers and accounts are cached: signing reads no
+            # record.
+            if merchant_account_id:
+                merchant_sudo = request.env['payment.faisapay.merchant'].sudo().browse(
+                    merchant_account_id
+                )
+            else:
+                merchant_sudo = request.env['payment.provider'].sudo().browse(provider_id)
+            expected_signature = merchant_sudo._faisapay_calculate_signature(
+                notification_data, is_redirect=is_redirect
+            )
+            if hmac.compare_digest(notification_data['signature'], expected_signature):
+                return provider_id, deferred_processing
+        return None
+
+    @staticmethod
+    def _reject(reason, exception_class):
+        """ Count the rejection of a notification and raise the HTTP error.
+
+        :param str reason: The reason of the rejection.
+        :param type exception_class: The class of the HTTP error to raise.
+        :return: None
+        :raise :class:`werkzeug.exceptions.HTTPException`: Always.
+        """
+        faisapay_utils.rejection_counter.add(reason)
+        _logger.debug("Rejected a notification from Faisapay: %s.", reason)
+        raise exception_class()
+
     @staticmethod
     def _verify_notification_signature(
         notification_data, received_signature, tx_sudo, is_redirect=True
@@ -78,7 +328,7 @@ class FaisapayController(http.Controller):
             raise Forbidden()
 
         # Compare the received signature with the expected signature.
-        expected_signature = tx_sudo.provider_id._faisapay_calculate_signature(
+        expected_signature = tx_sudo._faisapay_get_merchant()._faisapay_calculate_signature(
             notification_data, is_redirect=is_redirect
         )
         if not hmac.compare_digest(received_signature, expected_signature):
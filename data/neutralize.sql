@@ -3,3 +3,7 @@ UPDATE payment_provider
    SET faisapay_merchant_id = NULL,
        faisapay_passcode = NULL,
        faisapay_acquirer_id = NULL;
+
+-- disable the faisapay merchant accounts
+UPDATE payment_faisapay_merchant
+   SET active = false;
@@ -1,4 +1,13 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from . import account_move
+from . import payment_faisapay_journal
+from . import payment_faisapay_merchant
+from . import payment_faisapay_notification
+from . import payment_faisapay_refund
+from . import payment_faisapay_reversal
+from . import payment_faisapay_reversal_line
+from . import payment_faisapay_signer
 from . import payment_provider
 from . import payment_transaction
+from . import res_currency
@@ -0,0 +1,69 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import Command, api, fields, models
+
+from odoo.addons.payment_faisapay.const import CURRENCY_MAPPING
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    faisapay_payment_link = fields.Char(
+        string="Faisapay Payment Link",
+        help="The link redirecting the customer to Faisapay with the pre-signed payment request of "
+             "the invoice.",
+        compute='_compute_faisapay_payment_link',
+    )
+
+    #=== COMPUTE METHODS ===#
+
+    @api.depends('transaction_ids.state', 'transaction_ids.faisapay_rendering_fingerprint')
+    def _compute_faisapay_payment_link(self):
+        for invoice in self:
+            txs_sudo = invoice.sudo().transaction_ids.filtered(
+                lambda tx: tx.state == 'draft' and tx.faisapay_rendering_fingerprint
+            )
+            invoice.faisapay_payment_link = txs_sudo.sorted('id')[-1:].faisapay_payment_link
+
+    #=== BUSINESS METHODS ===#
+
+    def _faisapay_get_payable_invoices(self, provider):
+        """ Return the invoices that can be paid through the provider and have no payment link yet.
+
+        :param recordset provider: The provider of the payments, as a `payment.provider` record.
+        :return: The payable invoices.
+        :rtype: recordset of `account.move`
+        """
+        return self.filtered(
+            lambda invoice: invoice.move_type == 'out_invoice'
+            and invoice.state == 'posted'
+            and invoice.payment_state in ('not_paid', 'partial')
+            and invoice.currency_id.name in CURRENCY_MAPPING
+            and not invoice.sudo().transaction_ids.filtered(
+                lambda tx: tx.provider_id == provider
+                and tx.state == 'draft'
+                and tx.faisapay_rendering_fingerprint
+            )
+        )
+
+    def _faisapay_create_payment_links(self, provider):
+        """ Create a transaction per invoice and sign its payment request ahead of time.
+
+        :param recordset provider: The provider of the payments, as a `payment.provider` record.
+        :return: The created transactions.
+        :rtype: recordset of `payment.transaction`
+        """
+        Transaction = self.env['payment.transaction'].sudo()
+        txs_sudo = Transaction.create([{
+            'provider_id': provider.id,
+            'reference': Transaction._compute_reference(
+                provider.code, invoice_ids=[Command.set(invoice.ids)]
+            ),
+            'amount': invoice.amount_residual,
+            'currency_id': invoice.currency_id.id,
+            'partner_id': invoice.partner_id.id,
+            'operation': 'online_redirect',
+            'invoice_ids': [Command.set(invoice.ids)],
+        } for invoice in self])
+        txs_sudo._faisapay_presign_rendering_values()
+        return txs_sudo
@@ -0,0 +1,161 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from odoo import api, fields, models, sql_db
+
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+def _insert_entries(cr, entries):
+    """ Insert the journal entries, with their payload redacted and compressed.
+
+    :param odoo.sql_db.Cursor cr: The cursor of the database of the entries.
+    :param list entries: The entries, as dicts, as prepared by `_record`.
+    :return: None
+    """
+    rows = [(
+        entry['date'],
+        entry['provider_id'],
+        entry['reference'],
+        entry['exchange'],
+        entry['endpoint'],
+        entry['summary'],
+        psycopg2.Binary(
+            faisapay_utils.encode_payload(entry['payload'], const.JOURNAL_REDACTED_KEYS)
+        ),
+    ) for entry in entries]
+    cr.execute(
+        """
+        INSERT INTO payment_faisapay_journal (
+            date, provider_id, reference, exchange, endpoint, summary, payload
+        ) VALUES {}
+        """.format(', '.join(['%s'] * len(rows))),
+        rows,
+    )
+
+
+def _write_journal_batch(dbname, entries):
+    """ Insert a batch of journal entries in their own database transaction. """
+    with sql_db.db_connect(dbname).cursor() as cr:
+        _insert_entries(cr, entries)
+
+
+# The journal entries waiting to be written by the background thread of the worker.
+_journal_writer = faisapay_utils.BatchWriter(
+    _write_journal_batch,
+    const.JOURNAL_BATCH_SIZE,
+    const.JOURNAL_FLUSH_INTERVAL,
+    const.JOURNAL_CAPACITY,
+)
+
+
+class PaymentFaisapayJournal(models.Model):
+    _name = 'payment.faisapay.journal'
+    _description = "Faisapay Gateway Journal"
+    _order = 'id desc'
+    _rec_name = 'reference'
+    _log_access = False  # The entries are written outside the ORM and never modified.
+
+    date = fields.Datetime(string="Date", required=True, readonly=True, index=True)
+    provider_id = fields.Many2one(
+        string="Provider", comodel_name='payment.provider', readonly=True, ondelete='cascade'
+    )
+    reference = fields.Char(string="Reference", readonly=True, index='trigram')
+    exchange = fields.Selection(
+        string="Exchange",
+        selection=[
+            ('pay_request', "Payment Request"),
+            ('return', "Customer Return"),
+            ('webhook', "Server Notification"),
+            ('api_request', "API Request"),
+            ('api_response', "API Response"),
+        ],
+        required=True,
+        readonly=True,
+    )
+    endpoint = fields.Char(string="Endpoint", readonly=True)
+    summary = fields.Char(string="Summary", readonly=True)
+    payload = fields.Binary(
+        string="Compressed Payload",
+        help="The compressed JSON of the exchanged data, without the signatures.",
+        attachment=False,
+        readonly=True,
+    )
+    payload_text = fields.Text(string="Payload", compute='_compute_payload_text')
+
+    #=== COMPUTE METHODS ===#
+
+    def _compute_payload_text(self):
+        for entry in self.with_context(bin_size=False):
+            entry.payload_text = entry.payload and json.dumps(
+                faisapay_utils.decode_payload(entry.payload), indent=2, sort_keys=True
+            )
+
+    #=== BUSINESS METHODS ===#
+
+    @api.model
+    def _record(self, provider, exchange, payload, endpoint=None, reference=None):
+        """ Log a one-line summary of the exchange and journal its payload in the background.
+
+        The payload is redacted, compressed and written by the background thread of the worker, in
+        its own database transaction, so that the exchange is journaled even if the current
+        transaction is rolled back. In test mode, it is written immediately with the current
+        cursor instead.
+
+        :param recordset provider: The provider of the exchange, as a `payment.provider` record.
+        :param str exchange: The kind of exchange, as a key of the `exchange` selection.
+        :param dict payload: The exchanged data.
+        :param str endpoint: The API endpoint of the exchange, if any.
+        :param str reference: The reference of the transaction, if not the `orderID` of the payload.
+        :return: None
+        """
+        if not isinstance(payload, dict):
+            payload = {'content': payload}
+        reference = reference or payload.get('orderID')
+        summary = ' '.join(
+            f'{key}={payload[key]}' for key in const.JOURNAL_SUMMARY_KEYS if key in payload
+        )
+        _logger.info(
+            "Faisapay %s for reference %s: %s", f'{exchange}:{endpoint}' if endpoint else exchange,
+            reference, summary or "no status",
+        )
+        entry = {
+            'date': datetime.utcnow(),
+            'provider_id': provider.id or None,
+            'reference': reference and str(reference),
+            'exchange': exchange,
+            'endpoint': endpoint,
+            'summary': summary,
+            'payload': dict(payload),
+        }
+        if self.env.registry.in_test_mode():
+            _insert_entries(self.env.cr, [entry])
+        else:
+            _journal_writer.add(self.env.cr.dbname, entry)
+
+    @api.model
+    def _get_writer_status(self):
+        """ Return the number of entries waiting to be written, dropped and failed in the worker.
+
+        :return: The status of the background writer.
+        :rtype: dict
+        """
+        return _journal_writer.get_status()
+
+    @api.autovacuum
+    def _gc_journal(self):
+        """ Delete the entries older than the retention period. """
+        self.env.cr.execute(
+            "DELETE FROM payment_faisapay_journal WHERE date < %s",
+            [fields.Datetime.now() - timedelta(days=const.JOURNAL_RETENTION)],
+        )
+        _logger.info("Deleted %d expired Faisapay journal entries.", self.env.cr.rowcount)
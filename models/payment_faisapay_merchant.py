@@ -0,0 +1,121 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+from odoo.addons.payment_faisapay import const
+
+
+class PaymentFaisapayMerchant(models.Model):
+    _name = 'payment.faisapay.merchant'
+    _inherit = 'payment.faisapay.signer'
+    _description = "Faisapay Merchant Account"
+    _order = 'sequence, id'
+
+    name = fields.Char(string="Name", required=True)
+    sequence = fields.Integer(string="Sequence", default=10)
+    active = fields.Boolean(string="Active", default=True)
+    provider_id = fields.Many2one(
+        string="Provider",
+        comodel_name='payment.provider',
+        domain=[('code', '=', 'faisapay')],
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    merchant_id = fields.Char(string="Merchant Id", required=True)
+    acquirer_id = fields.Char(string="Acquirer Id", required=True, groups='base.group_system')
+    passcode = fields.Char(string="Passcode", required=True, groups='base.group_system')
+    tx_count = fields.Integer(
+        string="Transactions",
+        help="The number of transactions assigned to the merchant account in the last hour.",
+        compute='_compute_stats',
+    )
+    done_count = fields.Integer(
+        string="Confirmed",
+        help="The number of transactions of the last hour confirmed through the merchant account.",
+        compute='_compute_stats',
+    )
+
+    _sql_constraints = [(
+        'unique_credentials',
+        'UNIQUE(provider_id, merchant_id, acquirer_id)',
+        "A merchant account can only be added once to a provider.",
+    )]
+
+    #=== COMPUTE METHODS ===#
+
+    def _compute_stats(self):
+        stats = self._get_stats()
+        for account in self:
+            account_stats = stats.get(account.id, {})
+            account.tx_count = account_stats.get('tx_count', 0)
+            account.done_count = account_stats.get('done_count', 0)
+
+    #=== CRUD METHODS ===#
+
+    @api.model_create_multi
+    def create(self, values_list):
+        """ Override of `base` to invalidate the cached credential index of the providers. """
+        accounts = super().create(values_list)
+        self.clear_caches()
+        return accounts
+
+    def write(self, values):
+        """ Override of `base` to invalidate the cached signature engines and credential index. """
+        res = super().write(values)
+        if any(
+            field in values
+            for field in ('active', 'provider_id', 'merchant_id', 'acquirer_id', 'passcode')
+        ):
+            self.clear_caches()  # Invalidate the cache in all the workers.
+        return res
+
+    def unlink(self):
+        """ Override of `base` to invalidate the cached credential index of the providers. """
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
+    #=== BUSINESS METHODS ===#
+
+    def _get_stats(self):
+        """ Return the number of transactions assigned to and confirmed through the accounts.
+
+        Only the transactions created in the load window are counted.
+
+        :return: The `tx_count` and `done_count` of each account, by `payment.faisapay.merchant`
+                 id.
+        :rtype: dict
+        """
+        stats = {account.id: {'tx_count': 0, 'done_count': 0} for account in self}
+        if not self.ids:
+            return stats
+        for group in self.env['payment.transaction'].sudo().read_group(
+            [
+                ('faisapay_merchant_account_id', 'in', self.ids),
+                ('create_date', '>=', fields.Datetime.now() - timedelta(
+                    minutes=const.MERCHANT_LOAD_WINDOW
+                )),
+            ],
+            ['faisapay_merchant_account_id', 'state'],
+            ['faisapay_merchant_account_id', 'state'],
+            lazy=False,
+        ):
+            account_stats = stats[group['faisapay_merchant_account_id'][0]]
+            account_stats['tx_count'] += group['__count']
+            if group['state'] == 'done':
+                account_stats['done_count'] += group['__count']
+        return stats
+
+    def _faisapay_get_signing_credentials(self):
+        """ Return the account's credentials the Faisapay signatures are computed with.
+
+        Note: self.ensure_one()
+
+        :return: The passcode, merchant id and acquirer id.
+        :rtype: tuple
+        """
+        self.ensure_one()
+        return self.passcode, self.merchant_id, self.acquirer_id
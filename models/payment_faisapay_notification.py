@@ -0,0 +1,244 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFaisapayNotification(models.Model):
+    _name = 'payment.faisapay.notification'
+    _description = "Faisapay Notification Queue"
+    _order = 'id desc'
+    _log_access = False  # Keep the queue compact; the dates below are all that is needed.
+
+    reference = fields.Char(string="Reference", required=True, readonly=True, index=True)
+    notification_data = fields.Json(string="Notification Data", readonly=True)
+    state = fields.Selection(
+        string="Status",
+        selection=[('pending', "Pending"), ('done', "Processed"), ('error', "Failed")],
+        default='pending',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    received_date = fields.Datetime(
+        string="Received On", default=fields.Datetime.now, required=True, readonly=True
+    )
+    processed_date = fields.Datetime(string="Processed On", readonly=True)
+    error_message = fields.Char(string="Error", readonly=True)
+    attempt_count = fields.Integer(
+        string="Postponed",
+        help="The number of times the notification was postponed because its transaction was "
+             "being processed by another worker.",
+        readonly=True,
+    )
+    next_attempt_date = fields.Datetime(string="Next Attempt", readonly=True)
+
+    #=== BUSINESS METHODS ===#
+
+    @api.model
+    def _enqueue(self, reference, notification_data):
+        """ Queue the notification data for processing in the background.
+
+        :param str reference: The reference of the transaction concerned by the notification.
+        :param dict notification_data: The notification data sent by Faisapay.
+        :return: The queued notification.
+        :rtype: recordset of `payment.faisapay.notification`
+        """
+        return self._enqueue_batch([(reference, notification_data)])
+
+    @api.model
+    def _enqueue_batch(self, notifications):
+        """ Queue many notification data at once for processing in the background.
+
+        The processing cron is only triggered when no notification is waiting to be processed:
+        otherwise, a run is already scheduled and processes the queue until it is empty.
+
+        :param list notifications: The `(reference, notification_data)` pair of each notification,
+                                   where the reference is that of the transaction concerned by the
+                                   notification data sent by Faisapay.
+        :return: The queued notifications.
+        :rtype: recordset of `payment.faisapay.notification`
+        """
+        queue_was_empty = not self.search([
+            ('state', '=', 'pending'),
+            '|',
+            ('next_attempt_date', '=', False),
+            ('next_attempt_date', '<=', fields.Datetime.now()),
+        ], limit=1)
+        notifications = self.create([{
+            'reference': reference, 'notification_data': notification_data
+        } for reference, notification_data in notifications])
+        if queue_was_empty:
+            self.env.ref('payment_faisapay.cron_faisapay_process_notifications')._trigger()
+        return notifications
+
+    @api.model
+    def _cron_process_notifications(self, batch_size=const.NOTIFICATION_QUEUE_BATCH_SIZE):
+        """ Process the pending notifications by batches committed one at a time.
+
+        The notifications are claimed with `SKIP LOCKED` so that concurrent runs of the cron never
+        process the same notification twice. The notifications whose transaction is being processed
+        by another worker are postponed, and skipped until the end of the run. If the processing
+        takes too long, it is rescheduled to resume where it stopped.
+
+        :param int batch_size: The number of notifications processed and committed at once.
+        :return: None
+        """
+        start_time = time.monotonic()
+        cron = self.env.ref('payment_faisapay.cron_faisapay_process_notifications')
+        postponed_notifications = self.browse()
+        while True:
+            self.env.cr.execute(
+                """
+                SELECT id FROM payment_faisapay_notification
+                 WHERE state = 'pending'
+                   AND (next_attempt_date IS NULL OR next_attempt_date <= %s)
+                   AND id != ALL(%s)
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+                """,
+                [fields.Datetime.now(), postponed_notifications.ids, batch_size],
+            )
+            notifications = self.browse(row[0] for row in self.env.cr.fetchall())
+            if not notifications:
+                break
+            postponed_notifications |= notifications._process()
+
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+            if time.monotonic() - start_time > const.NOTIFICATION_QUEUE_TIME_LIMIT:
+                cron._trigger()
+                break
+
+        if postponed_notifications:
+            cron._trigger(min(postponed_notifications.mapped('next_attempt_date')))
+
+    def _process(self):
+        """ Handle the notification data of the notifications in a batch and mark them as processed.
+
+        The notifications whose transaction is being processed by another worker are left pending
+        and postponed, rather than copied to the end of the queue.
+
+        :return: The postponed notifications.
+        :rtype: recordset of `payment.faisapay.notification`
+        """
+        Transaction = self.env['payment.transaction'].sudo()
+        txs_sudo = Transaction
+        notifications = self.browse()
+        errors_by_notification = {}
+        for notification in self:
+            try:
+                txs_sudo += Transaction._get_tx_from_notification_data(
+                    'faisapay', {'orderID': notification.reference}
+                )
+                notifications += notification
+            except ValidationError as error:
+                errors_by_notification[notification] = error
+
+        claimed_txs = txs_sudo._faisapay_claim()
+        postponed_notifications = self.browse()
+        processed_txs = Transaction
+        processed_notifications = self.browse()
+        for tx, notification in zip(txs_sudo, notifications):
+            if tx in claimed_txs:
+                processed_txs += tx
+                processed_notifications += notification
+            else:
+                postponed_notifications += notification
+        postponed_notifications._postpone()
+
+        errors = processed_txs._faisapay_process_notification_data_batch(
+            processed_notifications.mapped('notification_data')
+        )
+        errors_by_notification.update(zip(processed_notifications, errors))
+
+        now = fields.Datetime.now()
+        done_notifications = self.browse()
+        for notification, error in errors_by_notification.items():
+            if not error:
+                done_notifications += notification
+                continue
+            _logger.warning(
+                "Unable to process the queued notification for reference %s: %s",
+                notification.reference, error,
+            )
+            notification.write({
+                'state': 'error', 'processed_date': now, 'error_message': str(error)
+            })
+        done_notifications.write({'state': 'done', 'processed_date': now})
+        return postponed_notifications
+
+    def _postpone(self):
+        """ Postpone the notifications with an exponential backoff.
+
+        :return: None
+        """
+        now = fields.Datetime.now()
+        for notification in self:
+            delay = min(
+                const.NOTIFICATION_QUEUE_RETRY_DELAY * 2 ** notification.attempt_count,
+                const.NOTIFICATION_QUEUE_MAX_RETRY_DELAY,
+            )
+            notification.write({
+                'attempt_count': notification.attempt_count + 1,
+                'next_attempt_date': now + timedelta(seconds=delay),
+            })
+        if self:
+            _logger.info(
+                "Postponed %d notifications whose transaction is processed by another worker.",
+                len(self),
+            )
+
+    @api.model
+    def _get_metrics(self):
+        """ Return the depth of the queue and the processing latency of the recent notifications.
+
+        :return: The number of pending notifications, the age of the oldest one, and the average
+                 and maximum latency, in seconds, of the notifications processed in the window.
+        :rtype: dict
+        """
+        self.env.cr.execute(
+            """
+            SELECT COUNT(*),
+                   EXTRACT(EPOCH FROM NOW() AT TIME ZONE 'UTC' - MIN(received_date))
+              FROM payment_faisapay_notification
+             WHERE state = 'pending'
+            """
+        )
+        depth, oldest_age = self.env.cr.fetchone()
+        self.env.cr.execute(
+            """
+            SELECT COUNT(*),
+                   AVG(EXTRACT(EPOCH FROM processed_date - received_date)),
+                   MAX(EXTRACT(EPOCH FROM processed_date - received_date))
+              FROM payment_faisapay_notification
+             WHERE processed_date >= %s
+            """,
+            [fields.Datetime.now() - timedelta(minutes=const.NOTIFICATION_QUEUE_METRICS_WINDOW)],
+        )
+        processed_count, avg_latency, max_latency = self.env.cr.fetchone()
+        return {
+            'depth': depth,
+            'oldest_pending_age': float(oldest_age or 0),
+            'processed_count': processed_count,
+            'avg_latency': float(avg_latency or 0),
+            'max_latency': float(max_latency or 0),
+        }
+
+    @api.autovacuum
+    def _gc_processed_notifications(self):
+        """ Delete the processed notifications older than the retention period. """
+        retention_limit = fields.Datetime.now() - timedelta(days=const.NOTIFICATION_QUEUE_RETENTION)
+        self.search([('state', '!=', 'pending'), ('processed_date', '<', retention_limit)]).unlink()
@@ -0,0 +1,276 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import time
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFaisapayRefund(models.Model):
+    _name = 'payment.faisapay.refund'
+    _description = "Faisapay Refund Outbox"
+    _order = 'id desc'
+    _log_access = False  # Keep the outbox compact; the dates below are all that is needed.
+
+    refund_transaction_id = fields.Many2one(
+        string="Refund Transaction",
+        comodel_name='payment.transaction',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade',
+    )
+    reference = fields.Char(related='refund_transaction_id.reference')
+    source_transaction_id = fields.Many2one(related='refund_transaction_id.source_transaction_id')
+    state = fields.Selection(
+        string="Status",
+        selection=[('pending', "Pending"), ('sent', "Delivered"), ('failed', "Failed")],
+        default='pending',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    attempt_count = fields.Integer(string="Attempts", readonly=True)
+    queued_date = fields.Datetime(
+        string="Queued On", default=fields.Datetime.now, required=True, readonly=True
+    )
+    next_attempt_date = fields.Datetime(
+        string="Next Attempt", default=fields.Datetime.now, readonly=True, index=True
+    )
+    sent_date = fields.Datetime(string="Delivered On", readonly=True)
+    last_error = fields.Char(string="Last Error", readonly=True)
+
+    _sql_constraints = [(
+        'unique_refund_transaction',
+        'UNIQUE(refund_transaction_id)',
+        "A refund can only be queued once.",
+    )]
+
+    #=== BUSINESS METHODS ===#
+
+    @api.model
+    def _enqueue(self, refund_txs):
+        """ Queue the refunds for delivery to Faisapay in the background.
+
+        :param recordset refund_txs: The refund transactions, as `payment.transaction` records.
+        :return: The queued refunds.
+        :rtype: recordset of `payment.faisapay.refund`
+        """
+        refunds = self.create([{'refund_transaction_id': tx.id} for tx in refund_txs])
+        self.env.ref('payment_faisapay.cron_faisapay_deliver_refunds')._trigger()
+        return refunds
+
+    @api.model
+    def _cron_deliver_refunds(self, batch_size=const.REFUND_OUTBOX_BATCH_SIZE):
+        """ Deliver the due refunds by batches committed one at a time.
+
+        The refunds are claimed with `SKIP LOCKED` so that concurrent runs of the cron never send
+        the same refund twice. If the delivery takes too long, it is rescheduled to resume where
+        it stopped; so is the next retry of the refunds that could not be delivered.
+
+        :param int batch_size: The number of refunds delivered and committed at once.
+        :return: None
+        """
+        start_time = time.monotonic()
+        cron = self.env.ref('payment_faisapay.cron_faisapay_deliver_refunds')
+        while True:
+            self.env.cr.execute(
+                """
+                SELECT id FROM payment_faisapay_refund
+                 WHERE state = 'pending'
+                   AND next_attempt_date <= %s
+              ORDER BY next_attempt_date, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+                """,
+                [fields.Datetime.now(), batch_size],
+            )
+            refunds = self.browse(row[0] for row in self.env.cr.fetchall())
+            if not refunds:
+                break
+            refunds._deliver()
+
+            retry_dates = refunds.filtered(lambda r: r.state == 'pending').mapped(
+                'next_attempt_date'
+            )
+            if retry_dates:
+                cron._trigger(min(retry_dates))
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+            if time.monotonic() - start_time > const.REFUND_OUTBOX_TIME_LIMIT:
+                cron._trigger()
+                break
+
+    def _deliver(self):
+        """ Send the reversal requests of the refunds and apply their results.
+
+        The attempt is recorded, and committed outside of tests, before any request is sent. A
+        refund with a previous attempt may thus have been received by Faisapay even if its outcome
+        is unknown, e.g., after a timeout or a crash: the status of its source transaction is
+        requested first, and the reversal is only sent again if the payment is not reversed.
+
+        :return: None
+        """
+        now = fields.Datetime.now()
+        lease_date = now + timedelta(seconds=const.REFUND_OUTBOX_LEASE)
+        for refund in self:
+            refund.write({
+                'attempt_count': refund.attempt_count + 1, 'next_attempt_date': lease_date
+            })
+        if not self.env.registry.in_test_mode():
+            self.env.cr.commit()
+
+        for provider in self.refund_transaction_id.provider_id:
+            refunds = self.filtered(lambda r: r.refund_transaction_id.provider_id == provider)
+            reversed_contents, errors_by_refund = refunds.filtered(
+                lambda r: r.attempt_count > 1 or r.last_error
+            )._check_reversed()
+            refunds_to_send = refunds.filtered(
+                lambda r: r not in reversed_contents and r not in errors_by_refund
+            )
+            payloads = [
+                refund.source_transaction_id._faisapay_prepare_api_request_payload(
+                    const.API_REQUEST_TYPES['reversal'],
+                    refund.source_transaction_id.provider_reference,
+                ) for refund in refunds_to_send
+            ]
+            results = provider._faisapay_make_requests('reversalRequest', payloads)
+
+            # Apply the results of the delivered refunds in a single batch.
+            sent_refunds = self.browse()
+            refund_txs = self.env['payment.transaction']
+            response_contents = []
+            delivered = list(reversed_contents.items()) + [
+                (refund, response_content)
+                for refund, (response_content, error) in zip(refunds_to_send, results)
+                if not error
+            ]
+            for refund, response_content in delivered:
+                response_content.update(entity_type='refund', operation='refund')
+                sent_refunds += refund
+                refund_txs += refund.refund_transaction_id
+                response_contents.append(response_content)
+            handling_errors = refund_txs._faisapay_process_notification_data_batch(
+                response_contents
+            )
+            for refund, error in zip(sent_refunds, handling_errors):
+                if error:
+                    _logger.warning(
+                        "Unable to handle the response to the refund with reference %s: %s",
+                        refund.reference, error,
+                    )
+                    refund.write({'state': 'failed', 'sent_date': now, 'last_error': str(error)})
+                else:
+                    refund.write({'state': 'sent', 'sent_date': now, 'last_error': False})
+
+            for refund, (_response_content, error) in zip(refunds_to_send, results):
+                if error:
+                    errors_by_refund[refund] = error
+            for refund, error in errors_by_refund.items():
+                refund._schedule_retry(error)
+
+    def _check_reversed(self):
+        """ Request the status of the source transactions of the refunds to find the reversed ones.
+
+        :return: The status response of each refund whose payment is reversed, by refund, and the
+                 error of each refund whose status could not be checked, by refund.
+        :rtype: tuple(dict, dict)
+        """
+        reversed_contents, errors_by_refund = {}, {}
+        source_txs = self.env['payment.transaction'].browse(
+            [refund.source_transaction_id.id for refund in self]
+        )
+        for refund, (response_content, error) in zip(self, source_txs._faisapay_check_reversed()):
+            if error:
+                errors_by_refund[refund] = error
+            elif response_content:
+                _logger.info(
+                    "The refund with reference %s was already received by Faisapay.",
+                    refund.reference,
+                )
+                reversed_contents[refund] = response_content
+        return reversed_contents, errors_by_refund
+
+    def _schedule_retry(self, error):
+        """ Schedule the next delivery attempt of the refund with an exponential backoff, or give
+        up on it after too many attempts.
+
+        Note: self.ensure_one()
+
+        :param Exception error: The error raised by the last attempt.
+        :return: None
+        """
+        self.ensure_one()
+        if self.attempt_count >= const.REFUND_OUTBOX_MAX_ATTEMPTS:
+            _logger.error(
+                "Gave up delivering the refund with reference %s after %s attempts: %s",
+                self.reference, self.attempt_count, error,
+            )
+            self.write({'state': 'failed', 'last_error': str(error)})
+            self.refund_transaction_id._set_error(
+                "Faisapay: " + _("The refund could not be delivered: %s", error)
+            )
+            return
+
+        delay = min(
+            const.REFUND_OUTBOX_RETRY_DELAY * 2 ** (self.attempt_count - 1),
+            const.REFUND_OUTBOX_MAX_RETRY_DELAY,
+        )
+        _logger.warning(
+            "Unable to deliver the refund with reference %s, retrying in %s seconds: %s",
+            self.reference, delay, error,
+        )
+        self.write({
+            'next_attempt_date': fields.Datetime.now() + timedelta(seconds=delay),
+            'last_error': str(error),
+        })
+
+    def action_retry(self):
+        """ Queue the failed refunds for delivery again.
+
+        Their last error is kept so that the status of their payment is checked before sending the
+        reversal again, see `_deliver`.
+        """
+        self.filtered(lambda r: r.state == 'failed').write({
+            'state': 'pending', 'attempt_count': 0, 'next_attempt_date': fields.Datetime.now(),
+        })
+        self.env.ref('payment_faisapay.cron_faisapay_deliver_refunds')._trigger()
+
+    @api.model
+    def _get_metrics(self):
+        """ Return the depth of the outbox and the number of refunds that could not be delivered.
+
+        :return: The number of pending refunds, the age of the oldest one, and the number of failed
+                 refunds.
+        :rtype: dict
+        """
+        self.env.cr.execute(
+            """
+            SELECT COUNT(*) FILTER (WHERE state = 'pending'),
+                   EXTRACT(EPOCH FROM NOW() AT TIME ZONE 'UTC'
+                                      - MIN(queued_date) FILTER (WHERE state = 'pending')),
+                   COUNT(*) FILTER (WHERE state = 'failed')
+              FROM payment_faisapay_refund
+             WHERE state != 'sent'
+            """
+        )
+        depth, oldest_age, failed_count = self.env.cr.fetchone()
+        return {
+            'depth': depth,
+            'oldest_pending_age': float(oldest_age or 0),
+            'failed_count': failed_count,
+        }
+
+    @api.autovacuum
+    def _gc_delivered_refunds(self):
+        """ Delete the delivered refunds older than the retention period. """
+        retention_limit = fields.Datetime.now() - timedelta(days=const.REFUND_OUTBOX_RETENTION)
+        self.search([('state', '=', 'sent'), ('sent_date', '<', retention_limit)]).unlink()
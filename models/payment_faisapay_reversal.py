@@ -0,0 +1,135 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import time
+
+from odoo import _, api, fields, models
+
+from odoo.addons.payment_faisapay import const
+
+
+class PaymentFaisapayReversal(models.Model):
+    _name = 'payment.faisapay.reversal'
+    _description = "Faisapay Mass Reversal"
+    _order = 'id desc'
+
+    name = fields.Char(
+        string="Name",
+        required=True,
+        default=lambda self: _(
+            "Mass Reversal of %s", fields.Date.to_string(fields.Date.context_today(self))
+        ),
+    )
+    provider_id = fields.Many2one(
+        string="Provider",
+        comodel_name='payment.provider',
+        domain=[('code', '=', 'faisapay')],
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+    )
+    state = fields.Selection(
+        string="Status",
+        selection=[
+            ('draft', "Draft"),
+            ('running', "Running"),
+            ('done', "Done"),
+            ('partial', "Partially Failed"),
+        ],
+        default='draft',
+        required=True,
+        readonly=True,
+    )
+    max_concurrency = fields.Integer(
+        string="Max Concurrent Requests",
+        help="The maximum number of reversal requests in flight.",
+        default=const.DEFAULT_MAX_CONCURRENCY,
+    )
+    rate_limit = fields.Float(
+        string="Rate Limit",
+        help="The maximum number of reversal requests sent per second. Set 0 to disable the "
+             "limit.",
+        default=const.DEFAULT_RATE_LIMIT,
+    )
+    line_ids = fields.One2many(
+        string="Transactions", comodel_name='payment.faisapay.reversal.line',
+        inverse_name='reversal_id', readonly=True,
+    )
+    pending_count = fields.Integer(string="Pending", compute='_compute_line_counts')
+    done_count = fields.Integer(string="Reversed", compute='_compute_line_counts')
+    failed_count = fields.Integer(string="Failed", compute='_compute_line_counts')
+
+    #=== COMPUTE METHODS ===#
+
+    @api.depends('line_ids.state')
+    def _compute_line_counts(self):
+        groups = self.env['payment.faisapay.reversal.line'].read_group(
+            [('reversal_id', 'in', self.ids)], ['reversal_id', 'state'], ['reversal_id', 'state'],
+            lazy=False,
+        )
+        counts = {(group['reversal_id'][0], group['state']): group['__count'] for group in groups}
+        for reversal in self:
+            reversal.pending_count = counts.get((reversal.id, 'pending'), 0)
+            reversal.done_count = counts.get((reversal.id, 'done'), 0)
+            reversal.failed_count = counts.get((reversal.id, 'failed'), 0)
+
+    #=== ACTION METHODS ===#
+
+    def action_start(self):
+        """ Start the reversal, or resume it by retrying the failed transactions. """
+        reversals = self.filtered(lambda r: r.state in ('draft', 'partial'))
+        reversals.line_ids.filtered(lambda l: l.state == 'failed').write({'state': 'pending'})
+        reversals.state = 'running'
+        self.env.ref('payment_faisapay.cron_faisapay_process_reversals')._trigger()
+
+    def action_view_failed_lines(self):
+        """ Return the action opening the transactions that failed to be reversed. """
+        self.ensure_one()
+        return {
+            'name': _("Failed Reversals"),
+            'type': 'ir.actions.act_window',
+            'res_model': 'payment.faisapay.reversal.line',
+            'view_mode': 'tree',
+            'domain': [('reversal_id', '=', self.id), ('state', '=', 'failed')],
+        }
+
+    #=== BUSINESS METHODS ===#
+
+    @api.model
+    def _cron_process_reversals(self, batch_size=const.REVERSAL_BATCH_SIZE):
+        """ Reverse the pending transactions of the running reversals by committed batches.
+
+        If the processing takes too long, it is rescheduled to resume where it stopped. A reversal
+        whose transactions all failed or succeeded is marked as done or partially failed, and can
+        be resumed from the interface.
+
+        :param int batch_size: The number of transactions reversed and committed at once.
+        :return: None
+        """
+        start_time = time.monotonic()
+        Line = self.env['payment.faisapay.reversal.line']
+        for reversal in self.search([('state', '=', 'running')]):
+            while True:
+                lines = Line.search(
+                    [('reversal_id', '=', reversal.id), ('state', '=', 'pending')],
+                    limit=batch_size,
+                )
+                if not lines:
+                    reversal.state = 'partial' if reversal.failed_count else 'done'
+                    if not self.env.registry.in_test_mode():
+                        self.env.cr.commit()
+                    break
+
+                # Commit the attempt before sending the requests, so that the lines are checked
+                # rather than reversed again if the worker is interrupted while they are in flight.
+                lines._record_attempt()
+                if not self.env.registry.in_test_mode():
+                    self.env.cr.commit()
+                lines._reverse()
+
+                if not self.env.registry.in_test_mode():
+                    self.env.cr.commit()
+                self.env.invalidate_all()
+
+                if time.monotonic() - start_time > const.REVERSAL_TIME_LIMIT:
+                    self.env.ref('payment_faisapay.cron_faisapay_process_reversals')._trigger()
+                    return
@@ -0,0 +1,160 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+from collections import defaultdict
+
+from odoo import _, fields, models
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFaisapayReversalLine(models.Model):
+    _name = 'payment.faisapay.reversal.line'
+    _description = "Faisapay Mass Reversal Line"
+    _order = 'id'
+
+    reversal_id = fields.Many2one(
+        string="Reversal", comodel_name='payment.faisapay.reversal', required=True, readonly=True,
+        index=True, ondelete='cascade',
+    )
+    transaction_id = fields.Many2one(
+        string="Transaction", comodel_name='payment.transaction', required=True, readonly=True,
+        ondelete='cascade',
+    )
+    refund_transaction_id = fields.Many2one(
+        string="Refund Transaction", comodel_name='payment.transaction', readonly=True
+    )
+    reference = fields.Char(related='transaction_id.reference')
+    amount = fields.Monetary(related='transaction_id.amount')
+    currency_id = fields.Many2one(related='transaction_id.currency_id')
+    state = fields.Selection(
+        string="Status",
+        selection=[('pending', "Pending"), ('done', "Reversed"), ('failed', "Failed")],
+        default='pending',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    message = fields.Char(string="Message", readonly=True)
+    attempt_count = fields.Integer(string="Attempts", readonly=True)
+
+    #=== BUSINESS METHODS ===#
+
+    def _record_attempt(self):
+        """ Record that the reversal of the lines is attempted, before any request is sent.
+
+        The refund transactions of the lines are created here rather than when sending, so that
+        once the attempt is committed, a worker interrupted while the requests are in flight leaves
+        the lines recognizable as attempted: the next run checks their status before reversing
+        them again.
+
+        :return: None
+        """
+        for line in self:
+            line.attempt_count += 1
+            if not line.refund_transaction_id:
+                line.refund_transaction_id = line.transaction_id._create_refund_transaction()
+
+    def _reverse(self):
+        """ Send the reversal requests of the transactions and apply their results.
+
+        The requests are sent concurrently, within the limits of the reversal. The refund
+        transaction of a line is kept when its reversal request fails, so that resuming the
+        reversal reuses it rather than creating another one. A line attempted in a previous run
+        may have been reversed even if its outcome is unknown, e.g., after a timeout or an
+        interrupted run: the status of its payment is requested first, and the reversal is only
+        sent again if the payment is not reversed.
+
+        Note: all the lines must belong to the same reversal, and their attempt must be recorded
+        with `_record_attempt` first.
+
+        :return: None
+        """
+        reversal = self.reversal_id
+        reversal.ensure_one()
+
+        retried_lines = self.filtered(lambda l: l.attempt_count > 1)
+        retried_txs = self.env['payment.transaction'].browse(
+            [line.transaction_id.id for line in retried_lines]
+        )
+        contents_by_line, errors_by_line = {}, {}
+        for line, (response_content, error) in zip(
+            retried_lines, retried_txs._faisapay_check_reversed()
+        ):
+            if error:
+                errors_by_line[line] = error
+            elif response_content:
+                _logger.info(
+                    "The transaction with reference %s was already reversed by Faisapay.",
+                    line.transaction_id.reference,
+                )
+                contents_by_line[line] = response_content
+
+        # Failed refund transactions can't be confirmed anymore, replace them.
+        lines_to_refund = self.filtered(
+            lambda l: l.refund_transaction_id.state in (False, 'cancel', 'error')
+            and l not in errors_by_line
+        )
+        for line in lines_to_refund:
+            line.refund_transaction_id = line.transaction_id._create_refund_transaction()
+
+        lines_to_send = self.filtered(
+            lambda l: l not in contents_by_line and l not in errors_by_line
+        )
+        payloads = [
+            line.transaction_id._faisapay_prepare_api_request_payload(
+                const.API_REQUEST_TYPES['reversal'], line.transaction_id.provider_reference
+            ) for line in lines_to_send
+        ]
+        results = reversal.provider_id._faisapay_make_requests(
+            'reversalRequest',
+            payloads,
+            max_concurrency=reversal.max_concurrency,
+            rate_limit=reversal.rate_limit,
+        )
+        for line, (response_content, error) in zip(lines_to_send, results):
+            if error:
+                errors_by_line[line] = error
+            else:
+                contents_by_line[line] = response_content
+
+        # Apply the results of the successful requests in a single batch.
+        sent_lines = self.browse()
+        refund_txs = self.env['payment.transaction']
+        response_contents = []
+        for line, response_content in contents_by_line.items():
+            response_content.update(entity_type='refund', operation='refund')
+            sent_lines += line
+            refund_txs += line.refund_transaction_id
+            response_contents.append(response_content)
+        handling_errors = refund_txs._faisapay_process_notification_data_batch(response_contents)
+        errors_by_line.update(
+            (line, error) for line, error in zip(sent_lines, handling_errors) if error
+        )
+
+        done_lines = self.browse()
+        failed_lines_by_message = defaultdict(lambda: self.browse())
+        for line in self:
+            refund_tx = line.refund_transaction_id
+            error = errors_by_line.get(line)
+            if error:
+                _logger.warning(
+                    "Unable to reverse the transaction with reference %s: %s",
+                    line.transaction_id.reference, error,
+                )
+                failed_lines_by_message[str(error)] |= line
+            elif refund_tx.state == 'done':
+                done_lines |= line
+            elif refund_tx.state in ('draft', 'pending'):
+                # The refund transaction is being processed by another worker, which was handed
+                # the result. Retrying the line checks the status first and never reverses twice.
+                failed_lines_by_message[_("The result is processed in the background.")] |= line
+            else:
+                failed_lines_by_message[refund_tx.state_message or refund_tx.state] |= line
+
+        done_lines.write({'state': 'done', 'message': False})
+        for message, lines in failed_lines_by_message.items():
+            lines.write({'state': 'failed', 'message': message})
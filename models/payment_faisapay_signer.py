@@ -0,0 +1,86 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import models, tools
+
+from odoo.addons.payment_faisapay import signature as faisapay_signature
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+
+
+class PaymentFaisapaySigner(models.AbstractModel):
+    _name = 'payment.faisapay.signer'
+    _description = "Faisapay Signer"
+
+    #=== BUSINESS METHODS ===#
+
+    @tools.ormcache('self.id')
+    def _faisapay_get_signature_engine(self):
+        """ Return the signature engine of the signer's credentials.
+
+        The engine is cached until the credentials change, so that signing data doesn't read the
+        credentials nor hash them again. The credentials are those returned by the
+        `_faisapay_get_signing_credentials` method of the model inheriting from the signer.
+
+        Note: self.ensure_one()
+
+        :return: The signature engine.
+        :rtype: SignatureEngine
+        """
+        self.ensure_one()
+        return faisapay_signature.SignatureEngine(
+            *self.sudo()._faisapay_get_signing_credentials()
+        )
+
+    def _faisapay_calculate_pay_request_signature(self, data):
+        """ Compute the signature for the request according to the Faisapay documentation.
+
+        :param dict|bytes data: The data to sign.
+        :return: The calculated signature.
+        :rtype: str
+        """
+        with faisapay_utils.timed('signature', 'pay_request'):
+            return self._faisapay_get_signature_engine().sign('pay_request', data)
+
+    def _faisapay_calculate_api_request_signature(self, data):
+        """ Compute the signature for the api request according to the Faisapay documentation.
+            This can be a status request or a reversal/refund request
+
+        :param dict|bytes data: The data to sign.
+        :return: The calculated signature.
+        :rtype: str
+        """
+        with faisapay_utils.timed('signature', 'api_request'):
+            return self._faisapay_get_signature_engine().sign('api_request', data)
+
+    def _faisapay_calculate_signature(self, data, is_redirect=True):
+        """ Compute the signature for the request's data according to the Faisapay documentation.
+
+        The redirect data and the notification data are signed the same way.
+
+        :param dict|bytes data: The data to sign.
+        :param bool is_redirect: Whether the data should be treated as redirect data
+        :return: The calculated signature.
+        :rtype: str
+        """
+        with faisapay_utils.timed('signature', 'response'):
+            return self._faisapay_get_signature_engine().sign('response', data)
+
+    def _faisapay_sign_batch(self, kind, data_list):
+        """ Compute the signatures of many data at once.
+
+        :param str kind: The kind of signature: 'pay_request', 'api_request' or 'response'.
+        :param list data_list: The data to sign.
+        :return: The signatures, in the order of the data.
+        :rtype: list
+        """
+        return self._faisapay_get_signature_engine().sign_batch(kind, data_list)
+
+    def _faisapay_verify_batch(self, kind, data_list, signatures):
+        """ Check that the received signatures match the data.
+
+        :param str kind: The kind of signature: 'pay_request', 'api_request' or 'response'.
+        :param list data_list: The signed data.
+        :param list signatures: The received signatures, in the order of the data.
+        :return: Whether each signature is valid, in the order of the data.
+        :rtype: list
+        """
+        return self._faisapay_get_signature_engine().verify_batch(kind, data_list, signatures)
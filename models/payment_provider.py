@@ -1,24 +1,34 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-import hashlib
-import hmac
+import itertools
 import logging
-import pprint
-import base64
+import os
 
 import requests
 from werkzeug.urls import url_join
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import ValidationError
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
 from odoo.addons.payment_faisapay.const import SUPPORTED_CURRENCIES
 
 
 _logger = logging.getLogger(__name__)
 
+# Count the compatibility checks to only log a sample of them.
+_compatibility_checks = itertools.count()
+
+# The turn of the merchant accounts of each provider, by database and provider id.
+_merchant_turns = {}
+
+# The versions of the rendering settings, bumped each time they are read after the cache cleared.
+_rendering_settings_versions = itertools.count()
+
 
 class PaymentProvider(models.Model):
-    _inherit = 'payment.provider'
+    _name = 'payment.provider'
+    _inherit = ['payment.provider', 'payment.faisapay.signer']
 
     code = fields.Selection(
         selection_add=[('faisapay', "Faisapay")], ondelete={'faisapay': 'set default'}
@@ -39,9 +49,112 @@ class PaymentProvider(models.Model):
         required_if_provider='faisapay',
 
     )
+    faisapay_merchant_account_ids = fields.One2many(
+        string="Merchant Accounts",
+        help="The merchant accounts the transactions are spread over. The credentials above are "
+             "used when there is none.",
+        comodel_name='payment.faisapay.merchant',
+        inverse_name='provider_id',
+    )
+    faisapay_merchant_assignment = fields.Selection(
+        string="Merchant Assignment",
+        help="How new transactions are assigned to the merchant accounts: in turn, or to the "
+             "account with the fewest transactions in the last hour.",
+        selection=[('round_robin', "Round-Robin"), ('least_loaded', "Least Loaded")],
+        default='round_robin',
+        required=True,
+    )
+    faisapay_pool_size = fields.Integer(
+        string="Connection Pool Size",
+        help="The maximum number of connections kept alive with the Faisapay API per worker.",
+        default=const.DEFAULT_POOL_SIZE,
+    )
+    faisapay_connect_timeout = fields.Float(
+        string="Connection Timeout",
+        help="The number of seconds to wait for the connection with the Faisapay API.",
+        default=const.DEFAULT_CONNECT_TIMEOUT,
+    )
+    faisapay_read_timeout = fields.Float(
+        string="Read Timeout",
+        help="The number of seconds to wait for the response of the Faisapay API.",
+        default=const.DEFAULT_READ_TIMEOUT,
+    )
+    faisapay_max_retries = fields.Integer(
+        string="Max Retries",
+        help="The maximum number of retries of a failed connection or idempotent request.",
+        default=const.DEFAULT_MAX_RETRIES,
+    )
+    faisapay_max_concurrency = fields.Integer(
+        string="Max Concurrent Requests",
+        help="The maximum number of requests in flight per worker when many transactions are "
+             "handled at once.",
+        default=const.DEFAULT_MAX_CONCURRENCY,
+    )
+    faisapay_rate_limit = fields.Float(
+        string="Rate Limit",
+        help="The maximum number of requests per second sent per merchant account and per worker "
+             "when many transactions are handled at once. Set 0 to disable the limit.",
+        default=const.DEFAULT_RATE_LIMIT,
+    )
+    faisapay_circuit_state = fields.Selection(
+        string="Gateway Circuit",
+        help="Whether the requests to the API are sent (closed), rejected because the API failed "
+             "repeatedly (open), or probed with a single request (half-open) in the current "
+             "worker.",
+        selection=[('closed', "Closed"), ('open', "Open"), ('half_open', "Half-Open")],
+        compute='_compute_faisapay_circuit_state',
+    )
+    faisapay_api_url = fields.Char(
+        string="Custom API URL",
+        help="The URL of the API to use in test mode instead of the Faisapay test gateway, e.g., "
+             "the URL of a local gateway simulator.",
+    )
+    faisapay_deferred_processing = fields.Boolean(
+        string="Deferred Processing",
+        help="Only check the signature of the returning customers before redirecting them, and "
+             "process the payment results in the background.",
+    )
+    faisapay_queue_depth = fields.Integer(
+        string="Pending Notifications", compute='_compute_faisapay_queue_metrics'
+    )
+    faisapay_queue_latency = fields.Float(
+        string="Average Processing Latency",
+        help="The average number of seconds between the reception and the processing of the "
+             "notifications of the last hour.",
+        compute='_compute_faisapay_queue_metrics',
+    )
 
     
 
+    #=== CRUD METHODS ===#
+
+    @api.model_create_multi
+    def create(self, values_list):
+        """ Override of `base` to invalidate the cached compatibility of the currencies. """
+        providers = super().create(values_list)
+        self.clear_caches()
+        return providers
+
+    def write(self, values):
+        """ Override of `base` to invalidate the cached signature engines, credential index and
+        compatibility of the currencies. """
+        res = super().write(values)
+        if any(
+            field in values
+            for field in (
+                'code', 'state', 'faisapay_passcode', 'faisapay_merchant_id',
+                'faisapay_acquirer_id', 'faisapay_deferred_processing', 'faisapay_api_url',
+            )
+        ):
+            self.clear_caches()  # Invalidate the cache in all the workers.
+        return res
+
+    def unlink(self):
+        """ Override of `base` to invalidate the cached credential index. """
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
     #=== COMPUTE METHODS ===#
 
     def _compute_feature_support_fields(self):
@@ -52,6 +165,54 @@ class PaymentProvider(models.Model):
             'support_refund': 'full_only',
         })
 
+    def _compute_faisapay_queue_metrics(self):
+        faisapay_providers = self.filtered(lambda p: p.code == 'faisapay')
+        (self - faisapay_providers).update({'faisapay_queue_depth': 0, 'faisapay_queue_latency': 0})
+        if faisapay_providers:
+            metrics = self.env['payment.faisapay.notification'].sudo()._get_metrics()
+            faisapay_providers.update({
+                'faisapay_queue_depth': metrics['depth'],
+                'faisapay_queue_latency': metrics['avg_latency'],
+            })
+
+    def _compute_faisapay_circuit_state(self):
+        for provider in self:
+            provider.faisapay_circuit_state = provider.code == 'faisapay' and (
+                provider._faisapay_get_circuit_breaker().get_status()['state']
+            )
+
+    #=== ACTION METHODS ===#
+
+    def action_view_faisapay_notifications(self):
+        """ Return the action opening the queue of the Faisapay notifications. """
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'payment_faisapay.action_payment_faisapay_notification'
+        )
+
+    def action_view_faisapay_refunds(self):
+        """ Return the action opening the outbox of the Faisapay refunds. """
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'payment_faisapay.action_payment_faisapay_refund'
+        )
+
+    def action_view_faisapay_journal(self):
+        """ Return the action opening the journal of the exchanges with the gateway. """
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'payment_faisapay.action_payment_faisapay_journal'
+        )
+        action['domain'] = [('provider_id', '=', self.id)]
+        return action
+
+    def action_import_faisapay_settlement(self):
+        """ Return the action opening the import of a settlement file for the provider. """
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'payment_faisapay.action_payment_faisapay_settlement_import'
+        )
+        action['context'] = {'default_provider_id': self.id}
+        return action
+
     # === BUSINESS METHODS ===#
 
     @api.model
@@ -59,17 +220,27 @@ class PaymentProvider(models.Model):
         """ Override of `payment` to filter out Faisapay providers for unsupported currencies. """
         providers = super()._get_compatible_providers(*args, currency_id=currency_id, **kwargs)
 
-        currency = self.env['res.currency'].browse(currency_id).exists()
-        
-        _logger.info(
-            "Get compatible currency: Faisapay: currency %s",
-            currency.name
-        )
-        if currency and currency.name not in SUPPORTED_CURRENCIES:
+        if next(_compatibility_checks) % const.LOG_SAMPLING_RATE == 0:
+            _logger.debug("Get compatible currency: Faisapay: currency %s", currency_id)
+        if currency_id and not self._faisapay_is_currency_supported(currency_id):
             providers = providers.filtered(lambda p: p.code != 'faisapay')
 
         return providers
     
+    @api.model
+    @tools.ormcache('currency_id')
+    def _faisapay_is_currency_supported(self, currency_id):
+        """ Return whether the currency is supported by Faisapay.
+
+        The result is cached until the currencies or the providers change.
+
+        :param int currency_id: The currency to check, as a `res.currency` id.
+        :return: Whether the currency is supported, or doesn't exist.
+        :rtype: bool
+        """
+        currency = self.env['res.currency'].sudo().browse(currency_id).exists()
+        return not currency or currency.name in SUPPORTED_CURRENCIES
+
     def _faisapay_get_api_url(self):
         """ Return the URL of the API corresponding to the provider's state.
 
@@ -77,17 +248,31 @@ class PaymentProvider(models.Model):
         :rtype: str
         """
         self.ensure_one()
-        _logger.info(
-            "GETTING API URL FOR STATE: %s",
-            self.state
-        )
-
+        _logger.debug("Getting the API URL for state %s.", self.state)
 
         if self.state == 'enabled':
             return 'https://faisanet.mib.com.mv/pgv2/'
+        elif self.faisapay_api_url:  # 'test' with a local gateway, e.g., the simulator.
+            return self.faisapay_api_url
         else:  # 'test'
             return 'https://smarf.mib.com.mv/pgv2/'
 
+    @tools.ormcache('self.id')
+    def _faisapay_get_rendering_settings(self):
+        """ Return the URLs the redirect forms are built with, along with their version.
+
+        The settings are cached until the cache is cleared, e.g., when the credentials of the
+        provider or of its merchant accounts change: a new version is then assigned, so that the
+        redirect forms memoized with the previous one are signed again.
+
+        Note: self.ensure_one()
+
+        :return: The base URL of the website, the URL of the API and the version of the settings.
+        :rtype: tuple
+        """
+        self.ensure_one()
+        return self.get_base_url(), self._faisapay_get_api_url(), next(_rendering_settings_versions)
+
     def _faisapay_make_request(self, endpoint, payload=None, method='POST'):
         """ Make a request to Faisapay API at the specified endpoint.
         Note:Faisapay authentication is done using a
@@ -101,95 +286,299 @@ class PaymentProvider(models.Model):
         :param str method: The HTTP method of the request.
         :return The JSON-formatted content of the response.
         :rtype: dict
-        :raise ValidationError: If an HTTP error occurs.
+        :raise ValidationError: If an HTTP error occurs or if the API is temporarily unavailable.
         """
         self.ensure_one()
 
-        url = url_join(self._faisapay_get_api_url(), endpoint)
-        
-        
+        url, session, timeout, circuit_breaker = self._faisapay_prepare_request(endpoint)
+        Journal = self.env['payment.faisapay.journal'].sudo()
+        Journal._record(self, 'api_request', payload, endpoint=endpoint)
         try:
-            if method == 'GET':
-                response = requests.get(url, params=payload, timeout=10)
-            else:
-                response = requests.post(url, json=payload, timeout=10)
-                
-            try:
-                response.raise_for_status()
-            except requests.exceptions.HTTPError:
-                _logger.exception(
-                    "Invalid API request at %s with data:\n%s", url, pprint.pformat(payload),
+            with faisapay_utils.timed('http', endpoint):
+                response_content = faisapay_utils.send_request(
+                    session, url, payload=payload, method=method, timeout=timeout,
+                    circuit_breaker=circuit_breaker,
+                )
+            Journal._record(
+                self, 'api_response', response_content, endpoint=endpoint,
+                reference=payload and payload.get('orderID'),
+            )
+            return response_content
+        except (faisapay_utils.CircuitOpenError, requests.exceptions.RequestException) as error:
+            raise self._faisapay_get_request_error(url, payload, error)
+
+    def _faisapay_make_requests(
+        self, endpoint, payloads, method='POST', max_concurrency=None, rate_limit=None
+    ):
+        """ Make concurrent requests to Faisapay API at the specified endpoint.
+
+        The requests are sent by the asynchronous client of the provider and gathered before
+        returning, so that this method can be called from synchronous code, e.g., a cron.
+
+        Note: self.ensure_one()
+
+        :param str endpoint: The endpoint to be reached by the requests.
+        :param list payloads: The payloads of the requests.
+        :param str method: The HTTP method of the requests.
+        :param int max_concurrency: The maximum number of requests in flight.
+        :param float rate_limit: The maximum number of requests per second; 0 for no limit.
+        :return: The `(response_content, error)` pair of each request, in the order of the
+                 payloads, where `error` is a `ValidationError` if the request failed.
+        :rtype: list
+        """
+        self.ensure_one()
+
+        Journal = self.env['payment.faisapay.journal'].sudo()
+        for payload in payloads:
+            Journal._record(self, 'api_request', payload, endpoint=endpoint)
+        with self._faisapay_get_async_client(
+            endpoint, method=method, max_concurrency=max_concurrency, rate_limit=rate_limit
+        ) as client:
+            results = faisapay_utils.run_async(client.send_all(payloads))
+        for payload, (content, _error) in zip(payloads, results):
+            if content is not None:
+                Journal._record(
+                    self, 'api_response', content, endpoint=endpoint,
+                    reference=payload.get('orderID'),
                 )
-                raise ValidationError("Faisapay: " + _(
-                    "The communication with the API failed. Faisapay gave us the following "
-                    "information: '%s'", response.json().get('error', {}).get('description')
-                ))
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            _logger.exception("Unable to reach endpoint at %s", url)
-            raise ValidationError(
+        return [
+            (content, error and self._faisapay_get_request_error(client.url, payload, error))
+            for payload, (content, error) in zip(payloads, results)
+        ]
+
+    def _faisapay_get_async_client(
+        self, endpoint, method='POST', max_concurrency=None, rate_limit=None
+    ):
+        """ Return an asynchronous client sending requests to Faisapay API at the endpoint.
+
+        The requests are throttled according to the maximum concurrency and the rate limit of the
+        provider, unless others are given. The client must be closed after use, and its errors
+        mapped with `_faisapay_get_request_error`.
+
+        Note: self.ensure_one()
+
+        :param str endpoint: The endpoint to be reached by the requests.
+        :param str method: The HTTP method of the requests.
+        :param int max_concurrency: The maximum number of requests in flight.
+        :param float rate_limit: The maximum number of requests per second of each merchant; 0 for
+                                 no limit.
+        :return: The client.
+        :rtype: utils.AsyncClient
+        """
+        self.ensure_one()
+
+        url, session, timeout, circuit_breaker = self._faisapay_prepare_request(endpoint)
+        return faisapay_utils.AsyncClient(
+            session,
+            url,
+            method=method,
+            timeout=timeout,
+            circuit_breaker=circuit_breaker,
+            max_concurrency=(
+                max_concurrency or self.faisapay_max_concurrency or const.DEFAULT_MAX_CONCURRENCY
+            ),
+            base_url=self._faisapay_get_api_url(),
+            rate_limit=max(self.faisapay_rate_limit if rate_limit is None else rate_limit, 0),
+            endpoint=endpoint,
+        )
+
+    def _faisapay_prepare_request(self, endpoint):
+        """ Return the URL, the pooled session, the timeouts and the circuit breaker of a request to
+        the endpoint.
+
+        The read timeout is adapted by the circuit breaker to the recent latencies of the API,
+        within the configured timeout, when the request is sent.
+
+        Note: self.ensure_one()
+
+        :param str endpoint: The endpoint to be reached by the request.
+        :return: The URL, the session, the configured connect and read timeouts, and the circuit
+                 breaker.
+        :rtype: tuple
+        """
+        api_url = self._faisapay_get_api_url()
+        session = faisapay_utils.get_session(
+            api_url,
+            pool_size=self.faisapay_pool_size or const.DEFAULT_POOL_SIZE,
+            max_retries=max(self.faisapay_max_retries, 0),
+        )
+        circuit_breaker = self._faisapay_get_circuit_breaker()
+        timeout = (
+            self.faisapay_connect_timeout or const.DEFAULT_CONNECT_TIMEOUT,
+            self.faisapay_read_timeout or const.DEFAULT_READ_TIMEOUT,
+        )
+        return url_join(api_url, endpoint), session, timeout, circuit_breaker
+
+    def _faisapay_get_circuit_breaker(self):
+        """ Return the circuit breaker guarding the API of the provider in the current worker.
+
+        Note: self.ensure_one()
+
+        :return: The circuit breaker.
+        :rtype: utils.CircuitBreaker
+        """
+        self.ensure_one()
+        return faisapay_utils.get_circuit_breaker(
+            (self.env.cr.dbname, self.id, self._faisapay_get_api_url())
+        )
+
+    def _faisapay_get_request_error(self, url, payload, error):
+        """ Log the error of a failed request and return the error to raise to the user.
+
+        :param str url: The URL of the request.
+        :param dict payload: The payload of the request.
+        :param Exception error: The error raised while making the request.
+        :return: The error to raise.
+        :rtype: Exception
+        """
+        if isinstance(error, faisapay_utils.CircuitOpenError):
+            _logger.warning("Skipped request at %s: the API is considered unavailable.", url)
+            return ValidationError("Faisapay: " + _(
+                "The payment gateway is temporarily unavailable. Please try again in a few "
+                "minutes."
+            ))
+        elif isinstance(error, requests.exceptions.HTTPError):
+            _logger.error(
+                "Invalid API request at %s for reference %s.",
+                url, payload and payload.get('orderID'), exc_info=error,
+            )
+            try:
+                description = error.response.json().get('error', {}).get('description')
+            except ValueError:
+                description = error.response.reason
+            return ValidationError("Faisapay: " + _(
+                "The communication with the API failed. Faisapay gave us the following "
+                "information: '%s'", description
+            ))
+        elif isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            _logger.error("Unable to reach endpoint at %s", url, exc_info=error)
+            return ValidationError(
                 "Faisapay: " + _("Could not establish the connection to the API.")
             )
-        return response.json()
-    
-    def _faisapay_calculate_pay_request_signature(self, data):
-        """ Compute the signature for the request according to the Faisapay documentation.
+        elif isinstance(error, requests.exceptions.RequestException):
+            _logger.error("Invalid API response at %s", url, exc_info=error)
+            return ValidationError(
+                "Faisapay: " + _("The communication with the API failed.")
+            )
+        return error
 
+    def _faisapay_get_metrics(self):
+        """ Return the performance metrics of the provider collected by the current worker.
 
-        :param dict|bytes data: The data to sign.
-        :return: The calculated signature.
-        :rtype: str
-        """ 
-
-        merchant = self.faisapay_merchant_id    
-        acquirer = self.faisapay_acquirer_id
-        secret = self.faisapay_passcode  
-            
-        signing_string = f'{secret}{merchant}{acquirer}{data["orderID"]}{data["purchaseAmt"]}{data["purchaseCurrency"]}{data["purchaseCurrencyExponent"]}'
-        return base64.b64encode(hashlib.sha256(signing_string.encode('utf-8')).digest()).decode('ASCII')
+        Note: self.ensure_one()
+
+        :return: The timed spans, the connection statistics, the state of the circuit breaker, the
+                 number of skipped duplicate and rejected notifications, the metrics of the
+                 notification queue and of the refund outbox, the status of the journal writer and
+                 the load of the merchant accounts.
+        :rtype: dict
+        """
+        self.ensure_one()
+        return {
+            'pid': os.getpid(),
+            'spans': faisapay_utils.span_recorder.get_stats(),
+            'connections': self._faisapay_get_connection_stats(),
+            'circuit_breaker': self._faisapay_get_circuit_breaker().get_status(),
+            'duplicate_notifications': self.env[
+                'payment.transaction'
+            ]._faisapay_get_duplicate_notification_count(),
+            'rejected_notifications': faisapay_utils.rejection_counter.get_counts(),
+            'notification_queue': self.env['payment.faisapay.notification'].sudo()._get_metrics(),
+            'refund_outbox': self.env['payment.faisapay.refund'].sudo()._get_metrics(),
+            'journal': self.env['payment.faisapay.journal'].sudo()._get_writer_status(),
+            'merchant_accounts': self.sudo().faisapay_merchant_account_ids._get_stats(),
+        }
+
+    def _faisapay_get_connection_stats(self):
+        """ Return the statistics of the pooled connections to the API of the provider.
+
+        Note: self.ensure_one()
+
+        :return: The number of connections opened and reused, and of requests sent by the current
+                 worker process.
+        :rtype: dict
+        """
+        self.ensure_one()
+        return faisapay_utils.get_session_stats().get(
+            self._faisapay_get_api_url(), {'opened': 0, 'reused': 0, 'requests': 0}
+        )
     
-        
-        
-    def _faisapay_calculate_api_request_signature(self, data):
-        """ Compute the signature for the api request according to the Faisapay documentation.
-            This can be a status request or a reversal/refund request
+    @api.model
+    @tools.ormcache()
+    def _faisapay_get_credential_index(self):
+        """ Return the Faisapay providers by credentials.
 
+        The index is cached until the providers change so that, along with the cached signature
+        engines, the signature of a notification can be checked without querying the database.
 
-        :param dict|bytes data: The data to sign.
-        :return: The calculated signature.
-        :rtype: str
+        The archived merchant accounts are indexed too, as the transactions assigned to them
+        before they were archived are still notified with their credentials.
+
+        :return: The `(provider_id, deferred_processing, merchant_account_id)` triplets of the
+                 providers that are not disabled and of their merchant accounts, by
+                 `(merchant_id, acquirer_id)` pair. The account is None for the provider's own
+                 credentials.
+        :rtype: dict
         """
+        index = {}
+        for provider_sudo in self.sudo().search([
+            ('code', '=', 'faisapay'), ('state', '!=', 'disabled')
+        ]):
+            entry = (provider_sudo.id, provider_sudo.faisapay_deferred_processing)
+            index.setdefault(
+                (provider_sudo.faisapay_merchant_id, provider_sudo.faisapay_acquirer_id), []
+            ).append(entry + (None,))
+            accounts_sudo = provider_sudo.with_context(
+                active_test=False
+            ).faisapay_merchant_account_ids
+            for account_sudo in accounts_sudo:
+                index.setdefault(
+                    (account_sudo.merchant_id, account_sudo.acquirer_id), []
+                ).append(entry + (account_sudo.id,))
+        return {credentials: tuple(entries) for credentials, entries in index.items()}
 
-        merchant = self.faisapay_merchant_id
-        acquirer = self.faisapay_acquirer_id
-        secret = self.faisapay_passcode  
-            
-        signing_string = f'{secret}{merchant}{acquirer}{data["orderID"]}{data["requestType"]}'
-        return base64.b64encode(hashlib.sha256(signing_string.encode('utf-8')).digest()).decode('ASCII')
-   
-    
-    def _faisapay_calculate_signature(self, data, is_redirect=True):
-        """ Compute the signature for the request's data according to the Faisapay documentation.
+    def _faisapay_pick_merchant_accounts(self, count):
+        """ Return the merchant accounts to assign to new transactions of the provider.
 
+        In round-robin, the accounts take turns in each worker. Otherwise, each transaction goes to
+        the account with the fewest transactions in the load window, counting the transactions
+        assigned by this call.
 
-        :param dict|bytes data: The data to sign.
-        :param bool is_redirect: Whether the data should be treated as redirect data
-        :return: The calculated signature.
-        :rtype: str
+        Note: self.ensure_one()
+
+        Only the active accounts are assigned.
+
+        :param int count: The number of new transactions.
+        :return: The merchant account of each transaction; empty if the provider has none.
+        :rtype: list
         """
-        if is_redirect:
-            merchant = self.faisapay_merchant_id
-            aquirer = self.faisapay_acquirer_id
-            secret = self.faisapay_passcode
-            request_type = '0'; # request type 0 is payment
-            
-            signing_string = f'{request_type}{secret}{merchant}{aquirer}{data["orderID"]}{data["salt"]}'
-            return base64.b64encode(hashlib.sha256(signing_string.encode('utf-8')).digest()).decode('ASCII')
-        
-        else:  # Notification data.
-            merchant = self.faisapay_merchant_id
-            acquirer = self.faisapay_acquirer_id
-            secret = self.faisapay_passcode
-            request_type = '0'; # request type 0 is payment
-            
-            signing_string = f'{request_type}{secret}{merchant}{acquirer}{data["orderID"]}{data["salt"]}'
-            return base64.b64encode(hashlib.sha256(signing_string.encode('utf-8')).digest()).decode('ASCII')
+        self.ensure_one()
+        accounts = self.sudo().faisapay_merchant_account_ids
+        if not accounts:
+            return [accounts] * count
+
+        if self.faisapay_merchant_assignment == 'least_loaded':
+            loads = {
+                account_id: account_stats['tx_count']
+                for account_id, account_stats in accounts._get_stats().items()
+            }
+            picks = []
+            for _i in range(count):
+                account = min(accounts, key=lambda a: loads[a.id])
+                loads[account.id] += 1
+                picks.append(account)
+            return picks
+
+        turns = _merchant_turns.setdefault((self.env.cr.dbname, self.id), itertools.count())
+        return [accounts[next(turns) % len(accounts)] for _i in range(count)]
+
+    def _faisapay_get_signing_credentials(self):
+        """ Return the provider's credentials the Faisapay signatures are computed with.
+
+        Note: self.ensure_one()
+
+        :return: The passcode, merchant id and acquirer id.
+        :rtype: tuple
+        """
+        self.ensure_one()
+        return self.faisapay_passcode, self.faisapay_merchant_id, self.faisapay_acquirer_id
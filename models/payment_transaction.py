@@ -1,14 +1,21 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+import hashlib
 import logging
-import pprint
+import time
+from collections import defaultdict
+from datetime import timedelta
 
+from psycopg2.errors import SerializationFailure
 from werkzeug.urls import url_encode, url_join
 
-from odoo import _, models
-from odoo.exceptions import UserError, ValidationError
+from odoo import _, Command, api, fields, models
+from odoo.exceptions import MissingError, UserError, ValidationError
+from odoo.tools.lru import LRU
 
 from odoo.addons.payment import utils as payment_utils
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
 from odoo.addons.payment_faisapay.const import CURRENCY_MAPPING
 from odoo.addons.payment_faisapay.const import PAYMENT_STATUS_MAPPING
 from odoo.addons.payment_faisapay.controllers.main import FaisapayController
@@ -16,10 +23,152 @@ from odoo.addons.payment_faisapay.controllers.main import FaisapayController
 
 _logger = logging.getLogger(__name__)
 
+# The state of the transactions of each notification outcome.
+OUTCOME_STATES = {'done': 'done', 'reversed': 'done', 'cancelled': 'cancel', 'error': 'error'}
+
+# The ids of the recently resolved transactions, by database and reference.
+_tx_ids_by_reference = LRU(const.TX_REFERENCE_CACHE_SIZE)
+
+# The signed redirect forms of the recently rendered transactions, by database and transaction id,
+# along with the write date of the transaction and the version of the rendering settings of its
+# provider they were memoized with.
+_rendering_values_by_tx = LRU(const.RENDERING_VALUES_CACHE_SIZE)
+
+# The keys of the recently handled notifications, to skip their duplicates.
+_handled_notification_keys = faisapay_utils.ExpiringKeySet(
+    const.NOTIFICATION_DEDUPLICATION_CAPACITY, const.NOTIFICATION_DEDUPLICATION_RETENTION
+)
+
 
 class PaymentTransaction(models.Model):
     _inherit = 'payment.transaction'
 
+    # Indexed to reconcile the transactions with the settlement files.
+    provider_reference = fields.Char(index='btree_not_null')
+    faisapay_merchant_account_id = fields.Many2one(
+        string="Faisapay Merchant Account",
+        help="The merchant account the transaction is processed with. The credentials of the "
+             "provider are used if it is empty.",
+        comodel_name='payment.faisapay.merchant',
+        readonly=True,
+        index='btree_not_null',
+        ondelete='restrict',
+    )
+    faisapay_rendering_values = fields.Json(
+        string="Pre-signed Redirect Values", readonly=True, copy=False, groups='base.group_system'
+    )
+    faisapay_rendering_fingerprint = fields.Char(
+        string="Pre-signed Redirect Fingerprint", readonly=True, copy=False
+    )
+    faisapay_payment_link = fields.Char(
+        string="Faisapay Payment Link",
+        help="The link redirecting the customer to Faisapay with the pre-signed payment request.",
+        compute='_compute_faisapay_payment_link',
+    )
+    faisapay_refund_state = fields.Selection(
+        string="Refund Delivery",
+        help="The delivery of the refund request to Faisapay, which is sent in the background.",
+        selection=[('pending', "Pending"), ('sent', "Delivered"), ('failed', "Failed")],
+        compute='_compute_faisapay_refund_state',
+    )
+    faisapay_refund_error = fields.Char(
+        string="Refund Delivery Error", compute='_compute_faisapay_refund_state'
+    )
+
+    #=== COMPUTE METHODS ===#
+
+    @api.depends('reference', 'faisapay_rendering_fingerprint')
+    def _compute_faisapay_payment_link(self):
+        for tx in self:
+            if tx.faisapay_rendering_fingerprint:
+                access_token = payment_utils.generate_access_token(tx.id, tx.reference)
+                tx.faisapay_payment_link = url_join(
+                    tx.provider_id.get_base_url(),
+                    f'{FaisapayController._pay_url}/{tx.id}?'
+                    f'{url_encode({"access_token": access_token})}',
+                )
+            else:
+                tx.faisapay_payment_link = False
+
+    def _compute_faisapay_refund_state(self):
+        refunds_by_tx = {
+            refund.refund_transaction_id: refund
+            for refund in self.env['payment.faisapay.refund'].sudo().search(
+                [('refund_transaction_id', 'in', self.ids)]
+            )
+        }
+        for tx in self:
+            refund = refunds_by_tx.get(tx)
+            tx.faisapay_refund_state = refund.state if refund else False
+            tx.faisapay_refund_error = refund.last_error if refund else False
+
+    #=== CRUD METHODS ===#
+
+    @api.model_create_multi
+    def create(self, values_list):
+        """ Override of `payment` to assign the Faisapay transactions to a merchant account. """
+        txs = super().create(values_list)
+        txs.filtered(
+            lambda tx: tx.provider_code == 'faisapay' and not tx.faisapay_merchant_account_id
+        )._faisapay_assign_merchant_accounts()
+        return txs
+
+    def write(self, values):
+        """ Override of `payment` to forget the memoized redirect forms signed from the values.
+
+        The write date, which the memoized forms are checked against, is the start date of the
+        database transaction: it doesn't change when a transaction is written twice in the same one.
+        """
+        if any(field in values for field in const.RENDERING_SIGNED_FIELDS):
+            for tx_id in self.ids:
+                try:
+                    _rendering_values_by_tx.pop((self.env.cr.dbname, tx_id))
+                except KeyError:  # Not memoized, or already evicted by another thread.
+                    pass
+        return super().write(values)
+
+    #=== ACTION METHODS ===#
+
+    def action_faisapay_mass_reversal(self):
+        """ Create a mass reversal of the confirmed Faisapay payments and open it.
+
+        :return: The action opening the created reversals.
+        :rtype: dict
+        """
+        txs = self.filtered(
+            lambda tx: tx.provider_code == 'faisapay'
+            and tx.state == 'done'
+            and tx.operation != 'refund'
+            and tx.provider_reference
+            and not tx.child_transaction_ids.filtered(
+                lambda child: child.operation == 'refund' and child.state not in ('cancel', 'error')
+            )
+        )
+        if not txs:
+            raise UserError(_("There is no confirmed Faisapay payment to reverse."))
+
+        reversals = self.env['payment.faisapay.reversal'].create([{
+            'provider_id': provider.id,
+            'max_concurrency': provider.faisapay_max_concurrency,
+            'rate_limit': provider.faisapay_rate_limit,
+            'line_ids': [
+                Command.create({'transaction_id': tx.id})
+                for tx in txs.filtered(lambda tx: tx.provider_id == provider)
+            ],
+        } for provider in txs.provider_id])
+        action = {
+            'name': _("Mass Reversal"),
+            'type': 'ir.actions.act_window',
+            'res_model': 'payment.faisapay.reversal',
+        }
+        if len(reversals) == 1:
+            action.update(view_mode='form', res_id=reversals.id)
+        else:
+            action.update(view_mode='tree,form', domain=[('id', 'in', reversals.ids)])
+        return action
+
+    #=== BUSINESS METHODS ===#
+
     def _get_specific_rendering_values(self, processing_values):
         """ Override of `payment` to return faisapay-specific rendering values.
 
@@ -34,55 +183,147 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'faisapay':
             return res
 
-        # Faisapay requires amount to be sent without decimal places. We use 2 digit currency exponent 
-        # & multiply the amount by 100 to remove the decimal place
-        # Initiate the payment
-        currency_exponent = 2
-        converted_amount = int(self.amount * 100);  #remove the decimals from the amount
-        version = FaisapayController._version
-        
-        
-        
-        
-        _logger.info(
-                    "Returning Payment Request Rendering values for(PROVIDER ID)%s:\n(values)%s",
-                    self.provider_id, pprint.pformat(processing_values),
+        with faisapay_utils.timed('total', 'rendering'):
+            _logger.debug(
+                "Returning the rendering values of transaction %s with provider %s.",
+                self.reference, self.provider_id.id,
+            )
+            provider = self.provider_id
+            base_url, api_url, settings_version = provider._faisapay_get_rendering_settings()
+            cache_key = (self.env.cr.dbname, self.id)
+            cached = _rendering_values_by_tx.get(cache_key)
+            if cached and cached[0] == (self.write_date, settings_version):
+                return dict(cached[1])
+
+            fingerprint = self._faisapay_get_rendering_fingerprint(base_url, api_url)
+            if self.faisapay_rendering_fingerprint == fingerprint:
+                rendering_values = self.sudo().faisapay_rendering_values
+            else:
+                rendering_values = self._faisapay_prepare_rendering_values(base_url, api_url)
+                self.env['payment.faisapay.journal'].sudo()._record(
+                    self.provider_id, 'pay_request', rendering_values
                 )
-        
-       
-        #convert currency to ISO 4217 numeric 3-digit code
-        currency_code_numeric = CURRENCY_MAPPING[self.currency_id.name]
-        
-        base_url = self.provider_id.get_base_url()
+                if self.faisapay_rendering_fingerprint:  # Pre-signed from outdated values.
+                    self.sudo().write({
+                        'faisapay_rendering_values': rendering_values,
+                        'faisapay_rendering_fingerprint': fingerprint,
+                    })
+            _rendering_values_by_tx[cache_key] = (
+                (self.write_date, settings_version), rendering_values
+            )
+            return dict(rendering_values)
+
+    def _faisapay_get_rendering_fingerprint(self, base_url, api_url):
+        """ Return the fingerprint of the values that the redirect form is signed from.
+
+        The fingerprint changes whenever the signed form would, e.g., when the amount or the
+        credentials of the provider change, and doesn't reveal the credentials.
+
+        Note: self.ensure_one()
+
+        :param str base_url: The base URL of the website the customer returns to.
+        :param str api_url: The URL of the API of the provider.
+        :return: The fingerprint.
+        :rtype: str
+        """
+        self.ensure_one()
+        return hashlib.sha256(repr((
+            self.amount,
+            self.currency_id.name,
+            self.reference,
+            self._faisapay_get_credentials(),
+            base_url,
+            api_url,
+        )).encode()).hexdigest()
+
+    def _faisapay_prepare_rendering_values(self, base_url, api_url):
+        """ Return the signed values of the form redirecting the customer to Faisapay.
+
+        Note: self.ensure_one()
+
+        :param str base_url: The base URL of the website the customer returns to.
+        :param str api_url: The URL of the API of the provider.
+        :return: The signed rendering values.
+        :rtype: dict
+        """
+        rendering_values = self._faisapay_get_unsigned_rendering_values(base_url, api_url)
+        merchant = self._faisapay_get_merchant()
+        rendering_values['signature'] = merchant._faisapay_calculate_pay_request_signature(
+            rendering_values
+        )
+        return rendering_values
+
+    def _faisapay_get_unsigned_rendering_values(self, base_url, api_url):
+        """ Return the values of the form redirecting the customer to Faisapay, without signature.
+
+        Note: self.ensure_one()
+
+        :param str base_url: The base URL of the website the customer returns to.
+        :param str api_url: The URL of the API of the provider.
+        :return: The rendering values to sign.
+        :rtype: dict
+        """
+        self.ensure_one()
         return_url_params = {'reference': self.reference}
-        passcode = self.provider_id.faisapay_passcode
-        
-
-        rendering_values = {
-            'api_url': self.provider_id._faisapay_get_api_url(),
-            'version': version,
-            'merID': self.provider_id.faisapay_merchant_id,
-            'acqID': self.provider_id.faisapay_acquirer_id,
+        _passcode, merchant_id, acquirer_id = self._faisapay_get_credentials()
+        return {
+            'api_url': api_url,
+            'version': FaisapayController._version,
+            'merID': merchant_id,
+            'acqID': acquirer_id,
             'orderID': self.reference,
-            'purchaseAmt': converted_amount,
-            'purchaseCurrency': currency_code_numeric,
-            'purchaseCurrencyExponent': currency_exponent,
+            # Faisapay requires the amount to be sent without decimal places. We use a 2-digit
+            # currency exponent and multiply the amount by 100 to remove the decimals.
+            'purchaseAmt': int(self.amount * 100),
+            # Convert the currency to its ISO 4217 numeric 3-digit code.
+            'purchaseCurrency': CURRENCY_MAPPING[self.currency_id.name],
+            'purchaseCurrencyExponent': 2,
             'signatureMethod': 'SHA256',
             'merRespURL': url_join(
                 base_url, f'{FaisapayController._return_url}?{url_encode(return_url_params)}'
             ),
         }
-        
-        rendering_values.update({
-            'signature': self.provider_id._faisapay_calculate_pay_request_signature(rendering_values)
-        })
-        
-        return rendering_values
+
+    def _faisapay_presign_rendering_values(self):
+        """ Sign the redirect forms of the transactions ahead of the customers' first click.
+
+        The forms are signed by batches per merchant account and stored with the fingerprint of the
+        values they were signed from, so that they are served without signing again until one of
+        those values changes; see `_get_specific_rendering_values`.
+
+        :return: None
+        """
+        txs_by_merchant = defaultdict(lambda: self.browse())
+        for tx in self.filtered(lambda tx: tx.provider_code == 'faisapay'):
+            txs_by_merchant[tx._faisapay_get_merchant()] |= tx
+        Journal = self.env['payment.faisapay.journal'].sudo()
+        for merchant, merchant_txs in txs_by_merchant.items():
+            provider = merchant_txs.provider_id
+            base_url, api_url, _settings_version = provider._faisapay_get_rendering_settings()
+            rendering_values_list = [
+                tx._faisapay_get_unsigned_rendering_values(base_url, api_url)
+                for tx in merchant_txs
+            ]
+            signatures = merchant._faisapay_sign_batch('pay_request', rendering_values_list)
+            for tx, rendering_values, signature in zip(
+                merchant_txs, rendering_values_list, signatures
+            ):
+                rendering_values['signature'] = signature
+                tx.sudo().write({
+                    'faisapay_rendering_values': rendering_values,
+                    'faisapay_rendering_fingerprint': tx._faisapay_get_rendering_fingerprint(
+                        base_url, api_url
+                    ),
+                })
+                Journal._record(provider, 'pay_request', rendering_values)
 
 
 
     def _send_refund_request(self, amount_to_refund=None):
-        """ Override of `payment` to send a refund request to Faisapay.
+        """ Override of `payment` to queue a refund request to Faisapay.
+
+        The request is delivered in the background by the refund outbox, so that a slow or
+        unavailable gateway neither blocks the user nor leaves the refund half-created.
 
         Note: self.ensure_one()
 
@@ -94,45 +335,89 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'faisapay':
             return refund_tx
 
-        # Make the refund request to Faisapay.
+        self.env['payment.faisapay.refund'].sudo()._enqueue(refund_tx)
 
-        version = FaisapayController._version
-        requestType = 2
+        return refund_tx
 
-        payload = {
-            'responseFormat': 'JSON',
-            'version': version,
-            'merID': self.provider_id.faisapay_merchant_id,
-            'acqID': self.provider_id.faisapay_acquirer_id,
-            'requestType': requestType,
-            'orderID': self.provider_reference,
-            'signatureMethod': 'SHA256'
-        }
+    def _faisapay_assign_merchant_accounts(self):
+        """ Assign the transactions to the merchant accounts of their provider.
 
-        payload.update({
-            'signature': self.provider_id._faisapay_calculate_api_request_signature(payload)
-        })
+        The refunds and the other child transactions are processed with the merchant account of
+        their source transaction, whose payment only that account knows about.
 
+        :return: None
+        """
+        txs_by_account = defaultdict(lambda: self.browse())
+        child_txs = self.filtered('source_transaction_id')
+        for tx in child_txs:
+            txs_by_account[tx.source_transaction_id.faisapay_merchant_account_id] |= tx
+        for provider in (self - child_txs).provider_id:
+            provider_txs = (self - child_txs).filtered(lambda tx: tx.provider_id == provider)
+            accounts = provider._faisapay_pick_merchant_accounts(len(provider_txs))
+            for tx, account in zip(provider_txs, accounts):
+                txs_by_account[account] |= tx
+        for account, txs in txs_by_account.items():
+            if account:
+                txs.write({'faisapay_merchant_account_id': account.id})
+
+    def _faisapay_get_merchant(self):
+        """ Return the record holding the credentials of the transaction.
+
+        Both the merchant accounts and the providers compute the Faisapay signatures with their own
+        credentials, through the same methods.
 
-        _logger.info(
-            "Payload of Faisapay 'reversalRequest' for transaction with reference %s:\n%s",
-            self.reference, pprint.pformat(payload)
-        )
+        Note: self.ensure_one()
 
-        response_content = refund_tx.provider_id._faisapay_make_request(
-            'reversalRequest', payload=payload
-        )
+        :return: The merchant account of the transaction, or its provider if it has none.
+        :rtype: recordset of `payment.faisapay.merchant` or `payment.provider`
+        """
+        self.ensure_one()
+        return self.faisapay_merchant_account_id or self.provider_id
+
+    def _faisapay_get_credentials(self):
+        """ Return the credentials the transaction is signed with.
 
-        _logger.info(
-            "Response of Faisapay 'reversalRequest' for transaction with reference %s:\n%s",
-            self.reference, pprint.pformat(response_content)
+        Note: self.ensure_one()
+
+        :return: The passcode, the merchant id and the acquirer id.
+        :rtype: tuple
+        """
+        self.ensure_one()
+        account_sudo = self.sudo().faisapay_merchant_account_id
+        if account_sudo:
+            return account_sudo.passcode, account_sudo.merchant_id, account_sudo.acquirer_id
+        provider_sudo = self.sudo().provider_id
+        return (
+            provider_sudo.faisapay_passcode,
+            provider_sudo.faisapay_merchant_id,
+            provider_sudo.faisapay_acquirer_id,
         )
 
-        response_content.update(entity_type='refund')
-        response_content.update(operation='refund')
-        refund_tx._handle_notification_data('faisapay', response_content) #NOT SURE WHERE THIS GOES YET
+    def _faisapay_prepare_api_request_payload(self, request_type, order_id):
+        """ Prepare the signed payload of a Faisapay API request for the transaction.
 
-        return refund_tx
+        Note: self.ensure_one()
+
+        :param int request_type: The type of the API request, as defined in `API_REQUEST_TYPES`.
+        :param str order_id: The order ID of the transaction, as known by Faisapay.
+        :return: The signed payload.
+        :rtype: dict
+        """
+        self.ensure_one()
+
+        _passcode, merchant_id, acquirer_id = self._faisapay_get_credentials()
+        payload = {
+            'responseFormat': 'JSON',
+            'version': FaisapayController._version,
+            'merID': merchant_id,
+            'acqID': acquirer_id,
+            'requestType': request_type,
+            'orderID': order_id,
+            'signatureMethod': 'SHA256'
+        }
+        merchant = self._faisapay_get_merchant()
+        payload.update({'signature': merchant._faisapay_calculate_api_request_signature(payload)})
+        return payload
     
 
     def _send_capture_request(self):
@@ -178,16 +463,12 @@ class PaymentTransaction(models.Model):
         if provider_code != 'faisapay' or len(tx) == 1:
             return tx
 
-        _logger.info(
-            "_get_tx_from_notification_data (notification_data)%s",
-            notification_data
-        )
-
         reference = notification_data.get('orderID')
         if not reference:
             raise ValidationError("Faisapay: " + _("Received data with missing reference."))
 
-        tx = self.search([('reference', '=', reference), ('provider_code', '=', 'faisapay')])
+        with faisapay_utils.timed('orm_lookup', 'notification'):
+            tx = self._faisapay_search_by_reference(reference)
 
         if not tx:
             raise ValidationError(
@@ -197,6 +478,140 @@ class PaymentTransaction(models.Model):
         return tx
 
 
+    def _handle_notification_data(self, provider_code, notification_data):
+        """ Override of `payment` to skip the exact duplicates of handled Faisapay notifications.
+
+        Customers refreshing the return page, browsers replaying the POST and the gateway sending
+        the same result again all produce exact copies of an already handled notification. Those
+        are skipped before any write on the transaction. The notifications of a transaction being
+        processed by another worker are queued rather than waiting for it, see `_faisapay_claim`.
+
+        :param str provider_code: The code of the provider handling the transaction.
+        :param dict notification_data: The notification data sent by the provider.
+        :return: The transaction concerned by the notification.
+        :rtype: recordset of `payment.transaction`
+        """
+        if provider_code != 'faisapay':
+            return super()._handle_notification_data(provider_code, notification_data)
+
+        notification_key = self._faisapay_get_notification_key(notification_data)
+        if notification_key and _handled_notification_keys.check(notification_key):
+            _logger.info(
+                "Skipped the duplicate notification for the transaction with reference %s.",
+                notification_data.get('orderID'),
+            )
+            return self._get_tx_from_notification_data(provider_code, notification_data)
+
+        tx = self._get_tx_from_notification_data(provider_code, notification_data)
+        if not tx._faisapay_claim():
+            _logger.info(
+                "Queued the notification for the transaction with reference %s, which is being "
+                "processed by another worker.", tx.reference,
+            )
+            self.env['payment.faisapay.notification'].sudo()._enqueue(
+                tx.reference, notification_data
+            )
+            return tx
+
+        tx = super()._handle_notification_data(provider_code, notification_data)
+        if notification_key:
+            # Only remember the notification once its effects are committed.
+            self.env.cr.postcommit.add(lambda: _handled_notification_keys.add(notification_key))
+        return tx
+
+    def _faisapay_claim(self):
+        """ Lock the rows of the transactions that no other worker is processing, without waiting.
+
+        The rows locked by another worker are skipped. So are the rows that another worker changed
+        since the start of the current database transaction, as writing them would fail with a
+        serialization error and make Odoo retry the whole request.
+
+        :return: The claimed transactions.
+        :rtype: recordset of `payment.transaction`
+        """
+        if not self:
+            return self
+        claimed_ids = self._faisapay_lock_rows(self.ids)
+        if claimed_ids is None:  # A row was changed concurrently, claim the others one by one.
+            claimed_ids = set()
+            if len(self) > 1:
+                for tx_id in self.ids:
+                    claimed_ids |= self._faisapay_lock_rows([tx_id]) or set()
+        return self.filtered(lambda tx: tx.id in claimed_ids)
+
+    def _faisapay_lock_rows(self, tx_ids):
+        """ Lock the rows of the transactions that are not locked by another worker.
+
+        :param list tx_ids: The transactions to lock, as `payment.transaction` ids.
+        :return: The ids of the locked transactions, or None if a row was changed concurrently.
+        :rtype: set|None
+        """
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    "SELECT id FROM payment_transaction WHERE id IN %s FOR UPDATE SKIP LOCKED",
+                    [tuple(tx_ids)],
+                    log_exceptions=False,
+                )
+                return {row[0] for row in self.env.cr.fetchall()}
+        except SerializationFailure:
+            return None
+
+    def _faisapay_get_notification_key(self, notification_data):
+        """ Return the key identifying the exact copies of the notification data.
+
+        :param dict notification_data: The notification data sent by Faisapay.
+        :return: The key, or None if the notification carries no result.
+        :rtype: tuple|None
+        """
+        if not notification_data.get('responseCode'):
+            return None
+        return (self.env.cr.dbname,) + tuple(
+            notification_data.get(key)
+            for key in ('orderID', 'referenceNo', 'responseCode', 'reasonCode', 'salt')
+        )
+
+    @api.model
+    def _faisapay_get_duplicate_notification_count(self):
+        """ Return the number of duplicate notifications skipped by the current worker.
+
+        :return: The number of skipped duplicates.
+        :rtype: int
+        """
+        return _handled_notification_keys.hit_count
+
+    def _faisapay_search_by_reference(self, reference):
+        """ Return the Faisapay transaction with the given reference.
+
+        The transaction is looked up through the unique index on the reference, without joining
+        the provider, and its id is kept in a bounded in-process cache since the browser return
+        and its retries all look up the same reference within seconds.
+
+        :param str reference: The reference of the transaction.
+        :return: The transaction, if any.
+        :rtype: recordset of `payment.transaction`
+        """
+        cache_key = (self.env.cr.dbname, reference)
+        tx_id = _tx_ids_by_reference.get(cache_key)
+        if tx_id:
+            tx = self.browse(tx_id)
+            try:
+                if tx.reference == reference:  # Fetch the transaction by its primary key.
+                    return tx
+            except MissingError:
+                pass
+            try:
+                _tx_ids_by_reference.pop(cache_key)
+            except KeyError:  # Already evicted by another thread.
+                pass
+
+        tx = self.search([('reference', '=', reference)], limit=1).filtered(
+            lambda t: t.provider_code == 'faisapay'
+        )
+        if tx:
+            _tx_ids_by_reference[cache_key] = tx.id
+        return tx
+
     def _process_notification_data(self, notification_data):
         """ Override of `payment` to process the transaction based on Faisapay data.
 
@@ -209,18 +624,84 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'faisapay':
             return
 
-        _logger.info(
-            "_process_notification_data (PROVIDER ID)%s:\n(notification_data)%s",
-            self.provider_id, pprint.pformat(notification_data),
-        )
+        outcome = self._faisapay_get_notification_outcome(notification_data)
+        self._faisapay_apply_outcomes({outcome: self})
+
+    def _faisapay_process_notification_data_batch(self, notification_data_list):
+        """ Process many Faisapay notifications at once and execute the callbacks.
+
+        The transactions are grouped by outcome so that each state change is applied once per
+        group, and the post-processing of the reversed payments is triggered at most once. The
+        exact duplicates of handled notifications are skipped, and the notifications of the
+        transactions being processed by another worker are queued, as in
+        `_handle_notification_data`.
+
+        :param list notification_data_list: The notification data sent by Faisapay for each
+                                            transaction, in the order of the transactions.
+        :return: The error raised by each notification, or None if it was processed, in the order
+                 of the transactions.
+        :rtype: list
+        """
+        txs_by_outcome = defaultdict(lambda: self.browse())
+        errors = []
+        claimed_txs = self._faisapay_claim()
+        deferred_notifications = []
+        for tx, notification_data in zip(self, notification_data_list):
+            notification_key = tx._faisapay_get_notification_key(notification_data)
+            if notification_key and _handled_notification_keys.check(notification_key):
+                _logger.info(
+                    "Skipped the duplicate notification for the transaction with reference %s.",
+                    tx.reference,
+                )
+                errors.append(None)
+                continue
+            if tx not in claimed_txs:
+                deferred_notifications.append((tx.reference, notification_data))
+                errors.append(None)
+                continue
+            try:
+                outcome = tx._faisapay_get_notification_outcome(notification_data)
+            except ValidationError as error:
+                errors.append(error)
+                continue
+            txs_by_outcome[outcome] |= tx
+            if notification_key:
+                self.env.cr.postcommit.add(
+                    lambda key=notification_key: _handled_notification_keys.add(key)
+                )
+            errors.append(None)
+
+        if deferred_notifications:
+            _logger.info(
+                "Queued %d notifications for transactions being processed by another worker.",
+                len(deferred_notifications),
+            )
+            self.env['payment.faisapay.notification'].sudo()._enqueue_batch(
+                deferred_notifications
+            )
+        self._faisapay_apply_outcomes(txs_by_outcome)
+        self.browse().union(*txs_by_outcome.values())._execute_callback()
+        return errors
+
+    def _faisapay_get_notification_outcome(self, notification_data):
+        """ Check the notification data, save the provider reference and return the outcome.
+
+        Note: self.ensure_one()
+
+        :param dict notification_data: The notification data sent by Faisapay.
+        :return: The outcome of the notification, as a `(status, error_message)` pair where the
+                 status is a key of `PAYMENT_STATUS_MAPPING` or 'error'.
+        :rtype: tuple
+        :raise ValidationError: If the response or reason code is missing.
+        """
+        self.ensure_one()
 
         provider_reference = notification_data.get('referenceNo')
         response_code = notification_data.get('responseCode')
         reason_code = notification_data.get('reasonCode')
         reason_text = notification_data.get('reasonText')
-        merchant_check = notification_data.get('merchantCheck')
 
-        if provider_reference:
+        if provider_reference and provider_reference != self.provider_reference:
             self.provider_reference = provider_reference
 
         if not response_code:
@@ -229,21 +710,181 @@ class PaymentTransaction(models.Model):
         if not reason_code:
             raise ValidationError("Faisapay: " + _("Received data with missing reason code."))
 
-        if not merchant_check and response_code == '1' and reason_code in PAYMENT_STATUS_MAPPING['done']:
-            self._set_done()
-        elif not merchant_check and response_code == '1' and reason_code in PAYMENT_STATUS_MAPPING['reversed']:
-            self._set_done()
+        if response_code == '1' and reason_code in PAYMENT_STATUS_MAPPING['done']:
+            return 'done', None
+        elif response_code == '1' and reason_code in PAYMENT_STATUS_MAPPING['reversed']:
+            return 'reversed', None
+        elif response_code == '2' and reason_code in PAYMENT_STATUS_MAPPING['cancelled']:
+            return 'cancelled', None
+        _logger.warning(
+            "Received data with error code for transaction with reference %s (response code %s "
+            "and reason code %s).", self.reference, response_code, reason_code,
+        )
+        return 'error', "Faisapay: " + _(
+            "An error occurred during the processing response code: %s,reason code %s, reason "
+            "desc: %s ", response_code, reason_code, reason_text
+        )
 
-            # Immediately post-process the transaction if it is a refund, as the post-processing
-            # will not be triggered by a customer browsing the transaction from the portal.
-            self.env.ref('payment.cron_post_process_payment_tx')._trigger()
-        elif not merchant_check and response_code == '2' and reason_code in PAYMENT_STATUS_MAPPING['cancelled']:
-            self._set_canceled()
-        else:
-            _logger.warning(
-                "Received data with error code (%s) for transaction with primary"
-                "(response code %s) and (reason code %s).", response_code, reason_code, self.reference
-            )
-            self._set_error("Faisapay: " + _("An error occurred during the processing "
-                                             "response code: %s,reason code %s, reason desc: %s ",
-                                             response_code, reason_code, reason_text))
+    def _faisapay_apply_outcomes(self, txs_by_outcome):
+        """ Apply the state changes of the outcomes, once per group of transactions.
+
+        The transactions already in the state of their outcome are left untouched, so that applying
+        the same outcome again writes nothing.
+
+        :param dict txs_by_outcome: The transactions, by outcome as returned by
+                                    `_faisapay_get_notification_outcome`.
+        :return: None
+        """
+        with faisapay_utils.timed('state_transition', 'notification'):
+            for (status, error_message), txs in txs_by_outcome.items():
+                txs = txs.filtered(lambda tx: tx.state != OUTCOME_STATES[status])
+                if not txs:
+                    continue
+                if status in ('done', 'reversed'):
+                    txs._set_done()
+                elif status == 'cancelled':
+                    txs._set_canceled()
+                else:
+                    txs._set_error(error_message)
+
+            if any(status == 'reversed' for status, _error_message in txs_by_outcome):
+                # Immediately post-process the transaction if it is a refund, as the post-processing
+                # will not be triggered by a customer browsing the transaction from the portal.
+                self.env.ref('payment.cron_post_process_payment_tx')._trigger()
+
+    @api.model
+    def _cron_faisapay_sweep_pending_transactions(self, batch_size=const.STATUS_SWEEP_BATCH_SIZE):
+        """ Request the status of the stale Faisapay transactions that were left pending.
+
+        Only the transactions of the enabled and test providers are checked, by batches of
+        `batch_size` whose state changes are committed before checking the next batch, so that the
+        sweep never holds a long database transaction. The last checked transaction is saved after
+        each batch: if the sweep takes too long, it is rescheduled after a pause and resumes from
+        there, and it only starts over once all the transactions were checked.
+
+        :param int batch_size: The number of transactions checked and committed at once.
+        :return: None
+        """
+        providers = self.env['payment.provider'].search([
+            ('code', '=', 'faisapay'), ('state', 'in', ('enabled', 'test'))
+        ])
+        if not providers:
+            return
+
+        now = fields.Datetime.now()
+        domain = [
+            ('provider_id', 'in', providers.ids),
+            ('state', 'in', ('draft', 'pending')),
+            ('operation', '!=', 'refund'),
+            ('create_date', '<=', now - timedelta(minutes=const.STATUS_SWEEP_STALE_DELAY)),
+            ('create_date', '>=', now - timedelta(days=const.STATUS_SWEEP_MAX_AGE)),
+        ]
+        ICP = self.env['ir.config_parameter'].sudo()
+        start_time = time.monotonic()
+        last_id = int(ICP.get_param(const.STATUS_SWEEP_CURSOR_PARAM, 0))
+        while True:
+            txs = self.search(domain + [('id', '>', last_id)], order='id', limit=batch_size)
+            if not txs:
+                ICP.set_param(const.STATUS_SWEEP_CURSOR_PARAM, 0)  # Start over in the next run.
+                break
+            last_id = txs[-1].id
+            for provider in txs.provider_id:
+                txs.filtered(lambda tx: tx.provider_id == provider)._faisapay_request_status()
+            ICP.set_param(const.STATUS_SWEEP_CURSOR_PARAM, last_id)
+
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+            if time.monotonic() - start_time > const.STATUS_SWEEP_TIME_LIMIT:
+                # Resume in a new cron run rather than getting killed by the cron time limit, after
+                # a pause to spare the gateway.
+                self.env.ref('payment_faisapay.cron_faisapay_sweep_pending_transactions')._trigger(
+                    fields.Datetime.now() + timedelta(seconds=const.STATUS_SWEEP_RESUME_DELAY)
+                )
+                break
+
+    def _faisapay_request_status(self):
+        """ Request the status of the transactions to Faisapay and handle the final ones.
+
+        The status requests are sent concurrently. Only the responses reporting a final status are
+        handled, in a single batch: a confirmed, reversed or cancelled payment, or a declined or
+        failed one, which sets the transaction in error. The transactions for which Faisapay has no
+        final status yet are left untouched.
+
+        Note: all the transactions must belong to the same provider.
+
+        :return: None
+        """
+        provider = self.provider_id
+        provider.ensure_one()
+
+        payloads = [
+            tx._faisapay_prepare_api_request_payload(
+                const.API_REQUEST_TYPES['status'], tx.reference
+            ) for tx in self
+        ]
+        results = provider._faisapay_make_requests('statusRequest', payloads)
+        final_txs = self.browse()
+        final_response_contents = []
+        for tx, (response_content, error) in zip(self, results):
+            if error:
+                _logger.warning(
+                    "Unable to request the status of the transaction with reference %s: %s",
+                    tx.reference, error,
+                )
+                continue
+            reason_code = response_content.get('reasonCode')
+            if not reason_code or (
+                response_content.get('responseCode') != '2'  # Declined or failed.
+                and not any(
+                    reason_code in PAYMENT_STATUS_MAPPING[status]
+                    for status in ('done', 'reversed', 'cancelled')
+                )
+            ):
+                _logger.debug(
+                    "No final status yet for the transaction with reference %s.", tx.reference
+                )
+                continue
+            final_txs += tx
+            final_response_contents.append(response_content)
+
+        errors = final_txs._faisapay_process_notification_data_batch(final_response_contents)
+        for tx, error in zip(final_txs, errors):
+            if error:
+                _logger.warning(
+                    "Unable to handle the status of the transaction with reference %s: %s",
+                    tx.reference, error,
+                )
+
+    def _faisapay_check_reversed(self):
+        """ Request the status of the payments to find those that Faisapay already reversed.
+
+        This is done before sending again a reversal whose previous outcome is unknown, e.g., after
+        a timeout, so that a payment is never reversed twice.
+
+        Note: all the transactions must belong to the same provider.
+
+        :return: The `(response_content, error)` pair of each transaction, in order, where the
+                 response content is only set if the payment is reversed, and `error` is a
+                 `ValidationError` if the status could not be requested.
+        :rtype: list
+        """
+        if not self:
+            return []
+        provider = self.provider_id
+        provider.ensure_one()
+
+        payloads = [
+            tx._faisapay_prepare_api_request_payload(
+                const.API_REQUEST_TYPES['status'], tx.reference
+            ) for tx in self
+        ]
+        results = provider._faisapay_make_requests('statusRequest', payloads)
+        return [
+            (
+                response_content if not error and response_content.get('reasonCode')
+                in PAYMENT_STATUS_MAPPING['reversed'] else None,
+                error,
+            ) for response_content, error in results
+        ]
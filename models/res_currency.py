@@ -0,0 +1,20 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import models
+
+
+class ResCurrency(models.Model):
+    _inherit = 'res.currency'
+
+    def write(self, values):
+        """ Override of `base` to invalidate the cached compatibility of the currencies. """
+        res = super().write(values)
+        if 'name' in values or 'active' in values:
+            self.clear_caches()  # Invalidate the cache in all the workers.
+        return res
+
+    def unlink(self):
+        """ Override of `base` to invalidate the cached compatibility of the currencies. """
+        res = super().unlink()
+        self.clear_caches()
+        return res
@@ -1,3 +1,20 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-
+from . import test_benchmark_flows
+from . import test_benchmark_merchant_pool
+from . import test_benchmark_settlement_import
+from . import test_benchmark_signature
+from . import test_benchmark_tx_lookup
+from . import test_controllers
+from . import test_gateway_client
+from . import test_load_simulator
+from . import test_mass_reversal
+from . import test_merchant_pool
+from . import test_notification_processing
+from . import test_notification_queue
+from . import test_redirect_form
+from . import test_refund_outbox
+from . import test_settlement_import
+from . import test_signature
+from . import test_status_sweep
+from . import test_stress_notification_claim
@@ -0,0 +1,172 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import json
+import logging
+import os
+import time
+
+from odoo.addons.payment.tests.common import PaymentCommon
+
+
+_logger = logging.getLogger(__name__)
+
+# The budgets of the benchmarks. Set the `FAISAPAY_BENCHMARK_UPDATE_BASELINE` environment variable
+# to record the measured values as the new budgets.
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+# The share of the baseline throughput below which a benchmark fails.
+THROUGHPUT_TOLERANCE = 0.5
+
+
+class FaisapayCommon(PaymentCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.faisapay = cls._prepare_provider('faisapay', update_values={
+            'faisapay_merchant_id': '9803000001',
+            'faisapay_acquirer_id': '407387',
+            'faisapay_passcode': 'dummy_passcode',
+        })
+
+        # Override default values
+        cls.provider = cls.faisapay
+        cls.currency = cls._prepare_currency('USD')
+
+        cls.redirect_notification_data = {
+            'orderID': cls.reference,
+            'authCode': '123456',
+            'referenceNo': '1002003004',
+            'responseCode': '1',
+            'reasonCode': '1',
+            'reasonText': 'Transaction is approved',
+            'salt': 'a1b2c3d4',
+        }
+
+    def _create_transactions(self, count, **values):
+        """ Create Faisapay transactions with unique references.
+
+        :param int count: The number of transactions to create.
+        :param dict values: The values of the transactions, overriding the defaults.
+        :return: The created transactions.
+        :rtype: recordset of `payment.transaction`
+        """
+        first_index = self.env['payment.transaction'].sudo().search_count([])
+        return self.env['payment.transaction'].sudo().create([{
+            'amount': self.amount,
+            'currency_id': self.currency.id,
+            'provider_id': self.provider.id,
+            'reference': f'{self.reference}-{first_index + i}',
+            'operation': 'online_redirect',
+            'partner_id': self.partner.id,
+            **values,
+        } for i in range(count)])
+
+    def _prepare_notification_data(self, tx, is_redirect=True, **values):
+        """ Return notification data of the transaction signed as by Faisapay.
+
+        :param recordset tx: The transaction, as a `payment.transaction` record.
+        :param bool is_redirect: Whether the data are signed as redirect data or as webhook data.
+        :param dict values: The values of the data, overriding the defaults.
+        :return: The signed notification data.
+        :rtype: dict
+        """
+        notification_data = dict(self.redirect_notification_data, orderID=tx.reference, **values)
+        notification_data['signature'] = tx._faisapay_get_merchant()._faisapay_calculate_signature(
+            notification_data, is_redirect=is_redirect
+        )
+        return notification_data
+
+
+class FaisapayBenchmarkCommon(FaisapayCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(BASELINE_PATH) as baseline_file:
+            cls.baseline = json.load(baseline_file)
+        cls.update_baseline = bool(os.environ.get('FAISAPAY_BENCHMARK_UPDATE_BASELINE'))
+        cls.measurements = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.update_baseline and cls.measurements:
+            with open(BASELINE_PATH) as baseline_file:
+                baseline = json.load(baseline_file)
+            baseline.update(cls.measurements)
+            with open(BASELINE_PATH, 'w') as baseline_file:
+                json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+                baseline_file.write('\n')
+        super().tearDownClass()
+
+    def _benchmark(self, name, func, iterations=10000):
+        """ Call the function repeatedly and log its throughput.
+
+        :param str name: The name of the benchmark, used in the logs.
+        :param callable func: The function to benchmark, called without argument.
+        :param int iterations: The number of calls.
+        :return: The number of calls per second.
+        :rtype: float
+        """
+        start = time.perf_counter()
+        for _i in range(iterations):
+            func()
+        duration = time.perf_counter() - start
+        throughput = iterations / duration
+        _logger.info(
+            "Benchmark %s: %d calls in %.3fs (%.0f calls/s)", name, iterations, duration, throughput
+        )
+        return throughput
+
+    def _count_queries(self, func):
+        """ Call the function once with an empty record cache and return its number of queries.
+
+        :param callable func: The function to call, without argument.
+        :return: The number of queries.
+        :rtype: int
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        query_count = self.env.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - query_count
+
+    def _assert_within_budget(self, name, func, iterations=1000):
+        """ Measure the queries and the throughput of the function and compare them to the budget.
+
+        The function is called `iterations + 2` times: once to warm up the caches of the registry,
+        once with an empty record cache to count its queries, then repeatedly to measure its
+        throughput.
+
+        :param str name: The name of the benchmark, as a key of the baseline.
+        :param callable func: The function to benchmark, called without argument.
+        :param int iterations: The number of calls used to measure the throughput.
+        :return: None
+        """
+        func()
+        query_count = self._count_queries(func)
+        throughput = self._benchmark(name, func, iterations=iterations)
+        _logger.info("Benchmark %s: %d queries per call", name, query_count)
+
+        if self.update_baseline:
+            self.measurements[name] = {'queries': query_count, 'throughput': round(throughput)}
+            return
+
+        budget = self.baseline.get(name)
+        if not budget:
+            self.skipTest(
+                f"{name}: no budget recorded, run the benchmarks with "
+                f"FAISAPAY_BENCHMARK_UPDATE_BASELINE=1 on the reference machine to record it"
+            )
+        self.assertLessEqual(
+            query_count, budget['queries'],
+            msg=f"{name}: {query_count} queries per call exceed the budget of {budget['queries']}",
+        )
+        if budget.get('throughput'):
+            self.assertGreaterEqual(
+                throughput, budget['throughput'] * THROUGHPUT_TOLERANCE,
+                msg=f"{name}: {throughput:.0f} calls/s is below the budget of "
+                    f"{budget['throughput']} calls/s",
+            )
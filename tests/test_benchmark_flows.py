@@ -0,0 +1,203 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from werkzeug.urls import url_encode
+
+from odoo.tests import tagged
+
+from odoo.addons.payment.tests.http_common import PaymentHttpCommon
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+from odoo.addons.payment_faisapay.controllers import main as main_controller
+from odoo.addons.payment_faisapay.controllers.main import FaisapayController
+from odoo.addons.payment_faisapay.tests.common import FaisapayBenchmarkCommon
+
+
+# The response of the mocked transport to the API requests.
+MOCKED_RESPONSES = {
+    'reversalRequest': {'responseCode': '1', 'reasonCode': '108', 'referenceNo': '1002003005'},
+    'statusRequest': {'responseCode': '1', 'reasonCode': '1', 'referenceNo': '1002003004'},
+}
+
+# The notification data of each branch of `_process_notification_data`.
+NOTIFICATION_BRANCHES = {
+    'done': {'responseCode': '1', 'reasonCode': '1'},
+    'reversed': {'responseCode': '1', 'reasonCode': '108'},
+    'cancelled': {'responseCode': '2', 'reasonCode': '36'},
+    'error': {'responseCode': '2', 'reasonCode': '10'},
+}
+
+
+def _mocked_send_request(session, url, payload=None, method='POST', timeout=None, **kwargs):
+    """ Answer the API requests without reaching the gateway. """
+    return dict(MOCKED_RESPONSES[url.rsplit('/', 1)[-1]], orderID=payload['orderID'])
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+@patch('odoo.addons.payment_faisapay.utils.send_request', _mocked_send_request)
+class TestBenchmarkFlows(FaisapayBenchmarkCommon):
+    """ Check the queries and the throughput of the hot paths against the recorded budgets.
+
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    def test_benchmark_rendering_values(self):
+        tx = self._create_transaction('redirect')
+        self._assert_within_budget(
+            'rendering_values', lambda: tx._get_specific_rendering_values(None)
+        )
+
+    def test_benchmark_presign_rendering_values(self):
+        iterations = 20
+        txs = self._create_transactions((iterations + 2) * 100)
+        batches = iter(txs[i:i + 100] for i in range(0, len(txs), 100))
+        self._assert_within_budget(
+            'presign_rendering_values_batch_of_100',
+            lambda: next(batches)._faisapay_presign_rendering_values(),
+            iterations=iterations,
+        )
+
+    def test_benchmark_signatures(self):
+        data = dict(
+            self.redirect_notification_data,
+            purchaseAmt=111111,
+            purchaseCurrency='840',
+            purchaseCurrencyExponent=2,
+            requestType=2,
+        )
+        for kind, sign in (
+            ('pay_request', self.provider._faisapay_calculate_pay_request_signature),
+            ('api_request', self.provider._faisapay_calculate_api_request_signature),
+            ('response', self.provider._faisapay_calculate_signature),
+        ):
+            self._assert_within_budget(f'signature_{kind}', lambda: sign(data), iterations=10000)
+
+    def test_benchmark_tx_from_notification_data(self):
+        tx = self._create_transaction('redirect')
+        self._assert_within_budget(
+            'tx_from_notification_data',
+            lambda: self.env['payment.transaction'].sudo()._get_tx_from_notification_data(
+                'faisapay', {'orderID': tx.reference}
+            ),
+        )
+
+    def test_benchmark_process_notification_data(self):
+        iterations = 200
+        for branch, codes in NOTIFICATION_BRANCHES.items():
+            txs = iter(self._create_transactions(iterations + 2, state='draft'))
+            notification_data = dict(self.redirect_notification_data, **codes)
+            self._assert_within_budget(
+                f'process_notification_data_{branch}',
+                lambda: next(txs)._process_notification_data(notification_data),
+                iterations=iterations,
+            )
+
+    def test_benchmark_process_notification_data_batch(self):
+        iterations = 20
+        for branch, codes in NOTIFICATION_BRANCHES.items():
+            txs = self._create_transactions((iterations + 2) * 50, state='draft')
+            batches = iter(txs[i:i + 50] for i in range(0, len(txs), 50))
+            notification_data = dict(self.redirect_notification_data, **codes)
+            self._assert_within_budget(
+                f'process_notification_data_batch_of_50_{branch}',
+                lambda: next(batches)._faisapay_process_notification_data_batch(
+                    [dict(notification_data, salt=f'salt{i}') for i in range(50)]
+                ),
+                iterations=iterations,
+            )
+
+    def test_benchmark_refund_request(self):
+        iterations = 100
+        txs = iter(self._create_transactions(iterations + 2, state='done'))
+        self._assert_within_budget(
+            'refund_request', lambda: next(txs)._send_refund_request(), iterations=iterations
+        )
+
+    def test_benchmark_deliver_refunds(self):
+        iterations = 20
+        txs = self._create_transactions((iterations + 2) * 50, state='done')
+        for i, tx in enumerate(txs):
+            tx.provider_reference = f'20030{i:05d}'
+            tx._send_refund_request()
+        refunds = self.env['payment.faisapay.refund'].search(
+            [('refund_transaction_id.source_transaction_id', 'in', txs.ids)], order='id'
+        )
+        batches = iter(refunds[i:i + 50] for i in range(0, len(refunds), 50))
+        self._assert_within_budget(
+            'deliver_refunds_batch_of_50', lambda: next(batches)._deliver(), iterations=iterations
+        )
+
+    def test_benchmark_status_request(self):
+        iterations = 20
+        txs = self._create_transactions((iterations + 2) * 10, state='pending')
+        batches = iter(txs[i:i + 10] for i in range(0, len(txs), 10))
+        self._assert_within_budget(
+            'status_request_batch_of_10',
+            lambda: next(batches)._faisapay_request_status(),
+            iterations=iterations,
+        )
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+@patch.object(main_controller._return_throttle, 'rate', 0)  # All the requests come from localhost.
+class TestBenchmarkReturnRoute(FaisapayBenchmarkCommon, PaymentHttpCommon):
+    """ Check the queries and the throughput of the return route against the recorded budgets.
+
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    def _get_return_url(self, reference):
+        return self._build_url(
+            f'{FaisapayController._return_url}?{url_encode({"reference": reference})}'
+        )
+
+    def test_benchmark_return_route(self):
+        iterations = 100
+        tx = self._create_transaction('redirect')
+        url = self._get_return_url(tx.reference)
+        notifications = iter([
+            self._prepare_notification_data(tx, salt=f'salt{i}') for i in range(iterations + 2)
+        ])
+        self._assert_within_budget(
+            'return_route',
+            lambda: self._make_http_post_request(url, data=next(notifications)),
+            iterations=iterations,
+        )
+
+    def test_benchmark_return_route_rejection(self):
+        tx = self._create_transaction('redirect')
+        url = self._get_return_url(tx.reference)
+        forged_data = dict(self.redirect_notification_data, signature='forged')
+        with patch(
+            'odoo.addons.payment_faisapay.models.payment_transaction.PaymentTransaction'
+            '._get_tx_from_notification_data',
+            side_effect=AssertionError("The forged notification reached the database."),
+        ):
+            self._assert_within_budget(
+                'return_route_rejection',
+                lambda: self.assertEqual(
+                    self._make_http_post_request(url, data=forged_data).status_code, 403
+                ),
+            )
+            self.assertEqual(
+                self._make_http_post_request(
+                    url, data=dict(forged_data, orderID='another-reference')
+                ).status_code,
+                400,
+            )
+        rejections = faisapay_utils.rejection_counter.get_counts()
+        self.assertGreater(rejections.get('invalid_signature', 0), 0)
+        self.assertGreater(rejections.get('malformed', 0), 0)
+
+    def test_benchmark_webhook(self):
+        iterations = 20
+        batches = iter([
+            self._prepare_notification_data(tx, is_redirect=False)
+            for tx in self._create_transactions(50)
+        ] for _i in range(iterations + 2))
+        url = self._build_url(FaisapayController._webhook_url)
+        self._assert_within_budget(
+            'webhook_batch_of_50',
+            lambda: self._make_json_request(url, data=next(batches)),
+            iterations=iterations,
+        )
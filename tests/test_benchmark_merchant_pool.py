@@ -0,0 +1,32 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+class TestBenchmarkMerchantPool(FaisapayBenchmarkCommon):
+    """ Measure the assignment of the transactions to the merchant accounts of the provider.
+
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.accounts = cls.env['payment.faisapay.merchant'].create([{
+            'name': f"Account {i}",
+            'provider_id': cls.provider.id,
+            'merchant_id': f'980300010{i}',
+            'acquirer_id': '407387',
+            'passcode': f'passcode_{i}',
+        } for i in range(3)])
+
+    def test_benchmark_create_transactions(self):
+        iterations = 20
+        self._assert_within_budget(
+            'create_transactions_with_merchant_pool_batch_of_100',
+            lambda: self._create_transactions(100),
+            iterations=iterations,
+        )
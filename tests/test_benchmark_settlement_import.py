@@ -0,0 +1,99 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import base64
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayBenchmarkCommon
+
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+class TestBenchmarkSettlementImport(FaisapayBenchmarkCommon):
+    """ Measure the throughput of the import of a large settlement file.
+
+    The number of rows is read from the `FAISAPAY_BENCHMARK_SETTLEMENT_ROWS` environment variable.
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.row_count = int(os.environ.get('FAISAPAY_BENCHMARK_SETTLEMENT_ROWS', 1_000_000))
+        # Every hundredth transaction was left pending, without notification and thus without
+        # provider reference, and is settled by the file.
+        cls.env.cr.execute(
+            """
+            INSERT INTO payment_transaction (
+                reference, provider_reference, provider_id, company_id, amount, currency_id,
+                partner_id, state, operation, create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'SETTLE-' || n,
+                   CASE WHEN n %% 100 = 0 THEN NULL ELSE 'SETTLE-REF-' || n END,
+                   %(provider_id)s, %(company_id)s, 10,
+                   %(currency_id)s, %(partner_id)s,
+                   CASE WHEN n %% 100 = 0 THEN 'pending' ELSE 'done' END, 'online_redirect',
+                   1, NOW(), 1, NOW()
+              FROM generate_series(1, %(count)s) n
+            """,
+            {
+                'provider_id': cls.provider.id,
+                'company_id': cls.provider.company_id.id,
+                'currency_id': cls.currency.id,
+                'partner_id': cls.partner.id,
+                'count': cls.row_count,
+            },
+        )
+        cls.env.cr.execute("ANALYZE payment_transaction")
+
+    def _write_settlement_file(self, settlement_file):
+        """ Write a settlement row per transaction, and a row without transaction per thousand. """
+        text = io.TextIOWrapper(settlement_file, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(('orderID', 'referenceNo', 'reasonCode', 'purchaseAmt'))
+        for n in range(1, self.row_count + 1):
+            writer.writerow((f'SETTLE-{n}', f'SETTLE-REF-{n}', '1', '1000'))
+            if n % 1000 == 0:
+                writer.writerow((f'UNKNOWN-{n}', f'UNKNOWN-REF-{n}', '1', '1000'))
+        text.flush()
+        text.detach()
+        settlement_file.seek(0)
+
+    def test_benchmark_settlement_import(self):
+        wizard = self.env['payment.faisapay.settlement.import'].create({
+            'provider_id': self.provider.id,
+            'settlement_file': base64.b64encode(b'orderID,referenceNo,reasonCode\n'),
+            'settlement_file_name': 'settlement.csv',
+        })
+        with tempfile.TemporaryFile() as settlement_file:
+            self._write_settlement_file(settlement_file)
+            start = time.perf_counter()
+            wizard._import_settlement(settlement_file)
+            duration = time.perf_counter() - start
+
+        _logger.info(
+            "Benchmark settlement import: %d rows in %.3fs (%.0f rows/s)",
+            wizard.row_count, duration, wizard.row_count / duration,
+        )
+        self.assertEqual(wizard.row_count, self.row_count + self.row_count // 1000)
+        self.assertEqual(wizard.matched_count, self.row_count)
+        self.assertEqual(wizard.fixed_count, self.row_count // 100)
+        self.assertEqual(wizard.mismatch_count, self.row_count // 1000)
+        self.assertEqual(
+            wizard.report_attachment_id.raw.count(b'transaction not found'),
+            self.row_count // 1000,
+        )
+        self.assertFalse(self.env['payment.transaction'].search_count([
+            ('reference', '=like', 'SETTLE-%'), ('state', '!=', 'done')
+        ]))
+        self.assertFalse(self.env['payment.transaction'].search_count([
+            ('reference', '=like', 'SETTLE-%'), ('provider_reference', '=', False)
+        ]))
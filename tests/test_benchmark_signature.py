@@ -0,0 +1,39 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayBenchmarkCommon
+from odoo.addons.payment_faisapay.tests.test_signature import calculate_response_signature
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+class TestBenchmarkSignature(FaisapayBenchmarkCommon):
+    """ Compare the throughput of the signature engine with the former per-call implementation.
+
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    def _legacy_calculate_signature(self, data):
+        """ Compute the redirect signature the way it was computed before the signature engine. """
+        return calculate_response_signature(self.provider, data)
+
+    def test_benchmark_signature(self):
+        data = self.redirect_notification_data
+        self.assertEqual(
+            self.provider._faisapay_calculate_signature(data),
+            self._legacy_calculate_signature(data),
+        )
+
+        before = self._benchmark(
+            'signature (before)', lambda: self._legacy_calculate_signature(data)
+        )
+        self._benchmark(
+            'signature (after)', lambda: self.provider._faisapay_calculate_signature(data)
+        )
+        data_list = [dict(data, orderID=f'{self.reference}-{i}') for i in range(10000)]
+        batch = self._benchmark(
+            'signature (batch of 10000)',
+            lambda: self.provider._faisapay_sign_batch('response', data_list),
+            iterations=10,
+        ) * len(data_list)
+        self.assertGreater(batch, before)
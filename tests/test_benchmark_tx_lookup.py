@@ -0,0 +1,81 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import os
+import random
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.models import payment_transaction
+from odoo.addons.payment_faisapay.tests.common import FaisapayBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_benchmark')
+class TestBenchmarkTxLookup(FaisapayBenchmarkCommon):
+    """ Measure the latency of the transaction lookup on a large transaction table.
+
+    The number of transactions is read from the `FAISAPAY_BENCHMARK_TX_COUNT` environment variable.
+    Run with `--test-tags faisapay_benchmark`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tx_count = int(os.environ.get('FAISAPAY_BENCHMARK_TX_COUNT', 1_000_000))
+        cls.env.cr.execute(
+            """
+            INSERT INTO payment_transaction (
+                reference, provider_id, company_id, amount, currency_id, partner_id, state,
+                operation, create_uid, create_date, write_uid, write_date
+            )
+            SELECT 'BENCH-' || n, %(provider_id)s, %(company_id)s, 10, %(currency_id)s,
+                   %(partner_id)s, 'done', 'online_redirect', 1, NOW(), 1, NOW()
+              FROM generate_series(1, %(count)s) n
+            """,
+            {
+                'provider_id': cls.provider.id,
+                'company_id': cls.provider.company_id.id,
+                'currency_id': cls.currency.id,
+                'partner_id': cls.partner.id,
+                'count': cls.tx_count,
+            },
+        )
+        cls.env.cr.execute("ANALYZE payment_transaction")
+
+    def _lookup(self, references, lookup):
+        iterator = iter(references)
+
+        def _lookup_next():
+            self.env.invalidate_all()  # Fetch the transaction from the database every time.
+            lookup(next(iterator))
+        return _lookup_next
+
+    def test_benchmark_tx_lookup(self):
+        Transaction = self.env['payment.transaction'].sudo()
+        iterations = 2000
+        references = [
+            f'BENCH-{random.randint(1, self.tx_count)}' for _i in range(iterations * 2)
+        ]
+
+        self._benchmark(
+            f'tx lookup with provider join ({self.tx_count} transactions)',
+            self._lookup(references, lambda reference: Transaction.search(
+                [('reference', '=', reference), ('provider_code', '=', 'faisapay')]
+            ).provider_reference),
+            iterations=iterations,
+        )
+        self._benchmark(
+            f'tx lookup through the reference index ({self.tx_count} transactions)',
+            self._lookup(references, lambda reference: (
+                payment_transaction._tx_ids_by_reference.clear(),
+                Transaction._faisapay_search_by_reference(reference).provider_reference,
+            )),
+            iterations=iterations,
+        )
+        hot_references = references[:100] * (iterations * 2 // 100)
+        self._benchmark(
+            f'tx lookup of recently resolved references ({self.tx_count} transactions)',
+            self._lookup(hot_references, lambda reference: (
+                Transaction._faisapay_search_by_reference(reference).provider_reference
+            )),
+            iterations=iterations,
+        )
@@ -0,0 +1,139 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from werkzeug.urls import url_encode
+
+from odoo.tests import tagged
+
+from odoo.addons.payment.tests.http_common import PaymentHttpCommon
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+from odoo.addons.payment_faisapay.controllers import main as main_controller
+from odoo.addons.payment_faisapay.controllers.main import FaisapayController
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+@patch.object(main_controller._return_throttle, 'rate', 0)  # All the requests come from localhost.
+class TestReturnRoute(FaisapayCommon, PaymentHttpCommon):
+
+    def _get_return_url(self, reference):
+        return self._build_url(
+            f'{FaisapayController._return_url}?{url_encode({"reference": reference})}'
+        )
+
+    def test_unsigned_result_data_are_not_applied(self):
+        tx = self._create_transaction('redirect')
+        unsigned_data = {'orderID': tx.reference, 'responseCode': '2', 'reasonCode': '10'}
+        unsigned_count = faisapay_utils.rejection_counter.get_counts().get('unsigned', 0)
+        with patch(
+            'odoo.addons.payment_faisapay.models.payment_transaction.PaymentTransaction'
+            '._get_tx_from_notification_data',
+            side_effect=AssertionError("The unsigned data reached the database."),
+        ):
+            response = self._make_http_post_request(
+                self._get_return_url(tx.reference), data=unsigned_data
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tx.state, 'draft')
+        self.assertEqual(
+            faisapay_utils.rejection_counter.get_counts().get('unsigned', 0), unsigned_count + 1
+        )
+
+    def test_only_verified_returns_are_journaled(self):
+        tx = self._create_transaction('redirect')
+        url = self._get_return_url(tx.reference)
+        forged_data = dict(self.redirect_notification_data, signature='forged')
+        self.assertEqual(self._make_http_post_request(url, data=forged_data).status_code, 403)
+        self._make_http_post_request(
+            url, data={'orderID': tx.reference, 'responseCode': '2', 'reasonCode': '10'}
+        )
+        Journal = self.env['payment.faisapay.journal']
+        self.assertFalse(Journal.search_count([('reference', '=', tx.reference)]))
+
+        self._make_http_post_request(url, data=self._prepare_notification_data(tx))
+        self.assertEqual(
+            Journal.search([('reference', '=', tx.reference)]).mapped('exchange'), ['return']
+        )
+
+    def test_deferred_returns_are_processed_in_the_background(self):
+        self.provider.faisapay_deferred_processing = True
+        tx = self._create_transaction('redirect')
+        self._make_http_post_request(
+            self._get_return_url(tx.reference), data=self._prepare_notification_data(tx)
+        )
+        Notification = self.env['payment.faisapay.notification']
+        notification = Notification.search([('reference', '=', tx.reference)])
+        self.assertEqual(notification.state, 'pending')
+        self.assertEqual(tx.state, 'draft')
+        self.assertEqual(Notification._get_metrics()['depth'], 1)
+
+        Notification._cron_process_notifications()
+        self.assertEqual(notification.state, 'done')
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(Notification._get_metrics()['depth'], 0)
+
+    def test_return_route_throttles_each_client(self):
+        url = self._get_return_url(self.reference)
+        with patch.object(main_controller, '_return_throttle', faisapay_utils.ClientThrottle(
+            rate=0.001, burst=3, capacity=10
+        )):
+            status_codes = [self._make_http_get_request(url).status_code for _i in range(5)]
+        self.assertNotIn(429, status_codes[:3])
+        self.assertEqual(status_codes[3:], [429, 429])
+
+
+@tagged('post_install', '-at_install')
+class TestPayRoute(FaisapayCommon, PaymentHttpCommon):
+
+    def test_payment_link_serves_the_presigned_form(self):
+        tx = self._create_transaction('redirect')
+        tx._faisapay_presign_rendering_values()
+        link = self._build_url(tx.faisapay_payment_link.split(tx.provider_id.get_base_url())[1])
+        response = self._make_http_get_request(link)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(tx.faisapay_rendering_values['signature'], response.text)
+        forged_link = link.replace('access_token=', 'access_token=forged')
+        self.assertEqual(self._make_http_get_request(forged_link).status_code, 404)
+
+
+@tagged('post_install', '-at_install')
+class TestWebhook(FaisapayCommon, PaymentHttpCommon):
+
+    def test_webhook_queues_the_valid_notifications(self):
+        txs = self._create_transactions(10)
+        notifications = [self._prepare_notification_data(tx, is_redirect=False) for tx in txs]
+        notifications[0]['signature'] = 'forged'
+        response = self._make_json_request(
+            self._build_url(FaisapayController._webhook_url), data=notifications
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'accepted': 9, 'rejected': [txs[0].reference]})
+
+        self.env['payment.faisapay.notification']._cron_process_notifications()
+        self.assertEqual(txs[0].state, 'draft')
+        self.assertEqual(set(txs[1:].mapped('state')), {'done'})
+
+    def test_webhook_is_not_throttled_as_the_returning_customers(self):
+        txs = self._create_transactions(const.RETURN_RATE_BURST + 5)
+        url = self._build_url(FaisapayController._webhook_url)
+        status_codes = [
+            self._make_json_request(
+                url, data=self._prepare_notification_data(tx, is_redirect=False)
+            ).status_code for tx in txs
+        ]
+        self.assertEqual(set(status_codes), {200})
+
+
+@tagged('post_install', '-at_install')
+class TestMetricsRoute(FaisapayCommon, PaymentHttpCommon):
+
+    def test_metrics_reject_an_invalid_provider_id(self):
+        self.authenticate('admin', 'admin')
+        url = self._build_url(FaisapayController._metrics_url)
+        response = self._make_http_get_request(url, params={'provider_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self._make_http_get_request(url, params={'provider_id': str(self.provider.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('spans', response.json())
@@ -0,0 +1,109 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import Mock, patch
+
+import requests
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCircuitBreaker(BaseCase):
+
+    def _send(self, circuit_breaker, error=None):
+        session = Mock()
+        if error:
+            session.post.side_effect = error
+        else:
+            session.post.return_value = Mock(status_code=200, json=lambda: {'responseCode': '1'})
+        return faisapay_utils.send_request(
+            session, 'https://faisapay.test/api', payload={}, circuit_breaker=circuit_breaker
+        )
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        circuit_breaker = faisapay_utils.CircuitBreaker(2, 60, 10)
+        for _i in range(2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self._send(circuit_breaker, requests.exceptions.ConnectionError())
+        self.assertEqual(circuit_breaker.state, 'open')
+        with self.assertRaises(faisapay_utils.CircuitOpenError):
+            self._send(circuit_breaker)
+
+    def test_any_request_error_counts_as_failure(self):
+        circuit_breaker = faisapay_utils.CircuitBreaker(1, 0, 10)
+        for error in (
+            requests.exceptions.ChunkedEncodingError(),
+            requests.exceptions.TooManyRedirects(),
+            requests.exceptions.InvalidHeader(),
+        ):
+            with self.assertRaises(requests.exceptions.RequestException):
+                self._send(circuit_breaker, error)
+            self.assertEqual(circuit_breaker.state, 'open')
+
+    def test_probe_is_released_when_interrupted(self):
+        circuit_breaker = faisapay_utils.CircuitBreaker(1, 0, 10)
+        with self.assertRaises(requests.exceptions.Timeout):
+            self._send(circuit_breaker, requests.exceptions.Timeout())
+        with self.assertRaises(RuntimeError):  # The half-open probe gets no outcome.
+            self._send(circuit_breaker, RuntimeError())
+        self.assertEqual(self._send(circuit_breaker), {'responseCode': '1'})
+        self.assertEqual(circuit_breaker.state, 'closed')
+
+    def test_probe_is_sent_with_the_configured_read_timeout(self):
+        circuit_breaker = faisapay_utils.CircuitBreaker(1, 0, 50)
+        for _i in range(const.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+            circuit_breaker.record_success(0.1)
+        self.assertEqual(
+            circuit_breaker.get_request_timeout((5, 10)), (5, const.ADAPTIVE_TIMEOUT_MINIMUM)
+        )
+        circuit_breaker.record_failure()
+        self.assertTrue(circuit_breaker.allow_request())  # Reserve the half-open probe.
+        self.assertEqual(circuit_breaker.get_request_timeout((5, 10)), (5, 10))
+
+    def test_read_timeouts_raise_the_adapted_read_timeout(self):
+        circuit_breaker = faisapay_utils.CircuitBreaker(100, 0, 50)
+        for _i in range(const.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+            circuit_breaker.record_success(0.1)
+        session = Mock()
+        session.post.side_effect = requests.exceptions.ReadTimeout()
+        for _i in range(const.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                faisapay_utils.send_request(
+                    session, 'https://faisapay.test/api', payload={}, timeout=(5, 10),
+                    circuit_breaker=circuit_breaker,
+                )
+        self.assertGreater(
+            circuit_breaker.get_request_timeout((5, 10))[1], const.ADAPTIVE_TIMEOUT_MINIMUM
+        )
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimiter(BaseCase):
+
+    def test_rate_limiter_is_shared_by_the_requests_of_a_merchant(self):
+        url = 'https://faisapay.test/api'
+        limiter = faisapay_utils.get_rate_limiter(url, '9803000001', 10)
+        self.assertIs(faisapay_utils.get_rate_limiter(url, '9803000001', 5), limiter)
+        self.assertEqual(limiter.rate, 5)
+        self.assertIsNot(faisapay_utils.get_rate_limiter(url, '9803000002', 5), limiter)
+
+
+@tagged('post_install', '-at_install')
+class TestGatewayErrors(FaisapayCommon):
+
+    def test_request_errors_are_mapped_to_user_errors(self):
+        for error in (
+            requests.exceptions.Timeout(),
+            requests.exceptions.TooManyRedirects(),
+            faisapay_utils.CircuitOpenError('https://faisapay.test/api'),
+        ):
+            with patch(
+                'odoo.addons.payment_faisapay.utils.send_request', side_effect=error
+            ), self.assertRaises(ValidationError):
+                self.provider._faisapay_make_request('statusRequest', payload={'orderID': 'ref'})
@@ -0,0 +1,118 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import os
+import time
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import tagged
+
+from odoo.addons.payment.tests.http_common import PaymentHttpCommon
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+from odoo.addons.payment_faisapay.controllers import main as main_controller
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+from odoo.addons.payment_faisapay.tools.faisapay_simulator import FaisapaySimulator
+
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_load')
+class TestLoadSimulator(FaisapayCommon, PaymentHttpCommon):
+    """ Run concurrent checkouts and refunds end-to-end against the gateway simulator.
+
+    The load is configured with the `FAISAPAY_LOAD_CHECKOUTS`, `FAISAPAY_LOAD_CONCURRENCY` and
+    `FAISAPAY_LOAD_LATENCY` (in seconds) environment variables. Run with
+    `--test-tags faisapay_load`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.checkout_count = int(os.environ.get('FAISAPAY_LOAD_CHECKOUTS', 200))
+        cls.concurrency = int(os.environ.get('FAISAPAY_LOAD_CONCURRENCY', 10))
+        cls.latency = float(os.environ.get('FAISAPAY_LOAD_LATENCY', 0.05))
+
+    def _report(self, name, durations, wall_time):
+        """ Log the throughput and the latency percentiles of the completed operations. """
+        durations = sorted(d for d in durations if d is not None)
+        if not durations:
+            _logger.warning("Load %s: no operation completed.", name)
+            return
+        percentiles = {
+            p: durations[min(len(durations) - 1, len(durations) * p // 100)] * 1000
+            for p in (50, 95, 99)
+        }
+        _logger.info(
+            "Load %s: %d operations in %.2fs (%.1f/s), latency p50 %.0fms, p95 %.0fms, "
+            "p99 %.0fms", name, len(durations), wall_time, len(durations) / wall_time,
+            percentiles[50], percentiles[95], percentiles[99],
+        )
+
+    def _report_throughput(self, name, count, wall_time):
+        """ Log the throughput of operations whose individual latency is not measured. """
+        _logger.info(
+            "Load %s: %d operations in %.2fs (%.1f/s)", name, count, wall_time, count / wall_time
+        )
+
+    def test_load_checkouts_and_refunds(self):
+        self.env['ir.config_parameter'].sudo().set_param('web.base.url', self.base_url())
+        simulator = FaisapaySimulator(
+            self.provider.faisapay_passcode,
+            self.provider.faisapay_merchant_id,
+            self.provider.faisapay_acquirer_id,
+            latency=self.latency,
+            jitter=self.latency / 2,
+        )
+        # All the checkouts return from the same client IP.
+        with simulator, patch.object(main_controller._return_throttle, 'rate', 0):
+            self.provider.faisapay_api_url = simulator.url
+            txs = self._create_transactions(self.checkout_count)
+            forms = [tx._get_specific_rendering_values(None) for tx in txs]
+
+            def _checkout(form):
+                """ Pay on the hosted checkout and follow the redirection back to Odoo. """
+                start = time.perf_counter()
+                checkout_response = requests.post(
+                    form['api_url'],
+                    data={key: value for key, value in form.items() if key != 'api_url'},
+                    allow_redirects=False,
+                    timeout=30,
+                )
+                self.assertEqual(checkout_response.status_code, 303)
+                return_response = requests.get(
+                    checkout_response.headers['Location'], allow_redirects=False, timeout=60
+                )
+                self.assertEqual(return_response.status_code, 303)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = faisapay_utils.map_concurrently(
+                _checkout, forms, max_workers=self.concurrency
+            )
+            self._report(
+                'checkouts',
+                [duration for duration, _error in results],
+                time.perf_counter() - start,
+            )
+            self.assertFalse([error for _duration, error in results if error])
+
+            self.env.invalidate_all()
+            self.assertEqual(set(txs.mapped('state')), {'done'})
+
+            durations = []
+            start = time.perf_counter()
+            for tx in txs:
+                refund_start = time.perf_counter()
+                tx._send_refund_request()
+                durations.append(time.perf_counter() - refund_start)
+            self._report('refunds', durations, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            self.env['payment.faisapay.refund']._cron_deliver_refunds()
+            wall_time = time.perf_counter() - start
+            # The refunds are delivered by batches: only their throughput is meaningful.
+            self._report_throughput('refund_deliveries', len(txs), wall_time)
+            self.assertEqual(set(txs.child_transaction_ids.mapped('state')), {'done'})
@@ -0,0 +1,109 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import requests
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMassReversal(FaisapayCommon):
+
+    @contextmanager
+    def _mock_gateway(self, status_reason_code='1', reversal_error=None):
+        """ Answer the API requests without reaching the gateway and record their endpoints.
+
+        :param str status_reason_code: The reason code returned by the status requests.
+        :param Exception reversal_error: The error raised by the reversal requests, if any.
+        :return: The endpoints reached by the requests, in order.
+        :rtype: list
+        """
+        endpoints = []
+
+        def mocked_send_request(session, url, payload=None, **kwargs):
+            endpoints.append(url.rsplit('/', 1)[-1])
+            if endpoints[-1] == 'statusRequest':
+                reason_code = status_reason_code
+            elif reversal_error:
+                raise reversal_error
+            else:
+                reason_code = '108'
+            return {'orderID': payload['orderID'], 'responseCode': '1', 'reasonCode': reason_code}
+
+        with patch('odoo.addons.payment_faisapay.utils.send_request', mocked_send_request):
+            yield endpoints
+
+    def _run(self, reversal):
+        reversal.action_start()
+        self.env['payment.faisapay.reversal']._cron_process_reversals()
+
+    def _create_reversal(self, txs):
+        action = txs.action_faisapay_mass_reversal()
+        return self.env['payment.faisapay.reversal'].browse(action['res_id'])
+
+    def test_mass_reversal_refunds_the_payments(self):
+        txs = self._create_transactions(3, state='done', provider_reference='1002003004')
+        reversal = self._create_reversal(txs)
+        with self._mock_gateway() as endpoints:
+            self._run(reversal)
+        self.assertEqual(endpoints, ['reversalRequest'] * 3)
+        self.assertEqual(reversal.state, 'done')
+        self.assertEqual(set(reversal.line_ids.refund_transaction_id.mapped('state')), {'done'})
+
+    def test_payments_with_a_refund_in_progress_are_excluded(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003004')
+        tx._send_refund_request()  # Queued in the refund outbox.
+        with self.assertRaises(UserError):
+            tx.action_faisapay_mass_reversal()
+
+    def test_retry_does_not_reverse_a_reversed_payment_again(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003004')
+        reversal = self._create_reversal(tx)
+        with self._mock_gateway(reversal_error=requests.exceptions.ReadTimeout()):
+            self._run(reversal)
+        self.assertEqual(reversal.state, 'partial')
+
+        # Faisapay had received the reversal that timed out.
+        with self._mock_gateway(status_reason_code='108') as endpoints:
+            self._run(reversal)
+        self.assertEqual(endpoints, ['statusRequest'])
+        self.assertEqual(reversal.state, 'done')
+        self.assertEqual(reversal.line_ids.refund_transaction_id.state, 'done')
+
+    def test_retry_reverses_a_payment_that_is_not_reversed(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003004')
+        reversal = self._create_reversal(tx)
+        with self._mock_gateway(reversal_error=requests.exceptions.ConnectTimeout()):
+            self._run(reversal)
+        with self._mock_gateway() as endpoints:
+            self._run(reversal)
+        self.assertEqual(endpoints, ['statusRequest', 'reversalRequest'])
+        self.assertEqual(reversal.state, 'done')
+
+    def test_interrupted_batch_is_checked_before_being_reversed_again(self):
+        txs = self._create_transactions(2, state='done', provider_reference='1002003004')
+        reversal = self._create_reversal(txs)
+        # The worker is interrupted once the reversals are sent, before their results are applied.
+        with self._mock_gateway() as endpoints, patch(
+            'odoo.addons.payment_faisapay.models.payment_transaction.PaymentTransaction'
+            '._faisapay_process_notification_data_batch',
+            side_effect=RuntimeError,
+        ), self.assertRaises(RuntimeError):
+            self._run(reversal)
+        self.assertEqual(endpoints, ['reversalRequest'] * 2)
+        refund_txs = reversal.line_ids.refund_transaction_id
+        self.assertEqual(len(refund_txs), 2, msg="The attempt should be recorded before sending.")
+        self.assertEqual(set(reversal.line_ids.mapped('state')), {'pending'})
+
+        # Faisapay had received the reversals sent by the interrupted worker.
+        with self._mock_gateway(status_reason_code='108') as endpoints:
+            self._run(reversal)
+        self.assertEqual(endpoints, ['statusRequest'] * 2)
+        self.assertEqual(reversal.state, 'done')
+        self.assertEqual(reversal.line_ids.refund_transaction_id, refund_txs)
+        self.assertEqual(set(refund_txs.mapped('state')), {'done'})
@@ -0,0 +1,87 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from collections import Counter
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMerchantPool(FaisapayCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.accounts = cls.env['payment.faisapay.merchant'].create([{
+            'name': f"Account {i}",
+            'provider_id': cls.provider.id,
+            'merchant_id': f'980300010{i}',
+            'acquirer_id': '407387',
+            'passcode': f'passcode_{i}',
+        } for i in range(3)])
+
+    def test_round_robin_spreads_the_transactions_evenly(self):
+        txs = self._create_transactions(30)
+        self.assertEqual(
+            set(Counter(txs.mapped('faisapay_merchant_account_id')).values()), {10}
+        )
+
+    def test_least_loaded_fills_the_least_loaded_accounts_first(self):
+        self.provider.faisapay_merchant_assignment = 'least_loaded'
+        self._create_transactions(6, faisapay_merchant_account_id=self.accounts[0].id)
+        txs = self._create_transactions(6)
+        self.assertEqual(
+            Counter(txs.mapped('faisapay_merchant_account_id')),
+            {self.accounts[1]: 3, self.accounts[2]: 3},
+        )
+        self.assertEqual(self.accounts.mapped('tx_count'), [6, 3, 3])
+
+    def test_transactions_are_signed_with_the_credentials_of_their_account(self):
+        tx = self._create_transactions(1)
+        account = tx.faisapay_merchant_account_id
+        rendering_values = tx._get_specific_rendering_values(None)
+        self.assertEqual(rendering_values['merID'], account.merchant_id)
+        self.assertEqual(
+            rendering_values['signature'],
+            account._faisapay_calculate_pay_request_signature(rendering_values),
+        )
+        self.assertNotEqual(
+            rendering_values['signature'],
+            self.provider._faisapay_calculate_pay_request_signature(rendering_values),
+        )
+
+    def test_refund_is_sent_with_the_account_of_the_payment(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003098')
+        payloads = []
+
+        def mocked_send_request(session, url, payload=None, **kwargs):
+            payloads.append(payload)
+            return {'orderID': payload['orderID'], 'responseCode': '1', 'reasonCode': '108'}
+
+        with patch('odoo.addons.payment_faisapay.utils.send_request', mocked_send_request):
+            refund_tx = tx._send_refund_request()
+            self.env['payment.faisapay.refund']._cron_deliver_refunds()
+        self.assertEqual(refund_tx.faisapay_merchant_account_id, tx.faisapay_merchant_account_id)
+        self.assertEqual(payloads[0]['merID'], tx.faisapay_merchant_account_id.merchant_id)
+
+    def test_archived_accounts_are_not_assigned(self):
+        self.accounts[2].active = False
+        txs = self._create_transactions(6)
+        self.assertEqual(
+            set(txs.mapped('faisapay_merchant_account_id')), set(self.accounts[:2])
+        )
+
+    def test_signatures_of_archived_accounts_are_still_verified(self):
+        tx = self._create_transactions(1)
+        account = tx.faisapay_merchant_account_id
+        account.active = False
+        credential_index = self.provider._faisapay_get_credential_index()
+        self.assertEqual(
+            credential_index[(account.merchant_id, account.acquirer_id)],
+            ((self.provider.id, self.provider.faisapay_deferred_processing, account.id),),
+        )
+        notification_data = self._prepare_notification_data(tx, is_redirect=False)
+        self.env['payment.transaction']._handle_notification_data('faisapay', notification_data)
+        self.assertEqual(tx.state, 'done')
@@ -0,0 +1,50 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestNotificationProcessing(FaisapayCommon):
+
+    def test_tx_lookup_skips_deleted_transactions(self):
+        tx = self._create_transaction('redirect')
+        Transaction = self.env['payment.transaction'].sudo()
+        self.assertEqual(Transaction._faisapay_search_by_reference(tx.reference), tx)
+        tx.unlink()
+        self.assertFalse(Transaction._faisapay_search_by_reference(tx.reference))
+
+    def test_duplicate_notifications_are_skipped_once_committed(self):
+        Transaction = self.env['payment.transaction'].sudo()
+        tx = self._create_transaction('redirect')
+        notification_data = self._prepare_notification_data(tx, salt='duplicate')
+        Transaction._handle_notification_data('faisapay', notification_data)
+        self.assertEqual(tx.state, 'done')
+        self.env.cr.postcommit.run()  # The notification is only remembered once committed.
+
+        duplicate_count = Transaction._faisapay_get_duplicate_notification_count()
+        with patch(
+            'odoo.addons.payment_faisapay.models.payment_transaction.PaymentTransaction'
+            '._process_notification_data',
+            side_effect=AssertionError("The duplicate notification was processed again."),
+        ):
+            self.assertEqual(
+                Transaction._handle_notification_data('faisapay', dict(notification_data)), tx
+            )
+        self.assertEqual(
+            Transaction._faisapay_get_duplicate_notification_count(), duplicate_count + 1
+        )
+
+    def test_notification_data_batch_triggers_the_post_processing_once(self):
+        txs = self._create_transactions(10, state='draft')
+        notification_data = dict(
+            self.redirect_notification_data, responseCode='1', reasonCode='108'
+        )
+        with patch.object(type(self.env['ir.cron']), '_trigger') as trigger_mock:
+            errors = txs._faisapay_process_notification_data_batch([notification_data] * 10)
+        self.assertEqual(errors, [None] * 10)
+        self.assertEqual(set(txs.mapped('state')), {'done'})
+        self.assertEqual(trigger_mock.call_count, 1)
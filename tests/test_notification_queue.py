@@ -0,0 +1,62 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestNotificationQueue(FaisapayCommon):
+
+    def _enqueue(self, txs):
+        return self.env['payment.faisapay.notification'].sudo()._enqueue_batch([
+            (tx.reference, self._prepare_notification_data(tx, is_redirect=False)) for tx in txs
+        ])
+
+    def test_queued_notifications_are_processed(self):
+        txs = self._create_transactions(2)
+        notifications = self._enqueue(txs)
+        self.env['payment.faisapay.notification']._cron_process_notifications()
+        self.assertEqual(set(notifications.mapped('state')), {'done'})
+        self.assertEqual(set(txs.mapped('state')), {'done'})
+
+    def test_cron_is_triggered_only_when_the_queue_was_empty(self):
+        with patch.object(type(self.env['ir.cron']), '_trigger') as trigger_mock:
+            self._enqueue(self._create_transactions(1))
+            self._enqueue(self._create_transactions(1))
+            self.assertEqual(trigger_mock.call_count, 1)
+            self.env['payment.faisapay.notification']._cron_process_notifications()
+            self._enqueue(self._create_transactions(1))
+            self.assertEqual(trigger_mock.call_count, 2)
+
+    def test_notifications_of_locked_transactions_are_postponed(self):
+        txs = self._create_transactions(2)
+        notifications = self._enqueue(txs)
+        with patch(
+            'odoo.addons.payment_faisapay.models.payment_transaction.PaymentTransaction'
+            '._faisapay_claim',
+            lambda self: self.browse(),  # Simulate the rows being locked by another worker.
+        ):
+            self.env['payment.faisapay.notification']._cron_process_notifications()
+        self.assertEqual(
+            self.env['payment.faisapay.notification'].search_count([]),
+            len(notifications),
+            msg="The notifications of locked transactions should not be queued again.",
+        )
+        self.assertEqual(set(notifications.mapped('state')), {'pending'})
+        self.assertEqual(notifications.mapped('attempt_count'), [1, 1])
+        self.assertTrue(all(notifications.mapped('next_attempt_date')))
+        self.assertEqual(set(txs.mapped('state')), {'draft'})
+
+    def test_postponed_notifications_are_processed_once_due(self):
+        txs = self._create_transactions(1)
+        notification = self._enqueue(txs)
+        notification._postpone()
+        self.env['payment.faisapay.notification']._cron_process_notifications()
+        self.assertEqual(notification.state, 'pending', msg="The notification is not yet due.")
+        notification.next_attempt_date = False
+        self.env['payment.faisapay.notification']._cron_process_notifications()
+        self.assertEqual(notification.state, 'done')
+        self.assertEqual(txs.state, 'done')
@@ -0,0 +1,58 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.models import payment_transaction as transaction_module
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRedirectForm(FaisapayCommon):
+
+    def test_rendering_values_are_signed_again_when_the_amount_changes(self):
+        tx = self._create_transaction('redirect')
+        rendering_values = tx._get_specific_rendering_values(None)
+        self.assertEqual(tx._get_specific_rendering_values(None), rendering_values)
+        tx.amount += 1
+        new_rendering_values = tx._get_specific_rendering_values(None)
+        self.assertEqual(new_rendering_values['purchaseAmt'], rendering_values['purchaseAmt'] + 100)
+        self.assertNotEqual(new_rendering_values['signature'], rendering_values['signature'])
+
+    def test_presigned_rendering_values_are_signed_again_when_the_amount_changes(self):
+        tx = self._create_transactions(1)
+        tx._faisapay_presign_rendering_values()
+        presigned_values = tx.faisapay_rendering_values
+        transaction_module._rendering_values_by_tx.clear()
+        with patch.object(
+            type(self.provider), '_faisapay_calculate_pay_request_signature',
+            side_effect=AssertionError("The pre-signed values were signed again."),
+        ):
+            self.assertEqual(tx._get_specific_rendering_values(None), presigned_values)
+
+        tx.amount += 1
+        rendering_values = tx._get_specific_rendering_values(None)
+        self.assertEqual(rendering_values['purchaseAmt'], presigned_values['purchaseAmt'] + 100)
+        self.assertNotEqual(rendering_values['signature'], presigned_values['signature'])
+        self.assertEqual(tx.faisapay_rendering_values, rendering_values)
+
+    def test_memoized_rendering_values_are_served_without_signing(self):
+        tx = self._create_transaction('redirect')
+        rendering_values = tx._get_specific_rendering_values(None)
+        with patch.object(
+            type(self.provider), '_faisapay_calculate_pay_request_signature',
+            side_effect=AssertionError("The memoized values were signed again."),
+        ), patch.object(
+            type(tx), '_faisapay_get_rendering_fingerprint',
+            side_effect=AssertionError("The fingerprint was computed for memoized values."),
+        ):
+            self.assertEqual(tx._get_specific_rendering_values(None), rendering_values)
+
+    def test_rendering_values_are_signed_again_when_the_credentials_change(self):
+        tx = self._create_transaction('redirect')
+        rendering_values = tx._get_specific_rendering_values(None)
+        self.provider.faisapay_merchant_id = '9803000002'
+        new_rendering_values = tx._get_specific_rendering_values(None)
+        self.assertEqual(new_rendering_values['merID'], '9803000002')
+        self.assertNotEqual(new_rendering_values['signature'], rendering_values['signature'])
@@ -0,0 +1,97 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay import utils as faisapay_utils
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+# The response of the mocked transport to the API requests.
+MOCKED_RESPONSES = {
+    'reversalRequest': {'responseCode': '1', 'reasonCode': '108', 'referenceNo': '1002003005'},
+    'statusRequest': {'responseCode': '1', 'reasonCode': '1', 'referenceNo': '1002003004'},
+}
+
+
+def _mocked_send_request(session, url, payload=None, method='POST', timeout=None, **kwargs):
+    """ Answer the API requests without reaching the gateway. """
+    return dict(MOCKED_RESPONSES[url.rsplit('/', 1)[-1]], orderID=payload['orderID'])
+
+
+@tagged('post_install', '-at_install')
+@patch('odoo.addons.payment_faisapay.utils.send_request', _mocked_send_request)
+class TestRefundOutbox(FaisapayCommon):
+
+    def test_refund_is_delivered_in_the_background(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003097')
+        with patch('odoo.addons.payment_faisapay.utils.send_request') as send_mock:
+            refund_tx = tx._send_refund_request()
+        send_mock.assert_not_called()
+        self.assertEqual(refund_tx.faisapay_refund_state, 'pending')
+
+        self.env['payment.faisapay.refund']._cron_deliver_refunds()
+        self.assertEqual(refund_tx.faisapay_refund_state, 'sent')
+        self.assertEqual(refund_tx.state, 'done')
+
+    def test_undelivered_refund_is_retried_with_backoff(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003096')
+        refund_tx = tx._send_refund_request()
+
+        def mocked_send_request(session, url, payload=None, **kwargs):
+            raise ValidationError("Faisapay: Could not establish the connection to the API.")
+
+        with patch('odoo.addons.payment_faisapay.utils.send_request', mocked_send_request):
+            self.env['payment.faisapay.refund']._cron_deliver_refunds()
+        refund = self.env['payment.faisapay.refund'].search(
+            [('refund_transaction_id', '=', refund_tx.id)]
+        )
+        self.assertEqual(refund.state, 'pending')
+        self.assertEqual(refund.attempt_count, 1)
+        self.assertTrue(refund.last_error)
+        self.assertGreaterEqual(
+            refund.next_attempt_date,
+            fields.Datetime.now() + timedelta(seconds=const.REFUND_OUTBOX_RETRY_DELAY - 5),
+        )
+        self.assertEqual(refund_tx.state, 'draft')
+
+    def test_retried_refund_is_not_sent_again_once_reversed(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003095')
+        refund_tx = tx._send_refund_request()
+        refund = self.env['payment.faisapay.refund'].search(
+            [('refund_transaction_id', '=', refund_tx.id)]
+        )
+        # The previous attempt timed out after Faisapay had received the reversal.
+        refund.write({'attempt_count': 1, 'last_error': "Read timed out."})
+        endpoints = []
+
+        def mocked_send_request(session, url, payload=None, **kwargs):
+            endpoints.append(url.rsplit('/', 1)[-1])
+            return dict(MOCKED_RESPONSES['reversalRequest'], orderID=payload['orderID'])
+
+        with patch('odoo.addons.payment_faisapay.utils.send_request', mocked_send_request):
+            self.env['payment.faisapay.refund']._cron_deliver_refunds()
+        self.assertEqual(endpoints, ['statusRequest'])
+        self.assertEqual(refund.state, 'sent')
+        self.assertEqual(refund_tx.state, 'done')
+
+    def test_refund_request_is_journaled_without_signature(self):
+        tx = self._create_transactions(1, state='done', provider_reference='1002003099')
+        tx._send_refund_request()
+        self.env['payment.faisapay.refund']._cron_deliver_refunds()
+        entries = self.env['payment.faisapay.journal'].search(
+            [('reference', '=', tx.provider_reference)], order='id'
+        )
+        self.assertEqual(entries.mapped('exchange'), ['api_request', 'api_response'])
+        self.assertEqual(set(entries.mapped('endpoint')), {'reversalRequest'})
+        self.assertIn('reasonCode=108', entries[1].summary)
+        request_payload = faisapay_utils.decode_payload(
+            entries[0].with_context(bin_size=False).payload
+        )
+        self.assertEqual(request_payload['orderID'], tx.provider_reference)
+        self.assertEqual(request_payload['signature'], '[redacted]')
@@ -0,0 +1,46 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import base64
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSettlementImport(FaisapayCommon):
+
+    def _import(self, rows):
+        content = 'orderID,referenceNo,reasonCode\n' + ''.join(f'{",".join(row)}\n' for row in rows)
+        wizard = self.env['payment.faisapay.settlement.import'].create({
+            'provider_id': self.provider.id,
+            'settlement_file': base64.b64encode(content.encode()),
+            'settlement_file_name': 'settlement.csv',
+        })
+        wizard.action_import()
+        return wizard
+
+    def test_pending_transaction_without_provider_reference_is_settled(self):
+        tx = self._create_transaction('redirect', state='pending')
+        self.assertFalse(tx.provider_reference)
+        wizard = self._import([(tx.reference, '1002003004', '1')])
+        self.assertEqual(wizard.fixed_count, 1)
+        self.assertEqual(wizard.mismatch_count, 0)
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.provider_reference, '1002003004')
+
+    def test_cancelled_transaction_without_provider_reference_is_settled(self):
+        tx = self._create_transaction('redirect', state='pending')
+        wizard = self._import([(tx.reference, '1002003004', '36')])
+        self.assertEqual(wizard.fixed_count, 1)
+        self.assertEqual(tx.state, 'cancel')
+        self.assertEqual(tx.provider_reference, '1002003004')
+
+    def test_different_provider_reference_is_reported(self):
+        tx = self._create_transaction('redirect', state='pending', provider_reference='1002003005')
+        wizard = self._import([(tx.reference, '1002003004', '1')])
+        self.assertEqual(wizard.fixed_count, 0)
+        self.assertEqual(wizard.mismatch_count, 1)
+        self.assertIn(b'provider reference mismatch', wizard.report_attachment_id.raw)
+        self.assertEqual(tx.state, 'pending')
+        self.assertEqual(tx.provider_reference, '1002003005')
@@ -0,0 +1,37 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import base64
+import hashlib
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+def calculate_response_signature(provider, data):
+    """ Compute the signature of the redirect data as specified by the Faisapay documentation.
+
+    :param recordset provider: The provider signing the data, as a `payment.provider` record.
+    :param dict data: The data to sign.
+    :return: The signature.
+    :rtype: str
+    """
+    merchant = provider.faisapay_merchant_id
+    acquirer = provider.faisapay_acquirer_id
+    secret = provider.faisapay_passcode
+    signing_string = f'0{secret}{merchant}{acquirer}{data["orderID"]}{data["salt"]}'
+    return base64.b64encode(hashlib.sha256(signing_string.encode('utf-8')).digest()).decode()
+
+
+@tagged('post_install', '-at_install')
+class TestSignature(FaisapayCommon):
+
+    def test_signature_engine_invalidated_on_credentials_change(self):
+        data = self.redirect_notification_data
+        signature = self.provider._faisapay_calculate_signature(data)
+        self.provider.faisapay_passcode = 'new_passcode'
+        self.assertNotEqual(self.provider._faisapay_calculate_signature(data), signature)
+        self.assertEqual(
+            self.provider._faisapay_calculate_signature(data),
+            calculate_response_signature(self.provider, data),
+        )
@@ -0,0 +1,70 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.payment_faisapay import const
+from odoo.addons.payment_faisapay.tests.common import FaisapayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatusSweep(FaisapayCommon):
+
+    def _sweep(self, reason_code='1', response_code='1', **kwargs):
+        """ Run the status sweep and return the references whose status was requested. """
+        references = []
+
+        def mocked_send_request(session, url, payload=None, **_kwargs):
+            references.append(payload['orderID'])
+            return {
+                'orderID': payload['orderID'],
+                'responseCode': response_code,
+                'reasonCode': reason_code,
+            }
+
+        with patch('odoo.addons.payment_faisapay.utils.send_request', mocked_send_request):
+            self.env['payment.transaction']._cron_faisapay_sweep_pending_transactions(**kwargs)
+        return references
+
+    def _create_stale_transaction(self):
+        tx = self._create_transactions(1, state='pending')
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE payment_transaction SET create_date = %s WHERE id = %s",
+            [fields.Datetime.now() - timedelta(minutes=const.STATUS_SWEEP_STALE_DELAY + 1), tx.id],
+        )
+        tx.invalidate_recordset(['create_date'])
+        return tx
+
+    def test_sweep_checks_the_stale_transactions(self):
+        tx = self._create_stale_transaction()
+        self.assertEqual(self._sweep(), [tx.reference])
+        self.assertEqual(tx.state, 'done')
+
+    def test_sweep_sets_the_declined_payments_in_error(self):
+        tx = self._create_stale_transaction()
+        self.assertEqual(self._sweep(reason_code='10', response_code='2'), [tx.reference])
+        self.assertEqual(tx.state, 'error')
+
+    def test_sweep_skips_the_disabled_providers(self):
+        self._create_stale_transaction()
+        self.provider.state = 'disabled'
+        self.assertEqual(self._sweep(), [])
+
+    def test_interrupted_sweep_resumes_where_it_stopped(self):
+        txs = self._create_stale_transaction() | self._create_stale_transaction()
+        with patch.object(const, 'STATUS_SWEEP_TIME_LIMIT', -1), patch.object(
+            type(self.env['ir.cron']), '_trigger'
+        ) as trigger_mock:
+            # The transactions have no final status yet, they are checked in turn.
+            self.assertEqual(self._sweep(reason_code='0', batch_size=1), [txs[0].reference])
+            self.assertGreater(trigger_mock.call_args.args[0], fields.Datetime.now())
+            self.assertEqual(self._sweep(reason_code='0', batch_size=1), [txs[1].reference])
+        self.assertEqual(
+            self._sweep(reason_code='0', batch_size=1), [],
+            msg="The sweep should start over only once all the transactions were checked.",
+        )
+        self.assertEqual(self._sweep(reason_code='0'), txs.mapped('reference'))
@@ -0,0 +1,116 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import os
+import threading
+
+from psycopg2 import errorcodes, OperationalError
+
+from odoo import SUPERUSER_ID, api, sql_db
+from odoo.tests import BaseCase, get_db_name, tagged
+
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'faisapay_stress')
+class TestStressNotificationClaim(BaseCase):
+    """ Handle the notifications of the same transactions from concurrent database connections.
+
+    Each worker runs in its own thread with its own connection, like the workers of different
+    processes or nodes, and commits its work. The number of workers and of transactions are read
+    from the `FAISAPAY_STRESS_WORKERS` and `FAISAPAY_STRESS_TRANSACTIONS` environment variables.
+    Run with `--test-tags faisapay_stress`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db_name = get_db_name()
+        cls.worker_count = int(os.environ.get('FAISAPAY_STRESS_WORKERS', 8))
+        cls.tx_count = int(os.environ.get('FAISAPAY_STRESS_TRANSACTIONS', 50))
+        with cls._cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            provider = env.ref('payment_faisapay.payment_provider_faisapay')
+            txs = env['payment.transaction'].create([{
+                'amount': 100.0,
+                'currency_id': env.ref('base.USD').id,
+                'provider_id': provider.id,
+                'reference': f'FAISAPAY-STRESS-{os.getpid()}-{i}',
+                'operation': 'online_redirect',
+                'partner_id': env.ref('base.partner_admin').id,
+            } for i in range(cls.tx_count)])
+            cls.references = txs.mapped('reference')
+            cls.tx_ids = txs.ids
+        cls.addClassCleanup(cls._cleanup)
+
+    @classmethod
+    def _cursor(cls):
+        return sql_db.db_connect(cls.db_name).cursor()
+
+    @classmethod
+    def _cleanup(cls):
+        with cls._cursor() as cr:
+            cr.execute(
+                "DELETE FROM payment_faisapay_notification WHERE reference IN %s",
+                [tuple(cls.references)],
+            )
+            cr.execute("DELETE FROM payment_transaction WHERE id IN %s", [tuple(cls.tx_ids)])
+
+    def _run_worker(self, worker_index, barrier, serialization_failures, deferred_counts):
+        """ Handle a notification for each transaction in a single database transaction. """
+        with self._cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            Transaction = env['payment.transaction']
+            Notification = env['payment.faisapay.notification']
+            cr.execute("SELECT 1")  # Take the snapshot before any worker commits.
+            barrier.wait()
+            queued_before = Notification.search_count([('reference', 'in', self.references)])
+            try:
+                for reference in self.references:
+                    Transaction._handle_notification_data('faisapay', {
+                        'orderID': reference,
+                        'referenceNo': f'REF-{reference}',
+                        'responseCode': '1',
+                        'reasonCode': '1',
+                        'salt': f'worker{worker_index}',  # Not an exact duplicate.
+                    })
+                env.flush_all()
+                deferred_counts.append(
+                    Notification.search_count([('reference', 'in', self.references)])
+                    - queued_before
+                )
+                cr.commit()
+            except OperationalError as error:
+                if error.pgcode != errorcodes.SERIALIZATION_FAILURE:
+                    raise
+                serialization_failures.append(error)
+                cr.rollback()
+
+    def test_concurrent_notifications_cause_no_serialization_failure(self):
+        barrier = threading.Barrier(self.worker_count)
+        serialization_failures, deferred_counts = [], []
+        workers = [
+            threading.Thread(
+                target=self._run_worker,
+                args=(i, barrier, serialization_failures, deferred_counts),
+            ) for i in range(self.worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        _logger.info(
+            "Stress: %d workers handled the notifications of %d transactions, %d notifications "
+            "were queued for later and %d serialization failures occurred.",
+            self.worker_count, self.tx_count, sum(deferred_counts), len(serialization_failures),
+        )
+        self.assertFalse(serialization_failures)
+        self.assertEqual(len(deferred_counts), self.worker_count)
+        with self._cursor() as cr:
+            cr.execute(
+                "SELECT COUNT(*) FROM payment_transaction WHERE id IN %s AND state = 'done'",
+                [tuple(self.tx_ids)],
+            )
+            self.assertEqual(cr.fetchone()[0], self.tx_count)
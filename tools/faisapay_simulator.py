@@ -0,0 +1,228 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+""" Local simulator of the Faisapay pgv2 gateway, for load tests.
+
+The simulator serves the hosted checkout, the `reversalRequest` and the `statusRequest` endpoints
+and signs its data with the same rules as the provider. It can run inside the tests or as a
+standalone script:
+
+    python tools/faisapay_simulator.py --passcode <passcode> --merchant <merID> --acquirer <acqID>
+
+Then set the 'Custom API URL' of a provider in test mode to http://localhost:8079/pgv2/.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    from odoo.addons.payment_faisapay.signature import SignatureEngine
+except ImportError:  # Run as a standalone script.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from signature import SignatureEngine
+
+
+_logger = logging.getLogger(__name__)
+
+# The reason codes of the simulated outcomes.
+APPROVED = ('1', '1', "Transaction is approved")
+REVERSED = ('1', '108', "Transaction is reversed")
+CANCELLED = ('2', '36', "Transaction is cancelled")
+
+
+class FaisapaySimulator:
+    """ Simulate the Faisapay gateway of one merchant. """
+
+    def __init__(
+        self, passcode, merchant, acquirer, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+        error_rate=0.0, decline_rate=0.0, reason_code=None,
+    ):
+        """
+        :param str passcode: The passcode of the merchant.
+        :param str merchant: The merchant ID.
+        :param str acquirer: The acquirer ID.
+        :param str host: The host to listen on.
+        :param int port: The port to listen on; 0 to pick a free port.
+        :param float latency: The mean latency added to each response, in seconds.
+        :param float jitter: The maximum deviation from the mean latency, in seconds.
+        :param float error_rate: The share of the requests answered with an HTTP 503 error.
+        :param float decline_rate: The share of the checkouts cancelled by the customer.
+        :param str reason_code: The reason code of all the checkouts, to simulate a specific case.
+        """
+        self.engine = SignatureEngine(passcode, merchant, acquirer)
+        self.merchant = merchant
+        self.acquirer = acquirer
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.reason_code = reason_code
+        self.orders = {}  # The outcome of each order, by order ID.
+        self._order_ids = {}  # The order ID of each order, by reference number.
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """ The base URL of the API, to use as the provider's custom API URL. """
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/pgv2/'
+
+    def start(self):
+        """ Serve the requests in a background thread. """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving the requests. """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    #=== REQUEST HANDLING ===#
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep the connections alive, like the gateway.
+
+            def do_POST(self):
+                simulator._handle(self)
+
+            def log_message(self, format, *args):
+                _logger.debug(format, *args)
+
+        return Handler
+
+    def _handle(self, handler):
+        with self._lock:
+            self.request_count += 1
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            return self._send(handler, 503, b'{"error": {"description": "Simulated error"}}')
+
+        path = urlsplit(handler.path).path
+        body = handler.rfile.read(int(handler.headers.get('Content-Length') or 0))
+        if path.endswith('/reversalRequest'):
+            self._handle_api_request(handler, json.loads(body or b'{}'), REVERSED)
+        elif path.endswith('/statusRequest'):
+            self._handle_api_request(handler, json.loads(body or b'{}'), None)
+        else:
+            self._handle_checkout(handler, dict(parse_qsl(body.decode())))
+
+    def _handle_checkout(self, handler, data):
+        """ Redirect the customer back to the merchant with a signed result. """
+        if not self._check_credentials(data) or not self.engine.verify(
+            'pay_request', data, data.get('signature')
+        ):
+            return self._send(handler, 403, b'{"error": {"description": "Invalid signature"}}')
+
+        if self.reason_code:
+            outcome = ('1' if self.reason_code == '1' else '2', self.reason_code, "Simulated")
+        elif random.random() < self.decline_rate:
+            outcome = CANCELLED
+        else:
+            outcome = APPROVED
+        result = self._register_order(data['orderID'], outcome)
+        result.update(authCode=f'{random.randint(0, 999999):06}', salt=secrets.token_hex(8))
+        result['signature'] = self.engine.sign('response', result)
+
+        separator = '&' if '?' in data['merRespURL'] else '?'
+        handler.send_response(303)
+        handler.send_header('Location', f"{data['merRespURL']}{separator}{urlencode(result)}")
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+
+    def _handle_api_request(self, handler, data, outcome):
+        """ Answer a reversal request, or a status request if no outcome is given. """
+        if not self._check_credentials(data) or not self.engine.verify(
+            'api_request', data, data.get('signature')
+        ):
+            return self._send(handler, 403, b'{"error": {"description": "Invalid signature"}}')
+
+        # The reversal requests identify the order by its reference number.
+        order_id = self._order_ids.get(data['orderID'], data['orderID'])
+        if outcome:
+            result = self._register_order(order_id, outcome)
+        else:
+            with self._lock:
+                result = dict(self.orders.get(order_id) or {
+                    'orderID': order_id, 'responseCode': '2', 'reasonCode': '0',
+                    'reasonText': "Order not found",
+                })
+        self._send(handler, 200, json.dumps(result).encode())
+
+    def _check_credentials(self, data):
+        return data.get('merID') == self.merchant and data.get('acqID') == self.acquirer
+
+    def _register_order(self, order_id, outcome):
+        response_code, reason_code, reason_text = outcome
+        with self._lock:
+            order = self.orders.get(order_id) or {'referenceNo': f'{len(self.orders) + 1:010}'}
+            self._order_ids[order['referenceNo']] = order_id
+            order.update(
+                orderID=order_id,
+                responseCode=response_code,
+                reasonCode=reason_code,
+                reasonText=reason_text,
+            )
+            self.orders[order_id] = order
+            return dict(order)
+
+    @staticmethod
+    def _send(handler, status, body):
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--passcode', required=True)
+    parser.add_argument('--merchant', required=True)
+    parser.add_argument('--acquirer', required=True)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8079)
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean latency, in seconds.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Latency jitter, in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--decline-rate', type=float, default=0.0)
+    parser.add_argument('--reason-code', help="Force the reason code of all the checkouts.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = FaisapaySimulator(
+        args.passcode, args.merchant, args.acquirer, host=args.host, port=args.port,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        decline_rate=args.decline_rate, reason_code=args.reason_code,
+    )
+    _logger.info("Faisapay simulator listening on %s", simulator.url)
+    try:
+        simulator._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
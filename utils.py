@@ -0,0 +1,874 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import asyncio
+import atexit
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+# One pooled session per API base URL, shared by all the threads of the worker process.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# One rate limiter per API base URL and rate, shared by all the threads of the worker process.
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+# One circuit breaker per provider and API URL, shared by all the threads of the worker process.
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_session(base_url, pool_size=const.DEFAULT_POOL_SIZE, max_retries=const.DEFAULT_MAX_RETRIES):
+    """ Return the pooled HTTP session of the current process for the given API base URL.
+
+    The session keeps its connections alive between requests so that the TCP and TLS handshakes
+    with the gateway are only paid once per pooled connection. Only the connection step and the
+    idempotent HTTP methods are retried, with an exponential backoff, so that a request that
+    might have reached the gateway (e.g., a reversal) is never sent twice.
+
+    :param str base_url: The API base URL, as returned by `_faisapay_get_api_url`.
+    :param int pool_size: The maximum number of connections kept alive for the base URL.
+    :param int max_retries: The maximum number of retries of a failed request.
+    :return: The pooled session.
+    :rtype: requests.Session
+    """
+    key = (os.getpid(), base_url)  # Sessions must not be shared with forked workers.
+    config = (pool_size, max_retries)
+    session_config = _sessions.get(key)
+    if session_config is None or session_config[1] != config:
+        with _sessions_lock:
+            session_config = _sessions.get(key)
+            if session_config is None or session_config[1] != config:
+                if session_config:
+                    session_config[0].close()
+                session_config = _sessions[key] = (_build_session(*config), config)
+    return session_config[0]
+
+
+def _build_session(pool_size, max_retries):
+    """ Build a keep-alive session with a connection pool of the given size.
+
+    :param int pool_size: The maximum number of connections kept alive.
+    :param int max_retries: The maximum number of retries of a failed request.
+    :return: The session.
+    :rtype: requests.Session
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=const.RETRY_BACKOFF_FACTOR,
+        status_forcelist=const.RETRY_STATUS_FORCELIST,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # Only idempotent methods are retried.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session_stats():
+    """ Return the connection statistics of the pooled sessions of the current process.
+
+    A request sent over an already established connection counts as a reused connection; the
+    difference between both counters is the number of handshakes saved by the pool.
+
+    :return: The statistics per API base URL, with the keys `opened`, `reused` and `requests`.
+    :rtype: dict
+    """
+    pid = os.getpid()
+    stats = {}
+    for (session_pid, base_url), (session, _config) in list(_sessions.items()):
+        if session_pid != pid:
+            continue
+        opened = sent = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    sent += pool.num_requests
+        stats[base_url] = {'opened': opened, 'reused': max(sent - opened, 0), 'requests': sent}
+    return stats
+
+
+def send_request(session, url, payload=None, method='POST', timeout=None, circuit_breaker=None):
+    """ Send a request to the Faisapay API and return the JSON-formatted content of the response.
+
+    This function doesn't use the ORM and can thus be called from any thread.
+
+    :param requests.Session session: The session to send the request with.
+    :param str url: The URL of the endpoint.
+    :param dict payload: The payload of the request.
+    :param str method: The HTTP method of the request.
+    :param tuple timeout: The connect and read timeouts, in seconds. The read timeout is adapted by
+                          the circuit breaker, if any, to the recent latencies of the API.
+    :param CircuitBreaker circuit_breaker: The circuit breaker guarding the API, if any.
+    :return: The JSON-formatted content of the response.
+    :rtype: dict
+    :raise CircuitOpenError: If the circuit breaker rejects the request.
+    :raise requests.exceptions.RequestException: If the request fails.
+    """
+    if circuit_breaker:
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenError(url)
+        timeout = circuit_breaker.get_request_timeout(timeout)
+
+    start = time.perf_counter()
+    try:
+        try:
+            if method == 'GET':
+                response = session.get(url, params=payload, timeout=timeout)
+            else:
+                response = session.post(url, json=payload, timeout=timeout)
+        except requests.exceptions.ReadTimeout:
+            if circuit_breaker:
+                # The gateway was at least that slow: let the adapted read timeout rise.
+                circuit_breaker.record_failure(
+                    latency=timeout[1] if isinstance(timeout, tuple) else timeout
+                )
+            raise
+        except requests.exceptions.RequestException:
+            if circuit_breaker:
+                circuit_breaker.record_failure()
+            raise
+        if circuit_breaker:
+            if response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success(time.perf_counter() - start)
+    finally:
+        if circuit_breaker:
+            # Never leave the probe reserved, whatever interrupted the request.
+            circuit_breaker.release_probe()
+    response.raise_for_status()
+    return response.json()
+
+
+class CircuitOpenError(Exception):
+    """ Raised when a request is rejected because the gateway is considered unavailable. """
+
+
+class CircuitBreaker:
+    """ Fail fast while the gateway is unavailable, and adapt the timeouts to its latency.
+
+    The circuit opens after a number of consecutive failed requests or server errors.
+    While it is open, the requests are rejected without reaching the gateway. Once the reset
+    timeout has elapsed, a single probe request is let through (half-open state): the circuit
+    closes if it succeeds and opens again if it fails.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, latency_sample_size):
+        """
+        :param int failure_threshold: The number of consecutive failures opening the circuit.
+        :param float reset_timeout: The number of seconds after which an open circuit is probed.
+        :param int latency_sample_size: The number of recent latencies kept to adapt the timeout.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failure_count = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self._probe_thread = None
+        self._latencies = deque(maxlen=latency_sample_size)
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """ Return whether a request can be sent, and reserve the probe if the circuit is half-open.
+
+        :return: Whether the request can be sent.
+        :rtype: bool
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self, latency):
+        """ Close the circuit after a successful request.
+
+        :param float latency: The duration of the request, in seconds.
+        :return: None
+        """
+        with self._lock:
+            self.state = 'closed'
+            self.failure_count = 0
+            self._probe_in_flight = False
+            self._latencies.append(latency)
+
+    def record_failure(self, latency=None):
+        """ Count a failed request and open the circuit if needed.
+
+        :param float latency: The duration of the request if it timed out, in seconds.
+        :return: None
+        """
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self.failure_count += 1
+            if self.state == 'half_open' or self.failure_count >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """ Let another request probe the half-open circuit if the reserved probe got no outcome.
+
+        :return: None
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def get_request_timeout(self, timeout):
+        """ Return the timeouts of a request with the read timeout adapted to the recent latencies.
+
+        The probe of a half-open circuit is sent with the configured read timeout, so that a gateway
+        that became slower than the adapted timeout can still close the circuit.
+
+        :param tuple timeout: The configured connect and read timeouts, in seconds, if any.
+        :return: The connect and read timeouts of the request, in seconds.
+        :rtype: tuple
+        """
+        if not isinstance(timeout, tuple):
+            return timeout
+        with self._lock:
+            is_probe = self._probe_in_flight and self._probe_thread == threading.get_ident()
+        if is_probe:
+            return timeout
+        connect_timeout, read_timeout = timeout
+        return connect_timeout, self.get_read_timeout(read_timeout)
+
+    def get_read_timeout(self, maximum):
+        """ Return the read timeout adapted to the recent latencies of the gateway.
+
+        The timeout is a multiple of the 99th percentile of the recent latencies, bounded by the
+        configured timeout. The configured timeout is used until enough latencies are known.
+
+        :param float maximum: The configured read timeout, in seconds.
+        :return: The read timeout, in seconds.
+        :rtype: float
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < const.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return maximum
+        p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+        timeout = max(const.ADAPTIVE_TIMEOUT_MINIMUM, p99 * const.ADAPTIVE_TIMEOUT_FACTOR)
+        return min(maximum, timeout)
+
+    def get_status(self):
+        """ Return the state of the circuit, for monitoring.
+
+        :return: The state, the number of consecutive failures and the number of seconds since the
+                 circuit opened.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_count': self.failure_count,
+                'open_since': round(time.monotonic() - self._opened_at, 3)
+                if self.state != 'closed' else None,
+            }
+
+
+def get_circuit_breaker(key):
+    """ Return the circuit breaker of the current process for the given key.
+
+    :param tuple key: The key identifying the guarded gateway, e.g., the provider and its API URL.
+    :return: The circuit breaker.
+    :rtype: CircuitBreaker
+    """
+    key = (os.getpid(),) + key
+    circuit_breaker = _circuit_breakers.get(key)
+    if circuit_breaker is None:
+        with _circuit_breakers_lock:
+            circuit_breaker = _circuit_breakers.setdefault(key, CircuitBreaker(
+                const.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                const.CIRCUIT_BREAKER_RESET_TIMEOUT,
+                const.ADAPTIVE_TIMEOUT_SAMPLE_SIZE,
+            ))
+    return circuit_breaker
+
+
+class RateLimiter:
+    """ Space out the calls of all the threads of the process to respect a maximum rate. """
+
+    def __init__(self, rate):
+        """ :param float rate: The maximum number of calls per second; 0 for no limit. """
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """ Change the maximum rate of the calls, from the next reserved slot.
+
+        :param float rate: The maximum number of calls per second; 0 for no limit.
+        :return: None
+        """
+        with self._lock:
+            self.rate = rate
+            self._interval = 1 / rate if rate > 0 else 0
+
+    def wait(self):
+        """ Block the calling thread until the next call slot. """
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    def reserve(self):
+        """ Reserve the next call slot and return the time to wait for it.
+
+        :return: The number of seconds to wait before the call.
+        :rtype: float
+        """
+        if not self._interval:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        return slot - now
+
+
+def get_rate_limiter(base_url, merchant_id, rate):
+    """ Return the rate limiter of the current process for the given API base URL and merchant.
+
+    All the requests of a merchant to the API share the same limiter, whatever the rate they are
+    sent at: the limiter takes the rate of its latest caller.
+
+    :param str base_url: The API base URL, as returned by `_faisapay_get_api_url`.
+    :param str merchant_id: The merchant id the requests are sent with.
+    :param float rate: The maximum number of requests per second; 0 for no limit.
+    :return: The rate limiter.
+    :rtype: RateLimiter
+    """
+    key = (os.getpid(), base_url, merchant_id)
+    limiter = _rate_limiters.get(key)
+    if limiter is None:
+        with _rate_limiters_lock:
+            limiter = _rate_limiters.setdefault(key, RateLimiter(rate))
+    if limiter.rate != rate:
+        limiter.set_rate(rate)
+    return limiter
+
+
+def map_concurrently(func, items, max_workers=1, rate_limiter=None):
+    """ Call `func` on each item with at most `max_workers` calls in flight.
+
+    The function is called from worker threads and must thus not use the ORM.
+
+    :param callable func: The function to call with each item.
+    :param list items: The items to call the function with.
+    :param int max_workers: The maximum number of concurrent calls.
+    :param RateLimiter rate_limiter: The rate limiter to respect, if any.
+    :return: The `(result, error)` pair of each call, in the order of the items.
+    :rtype: list
+    """
+    def _call(item):
+        if rate_limiter:
+            rate_limiter.wait()
+        try:
+            return func(item), None
+        except Exception as error:
+            return None, error
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [_call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(_call, items))
+
+
+class AsyncClient:
+    """ Send requests to the Faisapay API from an asyncio event loop.
+
+    The requests are sent with the pooled session from the threads of the client, so that many
+    requests are in flight while the event loop keeps scheduling the others. The number of requests
+    in flight is bounded by a semaphore and their start is spaced out by the rate limiter of their
+    merchant.
+
+    The client doesn't use the ORM: the URL, the session and the signed payloads are prepared by
+    the caller beforehand.
+    """
+
+    def __init__(
+        self, session, url, method='POST', timeout=None, circuit_breaker=None, max_concurrency=1,
+        base_url=None, rate_limit=0, endpoint=None,
+    ):
+        """
+        :param requests.Session session: The session to send the requests with.
+        :param str url: The URL of the endpoint.
+        :param str method: The HTTP method of the requests.
+        :param tuple timeout: The connect and read timeouts, in seconds.
+        :param CircuitBreaker circuit_breaker: The circuit breaker guarding the API, if any.
+        :param int max_concurrency: The maximum number of requests in flight.
+        :param str base_url: The API base URL the rate limiters of the merchants are shared for.
+        :param float rate_limit: The maximum number of requests per second of each merchant; 0 for
+                                 no limit.
+        :param str endpoint: The endpoint the requests are timed under.
+        """
+        self.session = session
+        self.url = url
+        self.method = method
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker
+        self.max_concurrency = max(max_concurrency, 1)
+        self.base_url = base_url or url
+        self.rate_limit = rate_limit
+        self.endpoint = endpoint
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix='faisapay'
+        )
+        self._semaphores = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc_info):
+        self.close()
+
+    def close(self):
+        """ Release the threads of the client. """
+        self._executor.shutdown(wait=True)
+
+    async def send(self, payload):
+        """ Send a request and return the JSON-formatted content of the response.
+
+        :param dict payload: The payload of the request.
+        :return: The JSON-formatted content of the response.
+        :rtype: dict
+        :raise CircuitOpenError: If the circuit breaker rejects the request.
+        :raise requests.exceptions.RequestException: If the request fails.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:  # Semaphores can't be shared across event loops.
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            if self.rate_limit:
+                rate_limiter = get_rate_limiter(
+                    self.base_url, payload and payload.get('merID'), self.rate_limit
+                )
+                delay = rate_limiter.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+            return await loop.run_in_executor(self._executor, self._send_request, payload)
+
+    async def send_all(self, payloads):
+        """ Send the requests concurrently and gather their results.
+
+        :param list payloads: The payloads of the requests.
+        :return: The `(response_content, error)` pair of each request, in the order of the
+                 payloads.
+        :rtype: list
+        """
+        async def _send(payload):
+            try:
+                return await self.send(payload), None
+            except Exception as error:
+                return None, error
+
+        return await asyncio.gather(*(_send(payload) for payload in payloads))
+
+    def _send_request(self, payload):
+        with timed('http', self.endpoint):
+            return send_request(
+                self.session, self.url, payload=payload, method=self.method, timeout=self.timeout,
+                circuit_breaker=self.circuit_breaker,
+            )
+
+
+def run_async(coroutine):
+    """ Run the coroutine to completion from synchronous code, e.g., a cron, and return its result.
+
+    The coroutine is run in a new event loop, in a separate thread if the calling thread already
+    runs one.
+
+    :param coroutine coroutine: The coroutine to run.
+    :return: The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+class ExpiringKeySet:
+    """ Remember keys for a retention period, within a bounded capacity.
+
+    The oldest keys are forgotten first when the capacity is reached. The number of lookups of a
+    remembered key is counted as hits.
+    """
+
+    def __init__(self, capacity, retention):
+        """
+        :param int capacity: The maximum number of remembered keys.
+        :param float retention: The number of seconds during which a key is remembered.
+        """
+        self.capacity = capacity
+        self.retention = retention
+        self.hit_count = 0
+        self._expiry_by_key = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry_by_key)
+
+    def _evict_expired(self, now):
+        """ Forget the expired keys. The lock must be held by the caller. """
+        while self._expiry_by_key:
+            key, expiry = next(iter(self._expiry_by_key.items()))
+            if expiry > now:
+                break
+            del self._expiry_by_key[key]
+
+    def add(self, key):
+        """ Remember the key for the retention period.
+
+        :param key: The hashable key to remember.
+        :return: None
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            self._expiry_by_key[key] = now + self.retention
+            self._expiry_by_key.move_to_end(key)
+            while len(self._expiry_by_key) > self.capacity:
+                self._expiry_by_key.popitem(last=False)
+
+    def check(self, key):
+        """ Return whether the key is remembered, and count a hit if it is.
+
+        :param key: The hashable key to look up.
+        :return: Whether the key is remembered.
+        :rtype: bool
+        """
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            if key in self._expiry_by_key:
+                self.hit_count += 1
+                return True
+            return False
+
+
+class ClientThrottle:
+    """ Limit the rate of the calls of each client with a token bucket per client.
+
+    Each bucket holds up to `burst` tokens and is refilled at `rate` tokens per second; a call
+    consumes a token. The buckets of the least recently seen clients are dropped first when the
+    capacity is reached.
+    """
+
+    def __init__(self, rate, burst, capacity):
+        """
+        :param float rate: The number of calls per second allowed per client; 0 for no limit.
+        :param int burst: The maximum number of calls a client can make at once.
+        :param int capacity: The maximum number of clients tracked.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.capacity = capacity
+        self._buckets = OrderedDict()  # The (tokens, last refill time) pair of each client.
+        self._lock = threading.Lock()
+
+    def allow(self, client):
+        """ Consume a token of the client and return whether the call is allowed.
+
+        :param str client: The key of the client, e.g., its IP address.
+        :return: Whether the call is allowed.
+        :rtype: bool
+        """
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            tokens, last_refill = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[client] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.capacity:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class EventCounter:
+    """ Count events by name across the threads of the process. """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name):
+        """ Count an occurrence of the event. """
+        with self._lock:
+            self._counts[name] += 1
+
+    def get_counts(self):
+        """ Return the number of occurrences of each event.
+
+        :return: The number of occurrences, by event name.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._counts)
+
+
+class BatchWriter:
+    """ Hand items over to a background thread that writes them by batches.
+
+    The items are grouped by key, e.g., the database they belong to, and written when a batch is
+    full or when the flush interval elapses. The thread is started on the first item added in the
+    process, so that each forked worker runs its own. The oldest items are dropped when the
+    capacity is reached, which protects the caller from a writer that cannot keep up.
+    """
+
+    def __init__(self, write_batch, batch_size, interval, capacity):
+        """
+        :param callable write_batch: The function writing a batch, called with the key and the list
+                                     of items of the batch.
+        :param int batch_size: The maximum number of items written at once.
+        :param float interval: The maximum number of seconds an item waits before being written.
+        :param int capacity: The maximum number of items waiting to be written.
+        """
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped_count = 0
+        self.failed_count = 0
+        self._queue = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._thread = None
+        atexit.register(self.flush)  # Write the last items when the process exits.
+
+    def add(self, key, item):
+        """ Queue the item for writing in the background.
+
+        :param key: The hashable key of the batch the item belongs to.
+        :param item: The item to write.
+        :return: None
+        """
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped_count += 1
+            self._queue.append((key, item))
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name='faisapay.batch_writer', daemon=True
+                )
+                self._thread.start()
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        """ Write all the queued items in the calling thread.
+
+        :return: None
+        """
+        while True:
+            with self._lock:
+                items = [self._queue.popleft() for _i in range(len(self._queue))]
+            if not items:
+                return
+            items_by_key = {}
+            for key, item in items:
+                items_by_key.setdefault(key, []).append(item)
+            for key, key_items in items_by_key.items():
+                for start in range(0, len(key_items), self.batch_size):
+                    batch = key_items[start:start + self.batch_size]
+                    try:
+                        self.write_batch(key, batch)
+                    except Exception:
+                        self.failed_count += len(batch)
+                        _logger.exception("Unable to write a batch of %d items.", len(batch))
+
+    def get_status(self):
+        """ Return the number of queued, dropped and failed items.
+
+        :return: The status of the writer.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'dropped': self.dropped_count,
+                'failed': self.failed_count,
+            }
+
+    def _run(self):
+        """ Write the queued items every interval, or as soon as a batch is full. """
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def encode_payload(payload, redacted_keys=()):
+    """ Serialize the payload into compact bytes, with the values of the secret keys redacted.
+
+    :param dict payload: The payload to encode.
+    :param tuple redacted_keys: The keys whose values must not be stored.
+    :return: The base64-encoded, compressed JSON of the payload.
+    :rtype: bytes
+    """
+    if isinstance(payload, dict):
+        payload = {
+            key: '[redacted]' if key in redacted_keys else value for key, value in payload.items()
+        }
+    serialized = json.dumps(payload, separators=(',', ':'), sort_keys=True, default=str)
+    return base64.b64encode(zlib.compress(serialized.encode(), 6))
+
+
+def decode_payload(data):
+    """ Return the payload encoded with `encode_payload`.
+
+    :param bytes data: The encoded payload.
+    :return: The payload.
+    :rtype: dict
+    """
+    return json.loads(zlib.decompress(base64.b64decode(data)))
+
+
+class SpanRecorder:
+    """ Record the durations of timed spans and compute their latency percentiles.
+
+    The spans are grouped by name, endpoint and outcome. Only the most recent durations of each
+    group are kept, which bounds the memory and keeps the percentiles representative of the
+    current load.
+    """
+
+    def __init__(self, sample_size):
+        """ :param int sample_size: The number of recent durations kept per group of spans. """
+        self.sample_size = sample_size
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, endpoint, outcome, duration):
+        """ Record the duration of a span.
+
+        :param str name: The name of the span, e.g., 'http'.
+        :param str endpoint: The endpoint or flow the span belongs to.
+        :param str outcome: The outcome of the span: 'success' or 'error'.
+        :param float duration: The duration of the span, in seconds.
+        :return: None
+        """
+        key = (name, endpoint, outcome)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.sample_size)
+            samples.append(duration)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def get_stats(self):
+        """ Return the count and the latency percentiles, in milliseconds, of each group of spans.
+
+        :return: The statistics of each group of spans.
+        :rtype: list
+        """
+        with self._lock:
+            groups = [
+                (key, sorted(samples), self._counts[key]) for key, samples in self._samples.items()
+            ]
+        stats = []
+        for (name, endpoint, outcome), samples, count in sorted(groups, key=lambda g: g[0]):
+            stats.append({
+                'span': name,
+                'endpoint': endpoint,
+                'outcome': outcome,
+                'count': count,
+                **{
+                    f'p{percentile}': round(
+                        samples[min(len(samples) - 1, len(samples) * percentile // 100)] * 1000, 3
+                    )
+                    for percentile in (50, 95, 99)
+                },
+            })
+        return stats
+
+    def reset(self):
+        """ Forget all the recorded spans. """
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+class _Span:
+    """ Context manager recording its duration in a span recorder. """
+
+    __slots__ = ('recorder', 'name', 'endpoint', 'start')
+
+    def __init__(self, recorder, name, endpoint):
+        self.recorder = recorder
+        self.name = name
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.recorder.record(
+            self.name,
+            self.endpoint,
+            'error' if exc_type else 'success',
+            time.perf_counter() - self.start,
+        )
+
+
+# The durations of the spans timed in the worker process.
+span_recorder = SpanRecorder(const.METRICS_SAMPLE_SIZE)
+
+# The notifications rejected by the worker process before reaching the database, by reason.
+rejection_counter = EventCounter()
+
+
+def timed(name, endpoint=None):
+    """ Return a context manager timing the span it wraps.
+
+    :param str name: The name of the span: 'signature', 'orm_lookup', 'http', 'state_transition' or
+                     the name of a whole flow.
+    :param str endpoint: The endpoint or flow the span belongs to.
+    :return: The context manager.
+    """
+    return _Span(span_recorder, name, endpoint)
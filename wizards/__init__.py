@@ -0,0 +1,4 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from . import payment_faisapay_payment_link
+from . import payment_faisapay_settlement_import
@@ -0,0 +1,101 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import time
+
+from odoo import _, Command, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFaisapayPaymentLink(models.TransientModel):
+    _name = 'payment.faisapay.payment.link'
+    _description = "Faisapay Payment Links"
+
+    provider_id = fields.Many2one(
+        string="Provider",
+        comodel_name='payment.provider',
+        domain=[('code', '=', 'faisapay'), ('state', '!=', 'disabled')],
+        required=True,
+        ondelete='cascade',
+    )
+    invoice_ids = fields.Many2many(string="Invoices", comodel_name='account.move')
+    state = fields.Selection(
+        selection=[('draft', "Draft"), ('done', "Done")], default='draft', required=True
+    )
+    created_count = fields.Integer(string="Created Links", readonly=True)
+    skipped_count = fields.Integer(
+        string="Skipped Invoices",
+        help="The invoices that are not open, are in an unsupported currency or already have a "
+             "payment link.",
+        readonly=True,
+    )
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if 'invoice_ids' in fields_list and self.env.context.get('active_model') == 'account.move':
+            res['invoice_ids'] = [Command.set(self.env.context.get('active_ids', []))]
+        if 'provider_id' in fields_list and not res.get('provider_id'):
+            res['provider_id'] = self.env['payment.provider'].search([
+                ('code', '=', 'faisapay'),
+                ('state', '!=', 'disabled'),
+                ('company_id', '=', self.env.company.id),
+            ], limit=1).id
+        return res
+
+    #=== ACTION METHODS ===#
+
+    def action_create_links(self):
+        """ Create the pre-signed payment links of the invoices and show the result. """
+        self.ensure_one()
+        if not self.invoice_ids:
+            raise UserError(_("Please select the invoices to create payment links for."))
+        self._create_payment_links()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    #=== BUSINESS METHODS ===#
+
+    def _create_payment_links(self):
+        """ Create a transaction with a pre-signed payment request for each payable invoice.
+
+        The invoices are processed by batches so that the memory stays bounded on large billing
+        runs; the invoices that already have a payment link for the provider are skipped, which
+        makes running the wizard again on the same invoices harmless.
+
+        Note: self.ensure_one()
+
+        :return: None
+        """
+        self.ensure_one()
+        start = time.perf_counter()
+        invoice_ids = self.invoice_ids.ids
+        created_count = 0
+        for invoice_batch in split_every(
+            const.PAYMENT_LINK_BATCH_SIZE, invoice_ids, self.env['account.move'].browse
+        ):
+            invoices = invoice_batch._faisapay_get_payable_invoices(self.provider_id)
+            created_count += len(invoices._faisapay_create_payment_links(self.provider_id))
+            self.env.flush_all()
+            self.env.invalidate_all()
+
+        self.write({
+            'state': 'done',
+            'created_count': created_count,
+            'skipped_count': len(invoice_ids) - created_count,
+        })
+        _logger.info(
+            "Created %d Faisapay payment links for provider %s in %.3fs.",
+            created_count, self.provider_id.id, time.perf_counter() - start,
+        )
@@ -0,0 +1,297 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import contextlib
+import csv
+import io
+import logging
+import tempfile
+import time
+
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+from odoo.addons.payment_faisapay import const
+
+
+_logger = logging.getLogger(__name__)
+
+# The transaction states that a settlement row is allowed to fix.
+FIXABLE_STATES = ('draft', 'pending', 'authorized')
+
+# The columns of the mismatch report.
+REPORT_COLUMNS = (
+    'line', 'orderID', 'referenceNo', 'reasonCode', 'transaction_state', 'expected_state', 'issue'
+)
+
+
+class PaymentFaisapaySettlementImport(models.TransientModel):
+    _name = 'payment.faisapay.settlement.import'
+    _description = "Faisapay Settlement Import"
+
+    provider_id = fields.Many2one(
+        string="Provider",
+        comodel_name='payment.provider',
+        domain=[('code', '=', 'faisapay')],
+        required=True,
+        ondelete='cascade',
+    )
+    settlement_file = fields.Binary(
+        string="Settlement File",
+        help="The CSV settlement file exported by MIB, with the orderID, referenceNo and "
+             "reasonCode columns, and optionally the purchaseAmt column.",
+        attachment=True,
+        required=True,
+    )
+    settlement_file_name = fields.Char(string="File Name")
+    state = fields.Selection(
+        selection=[('draft', "Draft"), ('done', "Done")], default='draft', required=True
+    )
+    row_count = fields.Integer(string="Rows", readonly=True)
+    matched_count = fields.Integer(string="Matched", readonly=True)
+    fixed_count = fields.Integer(string="Fixed", readonly=True)
+    mismatch_count = fields.Integer(string="Mismatches", readonly=True)
+    report_attachment_id = fields.Many2one(
+        string="Mismatch Report", comodel_name='ir.attachment', readonly=True
+    )
+
+    #=== ACTION METHODS ===#
+
+    def action_import(self):
+        """ Reconcile the transactions with the settlement file and show the result. """
+        self.ensure_one()
+        with self._open_settlement_file() as settlement_file:
+            self._import_settlement(settlement_file)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_download_report(self):
+        """ Return the action downloading the mismatch report. """
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{self.report_attachment_id.id}?download=true',
+            'target': 'self',
+        }
+
+    #=== BUSINESS METHODS ===#
+
+    @contextlib.contextmanager
+    def _open_settlement_file(self):
+        """ Open the uploaded settlement file for reading, from the filestore when possible.
+
+        Note: self.ensure_one()
+
+        :return: The binary file object.
+        :rtype: io.BufferedIOBase
+        """
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'settlement_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError(_("Please upload a settlement file."))
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as settlement_file:
+                yield settlement_file
+        else:  # The attachments are stored in the database.
+            yield io.BytesIO(attachment.raw)
+
+    def _import_settlement(self, settlement_file):
+        """ Reconcile the transactions of the provider with the rows of a settlement file.
+
+        The file is read as a stream and processed by batches: the transactions of each batch are
+        fetched at once through the indexes on their provider reference and reference, the rows
+        settled in a state that a pending transaction can reach are applied with one state change
+        per state, and the rows that cannot be reconciled are written to a temporary report file.
+        Only the counters are kept in memory.
+
+        Note: self.ensure_one()
+
+        :param io.BufferedIOBase settlement_file: The CSV settlement file, opened in binary mode.
+        :return: None
+        :raise UserError: If a required column is missing from the file.
+        """
+        self.ensure_one()
+        start = time.perf_counter()
+        reader = csv.DictReader(io.TextIOWrapper(settlement_file, encoding='utf-8-sig', newline=''))
+        missing_columns = set(const.SETTLEMENT_FILE_COLUMNS) - set(reader.fieldnames or ())
+        if missing_columns:
+            raise UserError(_(
+                "The settlement file is missing the following columns: %s",
+                ', '.join(sorted(missing_columns)),
+            ))
+
+        counters = {'row_count': 0, 'matched_count': 0, 'fixed_count': 0, 'mismatch_count': 0}
+        with tempfile.TemporaryFile() as report_file:
+            report_text = io.TextIOWrapper(report_file, encoding='utf-8', newline='')
+            report_writer = csv.writer(report_text)
+            report_writer.writerow(REPORT_COLUMNS)
+            rows = ((reader.line_num, row) for row in reader)
+            for batch in split_every(const.SETTLEMENT_IMPORT_BATCH_SIZE, rows):
+                self._reconcile_settlement_rows(batch, report_writer, counters)
+                self.env.invalidate_all()
+
+            report_attachment = self.env['ir.attachment']
+            if counters['mismatch_count']:
+                report_text.flush()
+                report_file.seek(0)
+                report_attachment = report_attachment.create({
+                    'name': f'{self.settlement_file_name or "settlement"}-mismatches.csv',
+                    'mimetype': 'text/csv',
+                    'raw': report_file.read(),
+                    'res_model': self._name,
+                    'res_id': self.id,
+                })
+            report_text.detach()
+
+        self.write(dict(counters, state='done', report_attachment_id=report_attachment.id))
+        _logger.info(
+            "Imported %d settlement rows for provider %s in %.3fs: %d matched, %d fixed, "
+            "%d mismatches.", counters['row_count'], self.provider_id.id,
+            time.perf_counter() - start, counters['matched_count'], counters['fixed_count'],
+            counters['mismatch_count'],
+        )
+
+    def _reconcile_settlement_rows(self, rows, report_writer, counters):
+        """ Match a batch of settlement rows with their transactions and apply the state fixes.
+
+        Note: self.ensure_one()
+
+        :param tuple rows: The `(line_number, row)` pairs of the batch.
+        :param csv.writer report_writer: The writer of the mismatch report.
+        :param dict counters: The counters of the import, updated in place.
+        :return: None
+        """
+        self.ensure_one()
+        txs_by_provider_reference, txs_by_reference = self._fetch_settlement_transactions(rows)
+        tx_ids_to_fix = {'done': set(), 'cancel': set()}
+        provider_references_to_save = {}
+        for line_number, row in rows:
+            counters['row_count'] += 1
+            order_id = (row['orderID'] or '').strip()
+            provider_reference = (row['referenceNo'] or '').strip()
+            reason_code = (row['reasonCode'] or '').strip()
+            expected_state = self._get_settlement_state(reason_code)
+            tx = (
+                provider_reference and txs_by_provider_reference.get(provider_reference)
+            ) or txs_by_reference.get(order_id)
+
+            issue = None
+            if not tx:
+                issue = 'transaction not found'
+            elif (
+                provider_reference
+                and tx['provider_reference']
+                and tx['provider_reference'] != provider_reference
+            ):
+                issue = 'provider reference mismatch'
+            elif row.get('purchaseAmt') and row['purchaseAmt'].strip() != str(
+                int(float(tx['amount']) * 100)  # Converted as in the payment request.
+            ):
+                issue = 'amount mismatch'
+            elif tx['state'] != expected_state:
+                if expected_state in tx_ids_to_fix and tx['state'] in FIXABLE_STATES:
+                    tx_ids_to_fix[expected_state].add(tx['id'])
+                    if provider_reference and not tx['provider_reference']:
+                        # The transaction never received a notification, save its reference.
+                        provider_references_to_save[tx['id']] = provider_reference
+                else:
+                    issue = 'state mismatch'
+
+            if tx:
+                counters['matched_count'] += 1
+            if issue:
+                counters['mismatch_count'] += 1
+                report_writer.writerow((
+                    line_number, order_id, provider_reference, reason_code,
+                    tx['state'] if tx else '', expected_state, issue,
+                ))
+
+        Transaction = self.env['payment.transaction'].sudo()
+        if provider_references_to_save:
+            self._save_provider_references(provider_references_to_save)
+        if tx_ids_to_fix['done']:
+            Transaction.browse(list(tx_ids_to_fix['done']))._set_done()
+            self.env.ref('payment.cron_post_process_payment_tx')._trigger()
+        if tx_ids_to_fix['cancel']:
+            Transaction.browse(list(tx_ids_to_fix['cancel']))._set_canceled()
+        counters['fixed_count'] += len(tx_ids_to_fix['done']) + len(tx_ids_to_fix['cancel'])
+
+    def _save_provider_references(self, provider_references):
+        """ Save the provider references of the settlement rows on their transactions at once.
+
+        :param dict provider_references: The provider reference of each transaction, by
+                                         `payment.transaction` id.
+        :return: None
+        """
+        values = list(provider_references.items())
+        self.env.cr.execute(
+            """
+            UPDATE payment_transaction tx
+               SET provider_reference = v.provider_reference
+              FROM (VALUES {}) AS v(id, provider_reference)
+             WHERE tx.id = v.id
+            """.format(', '.join(['%s'] * len(values))),
+            values,
+        )
+        self.env['payment.transaction'].browse(provider_references).invalidate_recordset(
+            ['provider_reference']
+        )
+
+    def _fetch_settlement_transactions(self, rows):
+        """ Fetch the transactions of the provider matching a batch of settlement rows.
+
+        Note: self.ensure_one()
+
+        :param tuple rows: The `(line_number, row)` pairs of the batch.
+        :return: The transactions, as dicts, by provider reference and by reference.
+        :rtype: tuple
+        """
+        self.ensure_one()
+        provider_references = [
+            row['referenceNo'].strip() for _line, row in rows if row['referenceNo']
+        ]
+        references = [row['orderID'].strip() for _line, row in rows if row['orderID']]
+        self.env['payment.transaction'].flush_model(
+            ['provider_id', 'reference', 'provider_reference', 'state', 'amount']
+        )
+        self.env.cr.execute(
+            """
+            SELECT id, reference, provider_reference, state, amount
+              FROM payment_transaction
+             WHERE provider_id = %s
+               AND (provider_reference = ANY(%s) OR reference = ANY(%s))
+            """,
+            [self.provider_id.id, provider_references, references],
+        )
+        txs_by_provider_reference, txs_by_reference = {}, {}
+        for tx in self.env.cr.dictfetchall():
+            if tx['provider_reference']:
+                txs_by_provider_reference[tx['provider_reference']] = tx
+            txs_by_reference[tx['reference']] = tx
+        return txs_by_provider_reference, txs_by_reference
+
+    def _get_settlement_state(self, reason_code):
+        """ Return the state in which a transaction settled with the given reason code should be.
+
+        The reversed payments were settled before being refunded and thus remain confirmed.
+
+        :param str reason_code: The reason code of the settlement row.
+        :return: The expected state of the transaction.
+        :rtype: str
+        """
+        if reason_code in const.PAYMENT_STATUS_MAPPING['done']:
+            return 'done'
+        elif reason_code in const.PAYMENT_STATUS_MAPPING['reversed']:
+            return 'done'
+        elif reason_code in const.PAYMENT_STATUS_MAPPING['cancelled']:
+            return 'cancel'
+        return 'error'